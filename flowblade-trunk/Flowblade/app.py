@@ -50,6 +50,7 @@ import appconsts
 import audiomonitoring
 import audiowaveform
 import audiowaveformrenderer
+import autosaving
 import clipeffectseditor
 import clipmenuaction
 import compositeeditor
@@ -83,6 +84,7 @@ import persistance
 import positionbar
 import preferenceswindow
 import processutils
+import producercache
 import projectaction
 import projectdata
 import projectinfogui
@@ -96,8 +98,10 @@ import rotomask
 import sequence
 import shortcuts
 import snapping
+import startupcache
 import threading
 import titler
+import thumbtiles
 import tlinerender
 import tlinewidgets
 import toolsintegration
@@ -131,6 +135,9 @@ resize_timeout_id = -1
 
 _log_file = None
 
+_startup_profile = None # list of (phase name, seconds) if --profile-startup given
+_startup_phase_start = 0.0
+
 assoc_file_path = None
 assoc_timeout_id = None
 
@@ -144,6 +151,7 @@ def main(root_path):
         log_print_output_to_file()
 
     set_quiet_if_requested()
+    set_startup_profiling_if_requested()
 
     print("Application version: " + editorstate.appversion)
 
@@ -201,6 +209,7 @@ def main(root_path):
 
     # We respaths and translations data available so we need to init in a function.
     workflow.init_data()
+    startup_phase_done("Preferences, translations and shortcuts")
 
     # RHEL7/CentOS compatibility fix
     if gtk_version == "3.8.8":
@@ -240,6 +249,7 @@ def main(root_path):
     # Splash screen
     if editorpersistance.prefs.display_splash_screen == True: 
         show_splash_screen()
+    startup_phase_done("GTK init, themes and splash screen")
 
     # Init MLT framework
     repo = mlt.Factory().init()
@@ -247,10 +257,13 @@ def main(root_path):
 
     # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs.
     locale.setlocale(locale.LC_NUMERIC, 'C')
+    startup_phase_done("MLT init")
 
     # Check for codecs and formats on the system.
     mltenv.check_available_features(repo)
+    startup_phase_done("MLT environment detection")
     renderconsumer.load_render_profiles()
+    startup_phase_done("Render profiles")
 
     # Load filter and compositor descriptions from xml files.
     mltfilters.load_filters_xml(mltenv.services)
@@ -258,12 +271,22 @@ def main(root_path):
     
     # Replace some services if better replacements available.
     mltfilters.replace_services(mltenv.services)
+    startup_phase_done("Filters and compositors")
 
     # Create list of available mlt profiles.
     mltprofiles.load_profile_list()
+    startup_phase_done("MLT profiles")
+
+    # Detected environment and parsed filters and compositors are used on next launch.
+    startupcache.save()
 
     # If we have crashed we could have large amount of disk space wasted unless we delete all files here.
     tlinerender.app_launch_clean_up()
+    startup_phase_done("Timeline render clean up")
+
+    # Thumbnail tiles cache is kept within size set in preferences.
+    thumbtiles.evict_cached_tiles()
+    startup_phase_done("Thumbnail tiles clean up")
 
     # Save assoc file path if found in arguments.
     global assoc_file_path
@@ -283,12 +306,14 @@ def main(root_path):
     # Check for tools and init tools integration.
     gmic.test_availablity()
     toolsintegration.init()
+    startup_phase_done("Default project and tools integration")
 
     # Create player object.
     create_player()
 
     # Create main window and set widget handles in gui.py for more convenient reference.
     create_gui()
+    startup_phase_done("Player and main window creation")
 
     # Inits widgets with project data.
     init_project_gui()
@@ -301,6 +326,7 @@ def main(root_path):
 
     # Editor and modules need some more initializing.
     init_editor_state()
+    startup_phase_done("Project, sequence and editor state init")
 
     # Tracks need to be recentered if window is resized.
     # Connect listener for this now that the tline panel size allocation is sure to be available.
@@ -370,6 +396,10 @@ def main(root_path):
     global disk_cache_timeout_id
     disk_cache_timeout_id = GObject.timeout_add(2500, check_disk_cache_size)
 
+    startup_phase_done("Autosaves check and remaining init")
+    if _startup_profile != None:
+        GLib.idle_add(print_startup_profile)
+
     # Launch gtk+ main loop
     Gtk.main()
 
@@ -457,6 +487,46 @@ def set_quiet_if_requested():
             _log_file = "/dev/null"
             log_print_output_to_file()
             
+def set_startup_profiling_if_requested():
+    for arg in sys.argv:
+        if arg == "--profile-startup":
+            global _startup_profile, _startup_phase_start
+            _startup_profile = [("Python start and imports", _get_process_age())]
+            _startup_phase_start = time.monotonic()
+
+def startup_phase_done(phase_name):
+    global _startup_phase_start
+    if _startup_profile == None:
+        return
+
+    now = time.monotonic()
+    _startup_profile.append((phase_name, now - _startup_phase_start))
+    _startup_phase_start = now
+
+def print_startup_profile():
+    # Called when main loop is first idle, window has been shown then.
+    startup_phase_done("Main window display")
+
+    print("Startup profile:")
+    total = 0.0
+    for phase_name, phase_time in _startup_profile:
+        print("  " + phase_name.ljust(45) + "%7.3f s" % phase_time)
+        total += phase_time
+    print("  " + "Total".ljust(45) + "%7.3f s" % total)
+    return False
+
+def _get_process_age():
+    # Time from process start to now read from /proc, 0.0 if not available.
+    try:
+        with open("/proc/self/stat") as f:
+            stat = f.read()
+        start_ticks = int(stat[stat.rfind(")") + 2:].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return 0.0
+
 def create_gui():
     """
     Called at app start to create gui objects and handles for them.
@@ -663,7 +733,7 @@ def open_project(new_project):
     global loaded_autosave_file
     if loaded_autosave_file != None:
         print("Deleting", loaded_autosave_file)
-        os.remove(loaded_autosave_file)
+        autosaving.delete_autosave(loaded_autosave_file)
         loaded_autosave_file = None
 
     editorstate.update_current_proxy_paths()
@@ -702,6 +772,7 @@ def change_current_sequence(index):
     edit.do_gui_update = False  # This should not be necessery but we are doing this signal intention that GUI updates are disabled
     
     stop_autosave()
+    persistance.build_sequence(editorstate.project.sequences[index])
     editorstate.project.c_seq = editorstate.project.sequences[index]
 
     editorstate.tline_render_mode = appconsts.TLINE_RENDERING_OFF
@@ -726,6 +797,7 @@ def change_current_sequence(index):
 
     audiomonitoring.recreate_master_meter_filter_for_new_sequence()
     
+    autosaving.project_changed() # current sequence index is saved
     start_autosave()
 
     updater.set_timeline_height()
@@ -754,10 +826,11 @@ def autosave_dialog_callback(dialog, response):
     if response == Gtk.ResponseType.OK:
         global loaded_autosave_file
         loaded_autosave_file = autosave_file
+        autosaving.replay_deltas(autosave_file)
         projectaction.actually_load_project(autosave_file, True)
     else:
         tlinerender.init_session()  # didn't do this in main and not going to do app-open_project
-        os.remove(autosave_file)
+        autosaving.delete_autosave(autosave_file)
         start_autosave()
 
 def autosaves_many_recovery_dialog():
@@ -782,6 +855,7 @@ def autosaves_many_dialog_callback(dialog, response, autosaves_view, autosaves):
         global loaded_autosave_file
         loaded_autosave_file = autosave_file
         dialog.destroy()
+        autosaving.replay_deltas(autosave_file)
         projectaction.actually_load_project(autosave_file, True)
     else:
         dialog.destroy()
@@ -810,15 +884,14 @@ def start_autosave():
     if autosave_delay_millis > 0:
         print("Autosave started...")
         autosave_timeout_id = GObject.timeout_add(autosave_delay_millis, do_autosave)
-        autosave_file = userfolders.get_cache_dir() + get_instance_autosave_file()
-        persistance.save_project(editorstate.PROJECT(), autosave_file)
+        do_autosave()
     else:
         print("Autosave disabled...")
         stop_autosave()
 
 def get_autosave_files():
     autosave_dir = userfolders.get_cache_dir() + AUTOSAVE_DIR
-    return os.listdir(autosave_dir)
+    return [f for f in os.listdir(autosave_dir) if not autosaving.is_deltas_file(f)]
 
 def stop_autosave():
     global autosave_timeout_id
@@ -828,8 +901,9 @@ def stop_autosave():
     autosave_timeout_id = -1
 
 def do_autosave():
+    # Autosave is skipped if nothing has changed, file is written in a thread.
     autosave_file = userfolders.get_cache_dir() + get_instance_autosave_file()
-    persistance.save_project(editorstate.PROJECT(), autosave_file)
+    autosaving.autosave(editorstate.PROJECT(), autosave_file)
     return True
 
 # ------------------------------------------------- splash screen
@@ -1078,9 +1152,12 @@ def _app_destroy():
          (audiomonitoring._update_ticker.exited == False) and
          (audiowaveform.waveform_thread != None)):
         pass
+    producercache.save()
+
     # Delete autosave file
+    autosaving.wait_for_write()
     try:
-        os.remove(userfolders.get_cache_dir() + get_instance_autosave_file())
+        autosaving.delete_autosave(userfolders.get_cache_dir() + get_instance_autosave_file())
     except:
         print("Delete autosave file FAILED!")
 
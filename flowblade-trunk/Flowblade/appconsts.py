@@ -146,6 +146,12 @@ CONVERTING_TO_USE_ORIGINAL_MEDIA = 3
 # Autosave directory relative path
 AUTOSAVE_DIR = "autosave/"
 
+# Cached media producer properties file relative path
+PRODUCER_PROPERTIES_CACHE_FILE = "producer_properties"
+
+# Cached MLT environment and filters and compositors data file relative path
+STARTUP_CACHE_FILE = "startup_cache"
+
 # Hidden media folders
 # NOTE: We have not been fully consistant with the ending forward slashes.
 AUDIO_LEVELS_DIR = "audiolevels/"
@@ -160,6 +166,7 @@ MATCH_FRAME_DIR = "match_frame"
 MATCH_FRAME = MATCH_FRAME_DIR + "/match_frame.png"
 MATCH_FRAME_NEW = MATCH_FRAME_DIR + "/match_frame_new.png"
 TRIM_VIEW_DIR = "trim_view"
+THUMB_TILES_DIR = "thumbtiles"
 USER_PROFILES_DIR = "user_profiles/"
 USER_PROFILES_DIR_NO_SLASH = "user_profiles"
 BATCH_DIR = "batchrender/"
@@ -285,6 +292,11 @@ PROXY_SIZE_FULL = 0
 PROXY_SIZE_HALF = 1
 PROXY_SIZE_QUARTER = 2
 
+# Image sequence proxy frame formats
+IMG_SEQ_PROXY_PNG = 0
+IMG_SEQ_PROXY_JPEG = 1
+IMG_SEQ_PROXY_UNCOMPRESSED = 2
+
 
 # Container clip types
 CONTAINER_CLIP_GMIC = 0
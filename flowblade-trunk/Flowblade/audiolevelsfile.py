@@ -0,0 +1,193 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Audio levels cache file format.
+
+File is a fixed size header followed by a packed little endian float32 array
+with one level value per media frame. Files are opened with numpy.memmap so levels
+are paged in from disk lazily and are never unboxed into Python float lists.
+
+Frame levels are followed by a pyramid of min/max/RMS summaries, pyramid level n
+has one value per 2^n frames. Timeline drawing uses these when zoomed out so that
+amount of drawn level bars is bound by screen width and not by clip length.
+
+Cache files written by earlier versions are converted to current format when first read.
+"""
+
+import numpy as np
+import struct
+
+import atomicfile
+import utils
+
+LEVELS_FILE_MAGIC = b"FBLEVELS"
+LEVELS_FILE_VERSION = 2
+
+# magic, version, frames count, pyramid levels count
+_HEADER = struct.Struct("<8sIII")
+HEADER_SIZE = _HEADER.size
+
+# Version 1 files had no pyramid levels count.
+_HEADER_V1 = struct.Struct("<8sII")
+
+LEVELS_DTYPE = np.dtype("<f4")
+
+PYRAMID_MAX_LEVELS = 16
+
+SUMMARY_MIN = 0
+SUMMARY_MAX = 1
+SUMMARY_RMS = 2
+
+
+class AudioLevels:
+    """
+    Frame levels and their decimated summaries.
+
+    Indexing and len() give per frame levels so that objects of this class
+    can be used in place of the plain frame levels lists used earlier.
+    """
+    def __init__(self, frames, pyramid):
+        self.frames = frames
+        self.pyramid = pyramid # list of (min, max, rms) arrays, index 0 is decimation 2
+        self.partial = False # True for levels of media that is still being rendered
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def get_pyramid_level(self, pix_per_frame):
+        """
+        Returns (decimation, summaries) for level with most detail that still has
+        at most one value per pixel, or (1, None) if frames should be drawn as is.
+        """
+        if pix_per_frame >= 1.0 or len(self.pyramid) == 0:
+            return (1, None)
+
+        level = int(np.ceil(np.log2(1.0 / pix_per_frame)))
+        if level < 1:
+            return (1, None)
+        if level > len(self.pyramid):
+            level = len(self.pyramid)
+
+        return (2 ** level, self.pyramid[level - 1])
+
+
+def write_levels(file_path, frame_levels):
+    levels = np.asarray(frame_levels, dtype=LEVELS_DTYPE)
+    pyramid = create_pyramid(levels)
+    with atomicfile.AtomicFileWriter(file_path, "wb") as afw:
+        write_file = afw.get_file()
+        write_file.write(_HEADER.pack(LEVELS_FILE_MAGIC, LEVELS_FILE_VERSION, len(levels), len(pyramid)))
+        write_file.write(levels.tobytes())
+        for summaries in pyramid:
+            for summary in summaries:
+                write_file.write(summary.tobytes())
+
+def read_levels(file_path):
+    """
+    Returns AudioLevels object with read-only arrays mapped from file.
+    Files from earlier versions are migrated to current format.
+    """
+    header = _read_header(file_path)
+    if header == None or header[1] != LEVELS_FILE_VERSION:
+        _migrate_levels_file(file_path, header)
+        header = _read_header(file_path)
+
+    magic, version, frames_count, pyramid_levels = header
+    if frames_count == 0:
+        return AudioLevels(np.zeros(0, dtype=LEVELS_DTYPE), [])
+
+    # One mapping for whole file, frames and summaries are views into it.
+    data = np.memmap(file_path, dtype=LEVELS_DTYPE, mode="r", offset=HEADER_SIZE)
+    frames = data[0:frames_count]
+    
+    pyramid = []
+    pos = frames_count
+    for level in range(1, pyramid_levels + 1):
+        level_len = _get_pyramid_level_length(frames_count, level)
+        summaries = []
+        for i in range(0, 3):
+            summaries.append(data[pos:pos + level_len])
+            pos += level_len
+        pyramid.append(tuple(summaries))
+
+    return AudioLevels(frames, pyramid)
+
+def create_pyramid(levels):
+    pyramid = []
+    if len(levels) < 2:
+        return pyramid
+
+    # First level is created from frame levels, later levels from previous level.
+    mins = levels
+    maxs = levels
+    squares = np.square(levels, dtype=np.float64)
+    for level in range(1, PYRAMID_MAX_LEVELS + 1):
+        mins = _reduce_pairs(mins, np.minimum)
+        maxs = _reduce_pairs(maxs, np.maximum)
+        squares = _reduce_pairs(squares, np.add) / 2.0
+        pyramid.append((mins.astype(LEVELS_DTYPE), maxs.astype(LEVELS_DTYPE), np.sqrt(squares).astype(LEVELS_DTYPE)))
+        if len(mins) == 1:
+            break
+
+    return pyramid
+
+def _reduce_pairs(values, reduce_func):
+    # Odd last value is paired with itself.
+    if len(values) % 2 == 1:
+        values = np.append(values, values[-1])
+    return reduce_func(values[0::2], values[1::2])
+
+def _get_pyramid_level_length(frames_count, level):
+    level_len = frames_count
+    for i in range(0, level):
+        level_len = (level_len + 1) // 2
+    return level_len
+
+def _read_header(file_path):
+    with open(file_path, "rb") as f:
+        header_bytes = f.read(HEADER_SIZE)
+
+    if len(header_bytes) < _HEADER_V1.size:
+        return None
+
+    magic, version, frames_count = _HEADER_V1.unpack(header_bytes[0:_HEADER_V1.size])
+    if magic != LEVELS_FILE_MAGIC:
+        return None
+
+    if version == 1:
+        return (magic, version, frames_count, 0)
+
+    return _HEADER.unpack(header_bytes)
+
+def _migrate_levels_file(file_path, header):
+    if header == None:
+        frame_levels = utils.unpickle(file_path)
+        # Levels for frames that failed to render were saved as None in some versions.
+        frame_levels = [0.0 if val == None else val for val in frame_levels]
+    else:
+        magic, version, frames_count, pyramid_levels = header
+        frame_levels = np.fromfile(file_path, dtype=LEVELS_DTYPE, count=frames_count, offset=_HEADER_V1.size)
+
+    write_levels(file_path, frame_levels)
+    print("Audio levels file migrated to current format", file_path)
@@ -23,15 +23,15 @@ Modules handles creating and caching audio waveform images for clips.
 """
 
 import mlt
+import numpy as np
 import os
-import pickle
 import threading
 import time
 
 from gi.repository import Gtk, Gdk
 
 import appconsts
-import atomicfile
+import audiolevelsfile
 import dialogutils
 from editorstate import PROJECT
 import gui
@@ -62,7 +62,7 @@ def set_waveform_displayer_clip_from_popup(data):
 
     cache_file_path = userfolders.get_cache_dir() + appconsts.AUDIO_LEVELS_DIR + _get_unique_name_for_media(clip.path)
     if os.path.isfile(cache_file_path):
-        frame_levels = utils.unpickle(cache_file_path)
+        frame_levels = audiolevelsfile.read_levels(cache_file_path)
         frames_cache[clip.path] = frame_levels
         clip.waveform_data = frame_levels
         updater.repaint_tline()
@@ -114,8 +114,7 @@ class WaveformCreator(threading.Thread):
         
     def run(self):
         global frames_cache
-        frame_levels = [None] * self.clip_media_length 
-        frames_cache[self.clip.path] = frame_levels
+        frame_levels = np.zeros(self.clip_media_length, dtype=audiolevelsfile.LEVELS_DTYPE)
 
         Gdk.threads_enter()
         self.dialog.progress_bar.set_fraction(0.0)
@@ -147,18 +146,17 @@ class WaveformCreator(threading.Thread):
                 time.sleep(0.1)
 
         if not self.abort:
-            self.clip.waveform_data = frame_levels
-            with atomicfile.AtomicFileWriter(self.file_cache_path, "wb") as afw:
-                write_file = afw.get_file()
-                pickle.dump(frame_levels, write_file)
+            # Levels summaries for drawing are created when writing, so we use data read back from file.
+            audiolevelsfile.write_levels(self.file_cache_path, frame_levels)
+            levels_data = audiolevelsfile.read_levels(self.file_cache_path)
+            frames_cache[self.clip.path] = levels_data
+            self.clip.waveform_data = levels_data
 
             Gdk.threads_enter()
             self.dialog.progress_bar.set_fraction(1.0)
             self.dialog.progress_bar.set_text(_("Saving to Hard Drive"))
             Gdk.threads_leave()
         
-        else:
-            frames_cache.pop(self.clip.path, None)
 
         updater.repaint_tline()
 
@@ -24,28 +24,26 @@ Modules handles creating and caching audio waveform images for clips.
 
 import locale
 import mlt
+import multiprocessing
+import numpy as np
 import os
-import pickle
 import subprocess
 import sys
 import threading
+import time
 
 import gi
 gi.require_version('Gdk', '3.0') 
 from gi.repository import Gdk
 
 import appconsts
-import atomicfile
+import audiolevelsfile
 import editorpersistance
 import editorstate
-import mltenv
+import headlessworker
 import mltprofiles
-import mlttransitions
-import mltfilters
 import processutils
-import renderconsumer
 import respaths
-import translations
 import updater
 import userfolders
 import utils
@@ -55,6 +53,10 @@ RIGHT_CHANNEL = "_audio_level.1"
 
 FILE_SEPARATOR = "#&#file:"
 
+PARTIAL_FILE_EXTENSION = ".partial"
+LEVELS_RENDER_BLOCK_FRAMES = 2500
+PARTIAL_LEVELS_REPAINT_DELAY = 2.0 # seconds
+
 _waveforms = {} # Memory cache for waveform data
 _queued_waveform_renders = [] # Media queued for render during one timeline repaint
 _render_already_requested = [] # Files that have been sent to rendering since last project load
@@ -82,9 +84,21 @@ def get_waveform_data(clip):
     if os.path.isfile(levels_file_path):
         if os.path.getsize(levels_file_path) == 0:
              print( "Size zero Audio levels file, this is error!", levels_file_path)
-        waveform = utils.unpickle(levels_file_path)
+        # Levels are memory mapped, data is read from disk only for the frames that get drawn.
+        waveform = audiolevelsfile.read_levels(levels_file_path)
         _waveforms[clip.path] = waveform
         return waveform
+    elif os.path.isfile(levels_file_path + PARTIAL_FILE_EXTENSION) and clip.path in _render_already_requested:
+        # Levels are being rendered, display levels rendered so far.
+        # Partial files from earlier sessions are from aborted renders and are ignored.
+        # These are not put in memory cache so that later repaints get more complete data.
+        try:
+            waveform = audiolevelsfile.read_levels(levels_file_path + PARTIAL_FILE_EXTENSION)
+            waveform.partial = True
+            return waveform
+        except:
+            # Render process removed partial file after we checked for it.
+            return None
     else:
         global _queued_waveform_renders
         _queued_waveform_renders.append(clip.path)
@@ -137,13 +151,21 @@ class AudioRenderLaunchThread(threading.Thread):
         self.profile_desc = profile_desc
 
     def run(self):
-        # Launch render process and wait for it to end
-        FLOG = open(userfolders.get_cache_dir() + "log_audio_levels_render", 'w')
+        # Launch render in headless worker process or in its own process and wait for it to end
         # Sep-2018 - SvdB - Added self. to be able to access the thread through 'process'
-        self.process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeaudiorender", \
-                  self.rendered_media, self.profile_desc, respaths.ROOT_PATH], \
-                  stdin=FLOG, stdout=FLOG, stderr=FLOG)
-        self.process.wait()
+        self.process = headlessworker.submit_job(headlessworker.AUDIO_LEVELS_JOB, 
+                                                 {"files":self.rendered_media, "profile_desc":self.profile_desc})
+        if self.process == None:
+            FLOG = open(userfolders.get_cache_dir() + "log_audio_levels_render", 'w')
+            self.process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeaudiorender", \
+                      self.rendered_media, self.profile_desc, respaths.ROOT_PATH], \
+                      stdin=FLOG, stdout=FLOG, stderr=FLOG)
+        # Repaint timeline periodically to display partially rendered levels.
+        while self.process.poll() == None:
+            time.sleep(PARTIAL_LEVELS_REPAINT_DELAY)
+            Gdk.threads_enter()
+            updater.repaint_tline()
+            Gdk.threads_leave()
         
         Gdk.threads_enter()
         updater.repaint_tline()
@@ -155,22 +177,41 @@ def main():
     # Set paths.
     root_path = sys.argv[3]
     respaths.set_paths(root_path)
-
-    try:
-        editorstate.mlt_version = mlt.LIBMLT_VERSION
-    except:
-        editorstate.mlt_version = "0.0.99" # magic string for "not found"
     
     # Set folders paths
     userfolders.init()
     
     # Load editor prefs and list of recent projects
     editorpersistance.load()
+
+    profile_desc = sys.argv[2]
+        
+    files_paths = sys.argv[1]
+
+    # Workers are forked before MLT is initialized and each worker initializes MLT for itself.
+    render_levels(files_paths, profile_desc, _init_render_worker, (root_path,))
+
+def render_levels(files_paths, profile_desc, worker_init=None, worker_init_args=()):
+    """
+    Headless worker process calls this directly with MLT already initialized.
+    """
+    files_paths = files_paths.lstrip(FILE_SEPARATOR)
     
-    # Init translations module with translations data
-    translations.init_languages()
-    translations.load_filters_translations()
-    mlttransitions.init_module()
+    files = files_paths.split(FILE_SEPARATOR)
+
+    # Files are rendered concurrently in worker processes.
+    workers_count = min(multiprocessing.cpu_count(), len(files))
+    render_data = [(f, profile_desc) for f in files]
+    pool_context = multiprocessing.get_context("fork")
+    with pool_context.Pool(workers_count, worker_init, worker_init_args) as pool:
+        for clip_path in pool.imap_unordered(_render_levels_for_file, render_data):
+            print("Audio levels rendered for", clip_path)
+
+def _init_render_worker(root_path):
+    try:
+        editorstate.mlt_version = mlt.LIBMLT_VERSION
+    except:
+        editorstate.mlt_version = "0.0.99" # magic string for "not found"
 
     repo = mlt.Factory().init()
     processutils.prepare_mlt_repo(repo)
@@ -178,45 +219,49 @@ def main():
     # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs 
     locale.setlocale(locale.LC_NUMERIC, 'C')
 
-    # Check for codecs and formats on the system
-    mltenv.check_available_features(repo)
-    renderconsumer.load_render_profiles()
-
-    # Load filter and compositor descriptions from xml files.
-    mltfilters.load_filters_xml(mltenv.services)
-    mlttransitions.load_compositors_xml(mltenv.transitions)
-
     # Create list of available mlt profiles
     mltprofiles.load_profile_list()
 
-    profile_desc = sys.argv[2]
-    profile = mltprofiles.get_profile(profile_desc)
-        
-    files_paths = sys.argv[1]
-    files_paths = files_paths.lstrip(FILE_SEPARATOR)
-    
-    files = files_paths.split(FILE_SEPARATOR)
-
-    for f in files:
-       t = WaveformCreator(f, profile_desc)
-       t.start()
-       t.join()
-
-
-class WaveformCreator(threading.Thread):    
+def _render_levels_for_file(render_data):
+    clip_path, profile_desc = render_data
+    try:
+        waveform_creator = WaveformCreator(clip_path, profile_desc)
+        waveform_creator.run()
+    except Exception as e:
+        # Failing file should not stop levels rendering for other files.
+        print("Audio levels render failed for", clip_path, e)
+        partial_file_path = _get_levels_file_path(clip_path, mltprofiles.get_profile(profile_desc)) + PARTIAL_FILE_EXTENSION
+        if os.path.isfile(partial_file_path):
+            os.remove(partial_file_path)
+
+    return clip_path
+
+
+class WaveformCreator:
+    """
+    Renders audio levels for a media file by decoding its frames in order from start to end.
+    Levels rendered so far are written to a partial levels file after every block of frames.
+    """
     def __init__(self, clip_path, profile_desc):
-        threading.Thread.__init__(self)
         self.clip_path = clip_path
         profile = mltprofiles.get_profile(profile_desc)
         self.temp_clip = self._get_temp_producer(clip_path, profile)
         self.file_cache_path =_get_levels_file_path(clip_path, profile)
+        self.partial_file_path = self.file_cache_path + PARTIAL_FILE_EXTENSION
         self.last_rendered_frame = 0
 
     def run(self):
-        frame_levels = [None] * self.clip_media_length 
+        frame_levels = np.zeros(self.clip_media_length, dtype=audiolevelsfile.LEVELS_DTYPE)
+
+        # With speed 1 producer advances to next frame on every get_frame() so media is
+        # decoded sequentially without seeks.
+        self.temp_clip.set_speed(0)
+        self.temp_clip.seek(0)
+        self.temp_clip.set_speed(1)
 
         for frame in range(0, len(frame_levels)):
-            self.temp_clip.seek(frame)
+            if self.temp_clip.frame() != frame:
+                self.temp_clip.seek(frame)
             mlt.frame_get_waveform(self.temp_clip.get_frame(), 10, 50)
             val = self.levels.get(RIGHT_CHANNEL)
             if val == None:
@@ -224,9 +269,14 @@ class WaveformCreator(threading.Thread):
             frame_levels[frame] = float(val)
             self.last_rendered_frame = frame
 
-        with atomicfile.AtomicFileWriter(self.file_cache_path, "wb") as afw:
-            write_file = afw.get_file()
-            pickle.dump(frame_levels, write_file)
+            if (frame + 1) % LEVELS_RENDER_BLOCK_FRAMES == 0:
+                audiolevelsfile.write_levels(self.partial_file_path, frame_levels[0:frame + 1])
+
+        self.temp_clip.set_speed(0)
+
+        audiolevelsfile.write_levels(self.file_cache_path, frame_levels)
+        if os.path.isfile(self.partial_file_path):
+            os.remove(self.partial_file_path)
 
     def _get_temp_producer(self, clip_path, profile):
         temp_producer = mlt.Producer(profile, str(clip_path))
@@ -240,7 +290,3 @@ class WaveformCreator(threading.Thread):
         self.clip_media_length = temp_producer.get_length()
 
         return temp_producer
-
-
-
-
@@ -0,0 +1,288 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module writes autosave files for crash recovery.
+
+Code paths that change saved project data call project_changed() and autosave
+is skipped if project has not changed since last autosave. Every
+VERIFY_AUTOSAVES_INTERVAL autosave project is pickled even if no change was
+flagged, so that changes done by code paths that do not flag them are saved too.
+Write is skipped if pickled data is the same as in last autosave.
+
+Project data, media files and changed sequences are pickled on GTK thread to get
+a consistent snapshot, because project objects cannot be safely read while user
+edits them. Pickling blocks GUI for a time that grows with project size, this time
+is measured and printed for every autosave. Files are written by a thread.
+
+Full project files are written as checkpoints. Between checkpoints only
+project data, media files and changed sequences are appended as delta records
+into a file next to checkpoint file. Deltas are replayed into checkpoint file
+before recovered autosave is loaded.
+"""
+
+import os
+import pickle
+import threading
+import time
+
+import editorstate
+import persistance
+
+DELTAS_FILE_EXTENSION = ".deltas"
+DELTAS_PER_CHECKPOINT = 10
+VERIFY_AUTOSAVES_INTERVAL = 5
+
+# Checkpoint files have this chunk containing (checkpoint id, sequence keys)
+AUTOSAVE_CHUNK = "autosave"
+
+# Change tracking since last autosave
+_changed = True
+_changed_sequences = {} # id(seq) -> seq
+_autosaves_since_verify = 0
+
+# Last autosave data
+_project = None
+_file_path = None
+_checkpoint_id = 0
+_deltas_count = 0
+_project_data = None
+_media_data = None
+_sequence_chunks = {} # id(seq) -> (seq, name, pickled sequence), seq ref keeps id from being reused
+_last_current_seq = None
+_write_failed = False
+
+_writer_thread = None
+
+
+# ------------------------------------------------------- change tracking
+def project_changed():
+    """
+    Called when saved project data is changed.
+    """
+    global _changed
+    _changed = True
+
+    # User can only change current sequence.
+    if editorstate.project != None and editorstate.project.c_seq != None:
+        _changed_sequences[id(editorstate.project.c_seq)] = editorstate.project.c_seq
+
+
+# ------------------------------------------------------- autosave
+def autosave(project, file_path):
+    """
+    Starts writing autosave if project has changed since last autosave.
+    Called on GTK thread.
+    """
+    global _changed, _changed_sequences, _autosaves_since_verify, _project_data, _media_data
+    global _sequence_chunks, _last_current_seq, _checkpoint_id, _deltas_count, _write_failed, _writer_thread
+
+    new_project = (project is not _project or file_path != _file_path)
+    if _writer_thread != None and _writer_thread.is_alive():
+        if new_project == False:
+            return # Changes stay flagged and get written on next autosave.
+        _writer_thread.join()
+
+    if new_project == True:
+        _reset(project, file_path)
+
+    _autosaves_since_verify += 1
+    do_verify = (_autosaves_since_verify >= VERIFY_AUTOSAVES_INTERVAL)
+    if _changed == False and _write_failed == False and do_verify == False:
+        return
+
+    # Pickle data now, project may change while thread is writing.
+    pickle_start = time.monotonic()
+    s_proj, media_files = persistance.get_pickleable_project(project)
+    project_data = pickle.dumps(s_proj)
+    media_data = pickle.dumps(media_files)
+
+    # Sequence that was current on last autosave may have been changed before it was switched out.
+    repickle_seqs = [project.c_seq, _last_current_seq] + list(_changed_sequences.values())
+
+    sequence_keys = []
+    changed_sequence_chunks = {}
+    sequence_chunks = {}
+    for seq in project.sequences:
+        key = id(seq)
+        try:
+            chunk_seq, chunk_seq_name, seq_data = _sequence_chunks[key]
+        except KeyError:
+            chunk_seq = None
+
+        if chunk_seq is not seq or chunk_seq_name != seq.name or any(seq is r_seq for r_seq in repickle_seqs):
+            new_seq_data = pickle.dumps(persistance.get_p_sequence(seq))
+            if chunk_seq is not seq or new_seq_data != seq_data:
+                seq_data = new_seq_data
+                changed_sequence_chunks[key] = seq_data
+
+        sequence_keys.append(key)
+        sequence_chunks[key] = (seq, seq.name, seq_data)
+
+    print("Autosave pickling blocked GUI for", int((time.monotonic() - pickle_start) * 1000), "ms")
+
+    project_unchanged = (project_data == _project_data and media_data == _media_data and len(changed_sequence_chunks) == 0
+                         and sequence_keys == list(_sequence_chunks.keys()))
+    do_checkpoint = (new_project or _write_failed or _deltas_count >= DELTAS_PER_CHECKPOINT)
+
+    _project_data = project_data
+    _media_data = media_data
+    _sequence_chunks = sequence_chunks
+    _last_current_seq = project.c_seq
+    _changed = False
+    _changed_sequences = {}
+    _autosaves_since_verify = 0
+
+    if project_unchanged == True and do_checkpoint == False:
+        return
+
+    _write_failed = False
+
+    if do_checkpoint == True:
+        _checkpoint_id += 1
+        _deltas_count = 0
+        chunks = [(persistance.PROJECT_CHUNK, project_data), (persistance.MEDIA_CHUNK, media_data)]
+        for i in range(0, len(sequence_keys)):
+            chunks.append((persistance.SEQUENCE_CHUNK + str(i), sequence_chunks[sequence_keys[i]][2]))
+        chunks.append((AUTOSAVE_CHUNK, pickle.dumps((_checkpoint_id, sequence_keys))))
+        _writer_thread = CheckpointWriteThread(file_path, chunks)
+    else:
+        _deltas_count += 1
+        delta_record = (_checkpoint_id, project_data, media_data, sequence_keys, changed_sequence_chunks)
+        _writer_thread = DeltaWriteThread(file_path, delta_record)
+
+    _writer_thread.start()
+
+def wait_for_write():
+    if _writer_thread != None:
+        _writer_thread.join()
+
+def _reset(project, file_path):
+    global _project, _file_path, _deltas_count, _project_data, _media_data, _sequence_chunks, _last_current_seq
+    global _changed, _changed_sequences, _autosaves_since_verify
+    _project = project
+    _file_path = file_path
+    _deltas_count = 0
+    _project_data = None
+    _media_data = None
+    _sequence_chunks = {}
+    _last_current_seq = None
+    _changed = True
+    _changed_sequences = {}
+    _autosaves_since_verify = 0
+
+def _write_error(e):
+    global _write_failed
+    _write_failed = True # Next autosave writes a checkpoint.
+    print("Autosave write FAILED!", e)
+
+
+class CheckpointWriteThread(threading.Thread):
+
+    def __init__(self, file_path, chunks):
+        threading.Thread.__init__(self)
+        self.file_path = file_path
+        self.chunks = chunks
+
+    def run(self):
+        try:
+            persistance.write_pickled_chunks(self.file_path, self.chunks)
+            delete_deltas_file(self.file_path)
+        except Exception as e:
+            _write_error(e)
+
+
+class DeltaWriteThread(threading.Thread):
+
+    def __init__(self, file_path, delta_record):
+        threading.Thread.__init__(self)
+        self.file_path = file_path
+        self.delta_record = delta_record
+
+    def run(self):
+        try:
+            with open(self.file_path + DELTAS_FILE_EXTENSION, "ab") as f:
+                pickle.dump(self.delta_record, f)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            _write_error(e)
+
+
+# ------------------------------------------------------- recovery
+def replay_deltas(file_path):
+    """
+    Writes delta records into checkpoint file so that it can be loaded as a project file.
+    """
+    deltas_path = file_path + DELTAS_FILE_EXTENSION
+    if not os.path.exists(deltas_path):
+        return
+
+    chunks = persistance.read_pickled_chunks(file_path)
+    if chunks == None or AUTOSAVE_CHUNK not in chunks:
+        # File was overwritten by a full save, deltas are obsolete.
+        os.remove(deltas_path)
+        return
+
+    checkpoint_id, sequence_keys = pickle.loads(chunks[AUTOSAVE_CHUNK])
+    project_data = chunks[persistance.PROJECT_CHUNK]
+    media_data = chunks[persistance.MEDIA_CHUNK]
+    sequence_chunks = {}
+    for i in range(0, len(sequence_keys)):
+        sequence_chunks[sequence_keys[i]] = chunks[persistance.SEQUENCE_CHUNK + str(i)]
+
+    records_count = 0
+    with open(deltas_path, "rb") as f:
+        while True:
+            try:
+                record = pickle.load(f)
+            except Exception:
+                break # End of file, or last record was partially written when crash happened.
+
+            record_checkpoint_id, project_data_r, media_data_r, sequence_keys_r, changed_sequence_chunks = record
+            if record_checkpoint_id != checkpoint_id:
+                continue # Written before checkpoint was written.
+
+            project_data = project_data_r
+            media_data = media_data_r
+            sequence_keys = sequence_keys_r
+            sequence_chunks.update(changed_sequence_chunks)
+            records_count += 1
+
+    chunks = [(persistance.PROJECT_CHUNK, project_data), (persistance.MEDIA_CHUNK, media_data)]
+    for i in range(0, len(sequence_keys)):
+        chunks.append((persistance.SEQUENCE_CHUNK + str(i), sequence_chunks[sequence_keys[i]]))
+    persistance.write_pickled_chunks(file_path, chunks)
+    os.remove(deltas_path)
+
+    print("Autosave deltas replayed:", records_count)
+
+def delete_autosave(file_path):
+    os.remove(file_path)
+    delete_deltas_file(file_path)
+
+def delete_deltas_file(file_path):
+    try:
+        os.remove(file_path + DELTAS_FILE_EXTENSION)
+    except FileNotFoundError:
+        pass
+
+def is_deltas_file(file_path):
+    return file_path.endswith(DELTAS_FILE_EXTENSION)
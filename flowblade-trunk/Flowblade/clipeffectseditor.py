@@ -31,6 +31,7 @@ import time
 
 import appconsts
 import atomicfile
+import autosaving
 import dialogs
 import dialogutils
 import edit
@@ -462,6 +463,7 @@ def toggle_all_pressed():
         filter_object = clip.filters[i]
         filter_object.active = (filter_object.active == False)
         filter_object.update_mlt_disabled_value()
+    autosaving.project_changed()
     
     update_stack_view()
 
@@ -478,6 +480,7 @@ def toggle_filter_active(row, update_stack_view=True):
     filter_object = clip.filters[row]
     filter_object.active = (filter_object.active == False)
     filter_object.update_mlt_disabled_value()
+    autosaving.project_changed()
     if update_stack_view == True:
         update_stack_view_changed_blocked()
 
@@ -875,6 +878,8 @@ class PropertyChangePollingThread(threading.Thread):
                 if changed:
                     global filter_changed_since_last_save
                     filter_changed_since_last_save = True
+                    autosaving.project_changed()
+                    tlinerender.clip_content_changed(clip)
                     tlinerender.get_renderer().timeline_changed()
 
                 self.last_properties = new_properties
@@ -36,6 +36,7 @@ import time
 import audiowaveform
 import audiosync
 import appconsts
+import autosaving
 import clipeffectseditor
 import compositeeditor
 import containerclip
@@ -116,10 +117,14 @@ def _compositor_menu_item_activated(widget, data):
 def _delete_compositors(data):
     clip, track, item_id, x = data
     compositors = current_sequence().get_clip_compositors(clip)
-    for compositor in compositors:
-        data = {"compositor":compositor}
-        action = edit.delete_compositor_action(data)
-        action.do_edit()
+    edit.begin_transaction()
+    try:
+        for compositor in compositors:
+            data = {"compositor":compositor}
+            action = edit.delete_compositor_action(data)
+            action.do_edit()
+    finally:
+        edit.commit_transaction()
     
 def _open_clip_in_effects_editor(data):
     updater.open_clip_in_effects_editor(data)
@@ -178,6 +183,7 @@ def _rename_clip_edited(dialog, response_id, data):
         return
 
     clip.name = new_text
+    autosaving.project_changed()
     updater.repaint_tline()
 
 def _clip_color(data):
@@ -607,6 +613,7 @@ def _clip_marker_add_dialog_callback(dialog, response_id, name_entry, data):
 
     clip.markers.append((name, clip_frame))
     clip.markers = sorted(clip.markers, key=itemgetter(1))
+    autosaving.project_changed()
     updater.repaint_tline()
 
 def _go_to_clip_marker(data):
@@ -633,11 +640,13 @@ def _delete_clip_marker(data):
             mrk_index = i
     if mrk_index != -1:
         clip.markers.pop(mrk_index)
+        autosaving.project_changed()
         updater.repaint_tline()
 
 def _delete_all_clip_markers(data):
     clip, track, item_id, item_data = data
     clip.markers = []
+    autosaving.project_changed()
     updater.repaint_tline()
 
 def _volume_keyframes(data):
@@ -30,6 +30,7 @@ import time
 
 import appconsts
 import atomicfile
+import autosaving
 import compositorfades
 import dialogs
 import dialogutils
@@ -406,6 +407,7 @@ class PropertyChangePollingThread(threading.Thread):
                 if changed:
                     global compositor_changed_since_last_save
                     compositor_changed_since_last_save = True
+                    autosaving.project_changed()
                     tlinerender.get_renderer().timeline_changed()
 
                 self.last_properties = new_properties
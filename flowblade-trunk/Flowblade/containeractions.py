@@ -46,6 +46,7 @@ from editorstate import PROJECT
 import gui
 import gmicheadless
 import gmicplayer
+import headlessworker
 import jobs
 import mltprofiles
 import mltxmlheadless
@@ -476,13 +477,7 @@ class GMicContainerActions(AbstractContainerActionObject):
                 "profile_desc:" + PROJECT().profile.description().replace(" ", "_"),  # This is going through Popen shell=True and needs escaped spaces.
                 "gmic_frame_offset:" + str(gmic_frame_offset))
 
-        # Run with nice to lower priority if requested (currently hard coded to lower)
-        nice_command = "nice -n " + str(10) + " " + respaths.LAUNCH_DIR + "flowbladegmicheadless"
-        for arg in args:
-            nice_command += " "
-            nice_command += arg
-
-        subprocess.Popen([nice_command], shell=True)
+        headlessworker.launch_render(headlessworker.GMIC_JOB, args)
 
     def update_render_status(self):
         
@@ -525,7 +520,7 @@ class GMicContainerActions(AbstractContainerActionObject):
                     job_msg.progress = float(frame)/float(render_length)
                     
                     if job_msg.progress < 0.0:
-                        # hack to fix how gmiplayer.FramesRangeWriter works.
+                        # hack to fix progress when frame numbers are offset.
                         # We would need to patch to G'mic Tool to not need this but this is easier.
                         job_proxy.progress = 1.0
 
@@ -606,13 +601,7 @@ class MLTXMLContainerActions(AbstractContainerActionObject):
                 "profile_desc:" + PROJECT().profile.description().replace(" ", "_"),
                 "xml_file_path:" + str(self.container_data.unrendered_media).replace(" ", "\ "))   # This is going through Popen shell=True and needs escaped spaces.
 
-        # Run with nice to lower priority if requested (currently hard coded to lower)
-        nice_command = "nice -n " + str(10) + " " + respaths.LAUNCH_DIR + "flowblademltxmlheadless"
-        for arg in args:
-            nice_command += " "
-            nice_command += arg
-        
-        subprocess.Popen([nice_command], shell=True)
+        headlessworker.launch_render(headlessworker.MLT_XML_JOB, args)
 
     def update_render_status(self):
 
@@ -28,6 +28,7 @@ EditAction objects and placing them on the undo/redo stack.
 import copy
 
 import appconsts
+import autosaving
 import clipeffectseditor
 import compositeeditor
 import compositorfades
@@ -53,6 +54,10 @@ do_gui_update = False
 # Flag for doing edits since last save
 edit_done_since_last_save = False
 
+# Edits done between begin_transaction() and commit_transaction() are collected here.
+_transaction_actions = None
+_transaction_depth = 0
+
 
 # ---------------------------------- atomic edit ops
 def append_clip(track, clip, clip_in, clip_out):
@@ -63,6 +68,7 @@ def append_clip(track, clip, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.append(clip) # py
     track.append(clip, clip_in, clip_out) # mlt
+    track.sequence.clip_added_to_index(clip, track)
     resync.clip_added_to_timeline(clip, track)
 
 def _insert_clip(track, clip, index, clip_in, clip_out):
@@ -73,6 +79,7 @@ def _insert_clip(track, clip, index, clip_in, clip_out):
     clip.clip_out = clip_out
     track.clips.insert(index, clip) # py
     track.insert(clip, index, clip_in, clip_out) # mlt
+    track.sequence.clip_added_to_index(clip, track)
     resync.clip_added_to_timeline(clip, track)
 
 def _insert_blank(track, index, length):
@@ -83,6 +90,7 @@ def _insert_blank(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    track.sequence.clip_added_to_index(blank_clip, track)
     
 def _remove_clip(track, index):
     """
@@ -90,6 +98,7 @@ def _remove_clip(track, index):
     """
     track.remove(index)
     clip = track.clips.pop(index)
+    track.sequence.clip_removed_from_index(clip, track)
     resync.clip_removed_from_timeline(clip)
     
     return clip
@@ -130,6 +139,7 @@ def _add_blank_to_py(track, index, length):
     blank_clip.clip_out = length - 1 # -1, end inclusive
     blank_clip.is_blanck_clip = True
     track.clips.insert(index, blank_clip)
+    track.sequence.clip_added_to_index(blank_clip, track)
     return blank_clip
 
 # --------------------------------- util methods
@@ -332,6 +342,10 @@ class EditAction:
         self.clear_effects_editor_for_multitrack_edit = False  
 
     def do_edit(self):
+        if _transaction_actions != None:
+            self._do_transaction_edit()
+            return
+
         if self.exit_active_trimmode_on_edit:
             trimmodes.set_no_edit_trim_mode()
 
@@ -361,6 +375,23 @@ class EditAction:
             if do_gui_update:
                 self._update_gui()
 
+    def _do_transaction_edit(self):
+        # Only changes to tracks are done here, sync states, timeline render, autofollow
+        # and GUI are updated once when transaction is committed.
+        if self.exit_active_trimmode_on_edit:
+            trimmodes.set_no_edit_trim_mode()
+
+        PLAYER().stop_playback()
+        movemodes.clear_selected_clips()
+
+        self.redo_func(self)
+
+        _consolidate_all_blanks_redo(self)
+        _remove_trailing_blanks_redo(self)
+
+        tlinerender.edit_action_done(self)
+        _transaction_actions.append(self)
+
     def undo(self):
         PLAYER().stop_playback()
 
@@ -378,7 +409,9 @@ class EditAction:
 
         resync.calculate_and_set_child_clip_sync_states()
 
+        tlinerender.edit_action_done(self)
         tlinerender.get_renderer().timeline_changed()
+        autosaving.project_changed()
         
         if self.compositor_autofollow_data != None:
             do_autofollow_undo(self)
@@ -412,7 +445,9 @@ class EditAction:
 
         resync.calculate_and_set_child_clip_sync_states()
 
+        tlinerender.edit_action_done(self)
         tlinerender.get_renderer().timeline_changed()
+        autosaving.project_changed()
         
         if self.compositor_autofollow_data != None: # This is not called from do_edit() if these exist, we need to do auto follow and orphan compositos management
             do_autofollow_redo(self)
@@ -458,6 +493,74 @@ class EditAction:
         updater.update_seqence_info_text()
 
 
+# ---------------------------------------------------- edit transactions
+def begin_transaction():
+    """
+    Starts collecting edits into a transaction that is registered as a single undoable edit
+    by commit_transaction(). Edits are done when their do_edit() is called, but global updates
+    after edits are done only once on commit. Nested transactions join the outermost one.
+    """
+    global _transaction_actions, _transaction_depth
+    if _transaction_depth == 0:
+        _transaction_actions = []
+    _transaction_depth += 1
+
+def commit_transaction():
+    """
+    Ends transaction and returns EditAction for its edits, or None if no edits were done
+    or transaction is nested.
+    """
+    global _transaction_actions, _transaction_depth
+    _transaction_depth -= 1
+    if _transaction_depth > 0:
+        return None
+
+    actions = _transaction_actions
+    _transaction_actions = None
+    if len(actions) == 0:
+        return None
+
+    data = {"actions":actions,
+            "first_do":True}
+    action = EditAction(_transaction_undo, _transaction_redo, data)
+
+    # Flags set by edits apply to transaction.
+    for sub_action in actions:
+        if sub_action.exit_active_trimmode_on_edit == False:
+            action.exit_active_trimmode_on_edit = False
+        if sub_action.turn_on_stop_for_edit == True:
+            action.turn_on_stop_for_edit = True
+        if sub_action.update_hidden_track_blank == False:
+            action.update_hidden_track_blank = False
+        if sub_action.clear_effects_editor_for_multitrack_edit == True:
+            action.clear_effects_editor_for_multitrack_edit = True
+        if sub_action.do_restack_compositors == True:
+            action.do_restack_compositors = True
+
+    action.do_edit()
+    return action
+
+def _transaction_undo(self):
+    for action in reversed(self.actions):
+        _remove_trailing_blanks_undo(action)
+        _consolidate_all_blanks_undo(action)
+        action.undo_func(action)
+        _remove_all_trailing_blanks(None)
+        tlinerender.edit_action_done(action)
+
+def _transaction_redo(self):
+    if self.first_do == True:
+        # Edits were done when they were added to transaction.
+        self.first_do = False
+        return
+
+    for action in self.actions:
+        action.redo_func(action)
+        _consolidate_all_blanks_redo(action)
+        _remove_trailing_blanks_redo(action)
+        tlinerender.edit_action_done(action)
+
+
 # ---------------------------------------------------- compositor sync methods
 def get_full_compositor_sync_data():
     # Returns list of tuples in form (compositor, orig_in, orig_out, clip_start, clip_end)
@@ -35,9 +35,12 @@ PREFS_DOC = "prefs"
 RECENT_DOC = "recent"
 
 MAX_RECENT_PROJS = 15
-UNDO_STACK_DEFAULT = 30
+UNDO_STACK_DEFAULT = 200
 UNDO_STACK_MIN = 10
-UNDO_STACK_MAX = 100
+UNDO_STACK_MAX = 1000
+UNDO_MEMORY_DEFAULT = 256 # MB
+UNDO_MEMORY_MIN = 32
+UNDO_MEMORY_MAX = 4096
 
 GLASS_STYLE = 0
 SIMPLE_STYLE = 1
@@ -174,7 +177,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
 
     # Aug-2019 - SvdB - AS - added autosave_combo
     default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check, undo_max_spin, load_order_combo, \
-        autosave_combo, render_folder_select, disk_cache_warning_combo = gen_opts_widgets
+        autosave_combo, render_folder_select, disk_cache_warning_combo, undo_memory_spin = gen_opts_widgets
 
     # Jul-2016 - SvdB - Added play_pause_button
     # Apr-2017 - SvdB - Added ffwd / rev values
@@ -199,6 +202,7 @@ def update_prefs_from_widgets(widgets_tuples_tuple):
     prefs.remember_last_render_dir = open_in_last_rendered_check.get_active()
     prefs.default_profile_name = mltprofiles.get_profile_name_for_index(default_profile_combo.get_active())
     prefs.undos_max = undo_max_spin.get_adjustment().get_value()
+    prefs.undo_memory_max = int(undo_memory_spin.get_adjustment().get_value())
     prefs.media_load_order = load_order_combo.get_active()
 
     prefs.auto_center_on_play_stop = auto_center_check.get_active()
@@ -265,6 +269,7 @@ class EditorPreferences:
         self.img_length = 2000
         self.auto_save_delay_value_index = 1 # value is index of AUTO_SAVE_OPTS in preferenceswindow._general_options_panel()
         self.undos_max = UNDO_STACK_DEFAULT
+        self.undo_memory_max = UNDO_MEMORY_DEFAULT # MB, oldest undos are removed when estimated undo memory use is larger.
         self.default_profile_name = 10 # index of default profile
         self.auto_play_in_clip_monitor = False  # DEPRECATED, NOT USER SETTABLE ANYMORE
         self.auto_center_on_play_stop = False
@@ -347,6 +352,12 @@ class EditorPreferences:
         self.default_render_directory = appconsts.USER_HOME_DIR
         self.tline_render_encoding = 0 # index of available proxy encodings, timeline rendering uses same encodings.
         self.tline_render_size = appconsts.PROXY_SIZE_FULL
+        self.tline_render_workers = 0 # 0 means one worker per CPU core.
+        self.tline_render_cache_size = 2048 # MB, rendered segments are kept between sessions up to this size.
+        self.img_seq_proxy_format = appconsts.IMG_SEQ_PROXY_PNG
+        self.thumb_tile_cache_size = 512 # MB, timeline filmstrip and trim view thumbnail tiles are kept between sessions up to this size.
         self.open_jobs_panel_on_add = True
-        self.render_jobs_sequentially = True
+        self.render_jobs_sequentially = True # Not used, jobs_max_concurrent sets how many jobs run at the same time.
+        self.jobs_max_concurrent = 0 # 0 means half of CPU cores.
+        self.jobs_type_slots = {} # job type -> max concurrent jobs of type, overrides jobs.DEFAULT_JOB_TYPE_SLOTS
         self.disk_space_warning = 1 #  [off, 500MB,1GB, 2GB], see preferenceswindow.py
@@ -1634,7 +1634,7 @@ def display_clip_popup_menu(event, clip, track, callback):
     if editorstate.display_all_audio_levels == False:
         _add_separetor(clip_menu)
 
-        if clip.waveform_data == None:
+        if clip.waveform_data is None:
            clip_menu.add(_get_menu_item(_("Display Audio Level"), callback,\
                       (clip, track, "display_waveform", event.x), True))
         else:
@@ -1788,7 +1788,7 @@ def display_audio_clip_popup_menu(event, clip, track, callback):
 
     _add_separetor(clip_menu)
 
-    if clip.waveform_data == None:
+    if clip.waveform_data is None:
        clip_menu.add(_get_menu_item(_("Display Audio Level"), callback,\
                   (clip, track, "display_waveform", event.x), True))
     else:
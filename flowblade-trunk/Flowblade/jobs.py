@@ -24,17 +24,19 @@ from gi.repository import GObject
 from gi.repository import Pango
 
 import copy
+import multiprocessing
 import os
-import subprocess
 import time
 import threading
 
 import appconsts
+import ccrutils
 import editorpersistance
 from editorstate import PROJECT
 import gui
 import guicomponents
 import guiutils
+import headlessworker
 import motionheadless
 import persistance
 import proxyheadless
@@ -54,6 +56,28 @@ CONTAINER_CLIP_RENDER_BLENDER = 3
 MOTION_MEDIA_ITEM_RENDER = 4
 PROXY_RENDER = 5
 
+LOW_PRIORITY = 0
+NORMAL_PRIORITY = 1
+HIGH_PRIORITY = 2
+
+# Max concurrent jobs per job type, prefs.jobs_type_slots can override these.
+# Proxy renders are mostly limited by disk I/O, G'MIC and Blender renders use all cores.
+DEFAULT_JOB_TYPE_SLOTS = {  CONTAINER_CLIP_RENDER_GMIC:1,
+                            CONTAINER_CLIP_RENDER_MLT_XML:2,
+                            CONTAINER_CLIP_RENDER_BLENDER:1,
+                            MOTION_MEDIA_ITEM_RENDER:2,
+                            PROXY_RENDER:2}
+
+MAX_CONCURRENT_JOBS_OPTIONS = [0, 1, 2, 4, 8] # 0 is auto
+
+# Queued jobs are not started if system is this loaded and some jobs are already running.
+MAX_LOAD_AVERAGE_PER_CORE = 1.0
+MAX_IO_PRESSURE = 40.0 # percentage of time tasks waited for I/O during last 10 seconds
+
+# Render processes push status through status channels, message files are polled 
+# this often in case channel messages get lost.
+FALLBACK_STATUS_POLL_INTERVAL = 5.0 # seconds
+
 open_media_file_callback = None
 
 _status_polling_thread = None
@@ -70,6 +94,8 @@ jobs_notebook_index = 4 # 4 for single window, app.py sets to 3 for two windows
 
 _jobs_render_progress_window = None
 
+_status_updates_pending = set() # session ids with status update waiting to be done on GTK thread
+
 
 class JobProxy: # This object represnts job in job queue. 
 
@@ -81,6 +107,7 @@ class JobProxy: # This object represnts job in job queue.
         self.progress = 0.0 # 0.0. - 1.0
         self.text = ""
         self.elapsed = 0.0 # in fractional seconds
+        self.priority = NORMAL_PRIORITY
 
         # callback_object have to implement interface:
         #     start_render()
@@ -136,12 +163,8 @@ def add_job(job_proxy):
     if editorpersistance.prefs.open_jobs_panel_on_add == True:
         gui.middle_notebook.set_current_page(jobs_notebook_index)
     
-    if editorpersistance.prefs.render_jobs_sequentially == False: # Feature not active for first release 2.6.
-        job_proxy.start_render()
-    else:
-         running = _get_jobs_with_status(RENDERING)
-         if len(running) == 0:
-             job_proxy.start_render()
+    job_proxy.status = QUEUED
+    _schedule_jobs()
 
     # Get polling going if needed.
     global _status_polling_thread
@@ -178,9 +201,8 @@ def update_job_queue(job_msg): # We're using JobProxy objects as messages to upd
         _jobs[row].progress = 1.0
         _remove_list.append(_jobs[row])
         GObject.timeout_add(4000, _remove_jobs)
-        waiting_jobs = _get_jobs_with_status(QUEUED)
-        if len(waiting_jobs) > 0:
-            waiting_jobs[0].start_render()
+        ccrutils.close_status_channel(_jobs[row].proxy_uid)
+        _schedule_jobs()
     else:
         _jobs[row].status = job_msg.status
 
@@ -197,11 +219,34 @@ def update_job_queue(job_msg): # We're using JobProxy objects as messages to upd
 def get_jobs_of_type(job_type):
     jobs_of_type = []
     for job in _jobs:
-        job.type = job_type
-        jobs_of_type.append(job)
+        if job.type == job_type:
+            jobs_of_type.append(job)
     
     return jobs_of_type
 
+def set_job_priority(job_proxy, priority):
+    job_proxy.priority = priority
+    _schedule_jobs()
+
+def move_job(job_proxy, delta):
+    # Jobs with same priority are started in list order.
+    index = _jobs.index(job_proxy)
+    new_index = max(0, min(len(_jobs) - 1, index + delta))
+    _jobs.pop(index)
+    _jobs.insert(new_index, job_proxy)
+    _jobs_list_view.fill_data_model()
+
+def get_max_concurrent_jobs():
+    if editorpersistance.prefs.jobs_max_concurrent > 0:
+        return editorpersistance.prefs.jobs_max_concurrent
+    return max(1, multiprocessing.cpu_count() // 2)
+
+def get_job_type_slots(job_type):
+    try:
+        return editorpersistance.prefs.jobs_type_slots[job_type]
+    except KeyError:
+        return DEFAULT_JOB_TYPE_SLOTS.get(job_type, 1)
+
 def proxy_render_ongoing():
     proxy_jobs = get_jobs_of_type(PROXY_RENDER)
     if len(proxy_jobs) == 0:
@@ -244,6 +289,34 @@ def _menu_action_pressed(widget, event):
     
     guiutils.add_separetor(menu)
 
+    menu.add(guiutils.get_menu_item(_("Render Selected Job Next"), _hamburger_item_activated, "render_next"))
+    menu.add(guiutils.get_menu_item(_("Move Selected Job Up"), _hamburger_item_activated, "move_up"))
+    menu.add(guiutils.get_menu_item(_("Move Selected Job Down"), _hamburger_item_activated, "move_down"))
+
+    guiutils.add_separetor(menu)
+
+    concurrent_menu_item = Gtk.MenuItem(_("Max Concurrent Jobs"))
+    concurrent_menu = Gtk.Menu()
+    first_item = None
+    for max_jobs in MAX_CONCURRENT_JOBS_OPTIONS:
+        if max_jobs == 0:
+            label = _("Auto")
+        else:
+            label = str(max_jobs)
+        if first_item == None:
+            concurrent_item = Gtk.RadioMenuItem()
+            concurrent_item.set_label(label)
+            first_item = concurrent_item
+        else:
+            concurrent_item = Gtk.RadioMenuItem.new_with_label([first_item], label)
+        concurrent_item.set_active(editorpersistance.prefs.jobs_max_concurrent == max_jobs)
+        concurrent_item.connect("activate", _hamburger_item_activated, "max_concurrent_" + str(max_jobs))
+        concurrent_menu.append(concurrent_item)
+    concurrent_menu_item.set_submenu(concurrent_menu)
+    menu.add(concurrent_menu_item)
+    
+    guiutils.add_separetor(menu)
+
     """ Not settable for 2.6, let's see later
     sequential_render_item = Gtk.CheckMenuItem()
     sequential_render_item.set_label(_("Render All Jobs Sequentially"))
@@ -262,12 +335,35 @@ def _menu_action_pressed(widget, event):
     menu.popup(None, None, None, None, event.button, event.time)
 
 def _hamburger_item_activated(widget, msg):
-    if msg == "cancel_all":
-        global _jobs, _remove_list
+    global _jobs, _remove_list
+    if msg == "render_next" or msg == "move_up" or msg == "move_down":
+        try:
+            jobs_list_index = _jobs_list_view.get_selected_row_index()
+        except:
+            return # nothing was selected
+
+        job = _jobs[jobs_list_index]
+        if msg == "render_next":
+            move_job(job, -jobs_list_index)
+            set_job_priority(job, HIGH_PRIORITY)
+        elif msg == "move_up":
+            move_job(job, -1)
+        else:
+            move_job(job, 1)
+
+    elif msg.startswith("max_concurrent_"):
+        if widget.get_active() == False:
+            return
+        editorpersistance.prefs.jobs_max_concurrent = int(msg[len("max_concurrent_"):])
+        editorpersistance.save()
+        _schedule_jobs()
+
+    elif msg == "cancel_all":
         _remove_list = []
         for job in _jobs:
             if job.status == RENDERING:
                 job.abort_render()
+            ccrutils.close_status_channel(job.proxy_uid)
             job.progress = -1.0
             job.text = _("Cancelled")
             job.status = CANCELLED
@@ -285,6 +381,7 @@ def _hamburger_item_activated(widget, msg):
         
         job = _jobs[jobs_list_index]
         job.abort_render()
+        ccrutils.close_status_channel(job.proxy_uid)
         job.progress = -1.0
         job.text = _("Cancelled")
         job.status = CANCELLED
@@ -293,6 +390,7 @@ def _hamburger_item_activated(widget, msg):
         _jobs_list_view.fill_data_model()
         _jobs_list_view.scroll.queue_draw()
         GObject.timeout_add(4000, _remove_jobs)
+        _schedule_jobs()
         
     elif msg == "open_on_add":
         editorpersistance.prefs.open_jobs_panel_on_add = widget.get_active()
@@ -302,6 +400,74 @@ def _hamburger_item_activated(widget, msg):
         editorpersistance.prefs.render_jobs_sequentially = widget.get_active()
         editorpersistance.save()
 
+def _schedule_jobs():
+    # Starts queued jobs if concurrency limits and system load allow it. 
+    # Called with Gdk lock held.
+    running = _get_jobs_with_status(RENDERING)
+    queued = _get_jobs_with_status(QUEUED)
+    queued.sort(key=lambda job: -job.priority) # stable sort keeps list order for same priority jobs
+
+    for job in queued:
+        if len(running) >= get_max_concurrent_jobs():
+            return
+
+        running_of_type = [running_job for running_job in running if running_job.type == job.type]
+        if len(running_of_type) >= get_job_type_slots(job.type):
+            continue # Job types without free slots do not block other types.
+
+        # At least one job is always running if any are queued.
+        if len(running) > 0 and _system_load_allows_job_start() == False:
+            return
+
+        job.status = RENDERING
+        ccrutils.open_status_channel(job.proxy_uid, _job_status_received)
+        job.start_render()
+        running.append(job)
+
+def _job_status_received(session_id):
+    # Called from status channel listener thread, many messages for a job may arrive before GUI gets updated.
+    if session_id in _status_updates_pending:
+        return
+    _status_updates_pending.add(session_id)
+    GLib.idle_add(_update_job_status, session_id)
+
+def _update_job_status(session_id):
+    _status_updates_pending.discard(session_id)
+    for job in _jobs:
+        if job.proxy_uid == session_id and job.status == RENDERING:
+            job.callback_object.update_render_status() # These methods enter/exit Gtk threads.
+    return False
+
+def _system_load_allows_job_start():
+    cpu_count = multiprocessing.cpu_count()
+    try:
+        if os.getloadavg()[0] > cpu_count * MAX_LOAD_AVERAGE_PER_CORE:
+            return False
+    except OSError:
+        pass
+
+    io_pressure = _get_io_pressure()
+    if io_pressure != None and io_pressure > MAX_IO_PRESSURE:
+        return False
+
+    return True
+
+def _get_io_pressure():
+    # Linux pressure stall information, not available on all kernels.
+    try:
+        with open("/proc/pressure/io") as f:
+            for line in f:
+                tokens = line.split()
+                if tokens[0] == "some":
+                    for token in tokens[1:]:
+                        name, value = token.split("=")
+                        if name == "avg10":
+                            return float(value)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return None
+
 def _get_jobs_with_status(status):
     running = []
     for job in _jobs:
@@ -482,13 +648,7 @@ class MotionRenderJobQueueObject(AbstractJobQueueObject):
         job_msg.status = RENDERING
         update_job_queue(job_msg)
         
-        # Run with nice to lower priority if requested (currently hard coded to lower)
-        nice_command = "nice -n " + str(10) + " " + respaths.LAUNCH_DIR + "flowblademotionheadless"
-        for arg in self.args:
-            nice_command += " "
-            nice_command += arg
-
-        subprocess.Popen([nice_command], shell=True)
+        headlessworker.launch_render(headlessworker.MOTION_JOB, self.args)
 
     def update_render_status(self):
 
@@ -552,18 +712,8 @@ class ProxyRenderJobQueueObject(AbstractJobQueueObject):
         job_msg.status = RENDERING
         update_job_queue(job_msg)
         
-        # Run with nice to lower priority if requested (currently hard coded to lower)
-        nice_command = "nice -n " + str(10) + " " + respaths.LAUNCH_DIR + "flowbladeproxyheadless"
-        args = self.render_data.get_data_as_args_tuple()
-        for arg in args:
-            nice_command += " "
-            nice_command += arg
-
-        session_arg = "session_id:" + str(self.session_id)
-        nice_command += " "
-        nice_command += session_arg
-                
-        subprocess.Popen([nice_command], shell=True)
+        args = self.render_data.get_data_as_args_tuple() + ("session_id:" + str(self.session_id),)
+        headlessworker.launch_render(headlessworker.PROXY_JOB, args)
 
     def update_render_status(self):
 
@@ -582,7 +732,7 @@ class ProxyRenderJobQueueObject(AbstractJobQueueObject):
         else:
             status = proxyheadless.get_session_status(self.get_session_id())
             if status != None:
-                fraction, elapsed = status
+                fraction, elapsed, chunks_info = status
                 
                 self.progress = float(fraction)
                 if self.progress > 1.0:
@@ -590,6 +740,8 @@ class ProxyRenderJobQueueObject(AbstractJobQueueObject):
 
                 self.elapsed = float(elapsed)
                 self.text = _("Rendering Proxy Clip for ") + self.get_job_name()
+                if chunks_info != None:
+                    self.text += ", " + _("chunks done ") + chunks_info
 
                 job_msg = self.get_job_queue_message()
                 
@@ -618,10 +770,8 @@ class ProxyRenderJobQueueObject(AbstractJobQueueObject):
         
             # if the rendered proxy file was the last proxy file being rendered,
             # auto re-convert to update proxy clips.
-            proxy_jobs = get_jobs_of_type(PROXY_RENDER)
-            if len(proxy_jobs) == 0:
-                self.render_data.do_auto_re_convert_func()
-            elif len(proxy_jobs) == 1:
+            unfinished_proxy_jobs = [job for job in get_jobs_of_type(PROXY_RENDER) if job.status == QUEUED or job.status == RENDERING]
+            if len(unfinished_proxy_jobs) == 0:
                 self.render_data.do_auto_re_convert_func()
 
 
@@ -636,12 +786,23 @@ class ContainerStatusPollingThread(threading.Thread):
         threading.Thread.__init__(self)
 
     def run(self):
-
+        last_fallback_poll = time.monotonic()
         while self.abort == False:
-            for job in _jobs:
-                if job.status != QUEUED:
+            # Jobs with status channel get their status pushed. Message files are read every round for jobs 
+            # without channel and for all jobs every FALLBACK_STATUS_POLL_INTERVAL.
+            do_fallback_poll = (time.monotonic() - last_fallback_poll > FALLBACK_STATUS_POLL_INTERVAL)
+            if do_fallback_poll == True:
+                last_fallback_poll = time.monotonic()
+
+            for job in list(_jobs):
+                if job.status == RENDERING and (do_fallback_poll == True or ccrutils.status_channel_open(job.proxy_uid) == False):
                     job.callback_object.update_render_status() # Make sure these methods enter/exit Gtk threads.
 
+            # Queued jobs that were held back because of system load are started when load allows.
+            Gdk.threads_enter()
+            _schedule_jobs()
+            Gdk.threads_leave()
+
             if _jobs_render_progress_window != None and len(_jobs) != 0:
                 _jobs_render_progress_window.update_render_progress()
             elif _jobs_render_progress_window != None and len(_jobs) == 0:
@@ -501,7 +501,7 @@ class TLineKeyFrameEditor:
         ex, ey, ew, eh = self._get_edit_area_rect()
         
         # Maybe draw audio levels
-        if self.edit_type == VOLUME_KF_EDIT and clip.is_blanck_clip == False and clip.waveform_data != None:
+        if self.edit_type == VOLUME_KF_EDIT and clip.is_blanck_clip == False and clip.waveform_data is not None:
 
             cr.set_source_rgba(*AUDIO_LEVELS_COLOR)
         
@@ -27,6 +27,7 @@ import mlt
 import dialogutils
 import editorstate
 import gui
+import startupcache
 
 acodecs = None
 vcodecs = None
@@ -45,6 +46,15 @@ def check_available_features(repo):
         global services
         global transitions
         global environment_detection_success
+        # Detection results are cached because starting consumers to list codecs is slow.
+        cached_features = startupcache.get_data(startupcache.ENV_FEATURES)
+        if cached_features != None:
+            acodecs, vcodecs, formats, services, transitions = cached_features
+            print("MLT environment loaded from cache, " + str(len(formats)) + " formats, "  \
+            + str(len(vcodecs)) + " video codecs and " + str(len(acodecs)) + " audio codecs.")
+            environment_detection_success = True
+            return
+
         acodecs = []
         vcodecs = []
         formats = []
@@ -90,6 +100,7 @@ def check_available_features(repo):
         print(str(len(services)) + " MLT services found.")
 
         environment_detection_success = True
+        startupcache.set_data(startupcache.ENV_FEATURES, (acodecs, vcodecs, formats, services, transitions))
 
     except:
         print("Environment detection failed, environment unknown.")
@@ -36,6 +36,7 @@ from editorstate import PROJECT
 import mltrefhold
 import propertyparse
 import respaths
+import startupcache
 import translations
 
 # Attr and node names in xml describing available filters.
@@ -395,14 +396,19 @@ def load_filters_xml(services):
     
     print("Loading filters...")
     
-    global filters_doc
-    filters_doc = xml.dom.minidom.parse(respaths.FILTERS_XML_DOC)
+    # Parsed filters are cached because parsing XML with minidom is slow.
+    filter_infos = startupcache.get_data(startupcache.FILTER_INFOS)
+    if filter_infos == None:
+        global filters_doc
+        filters_doc = xml.dom.minidom.parse(respaths.FILTERS_XML_DOC)
+        filter_infos = []
+        filter_nodes = filters_doc.getElementsByTagName(FILTER)
+        for f_node in filter_nodes:
+            filter_infos.append(FilterInfo(f_node))
+        startupcache.set_data(startupcache.FILTER_INFOS, filter_infos)
 
     load_groups = {}
-    filter_nodes = filters_doc.getElementsByTagName(FILTER)
-    for f_node in filter_nodes:
-        filter_info = FilterInfo(f_node)
-
+    for filter_info in filter_infos:
         if filter_info.mlt_drop_version != "":
             if editorstate.mlt_version_is_greater_correct(filter_info.mlt_drop_version):
                 print(filter_info.name + " dropped, MLT version too high for this filter.")
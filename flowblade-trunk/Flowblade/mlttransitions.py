@@ -33,6 +33,7 @@ import mltrefhold
 import patternproducer
 import propertyparse
 import respaths
+import startupcache
 
 # Attr and node names in compositors.xml
 NAME = appconsts.NAME
@@ -421,12 +422,19 @@ def load_compositors_xml(transitions):
     Load filters document and create MLTCompositorInfo objects and
     put them in dict mlt_compositor_infos with names as keys.
     """
-    compositors_doc = xml.dom.minidom.parse(respaths.COMPOSITORS_XML_DOC)
-
     print("Loading transitions...")
-    compositor_nodes = compositors_doc.getElementsByTagName(COMPOSITOR)
-    for c_node in compositor_nodes:
-        compositor_info = CompositorTransitionInfo(c_node)
+
+    # Parsed compositors are cached because parsing XML with minidom is slow.
+    compositor_infos = startupcache.get_data(startupcache.COMPOSITOR_INFOS)
+    if compositor_infos == None:
+        compositors_doc = xml.dom.minidom.parse(respaths.COMPOSITORS_XML_DOC)
+        compositor_infos = []
+        compositor_nodes = compositors_doc.getElementsByTagName(COMPOSITOR)
+        for c_node in compositor_nodes:
+            compositor_infos.append(CompositorTransitionInfo(c_node))
+        startupcache.set_data(startupcache.COMPOSITOR_INFOS, compositor_infos)
+
+    for compositor_info in compositor_infos:
         if (not compositor_info.mlt_service_id in transitions) and len(transitions) > 0:
             print("MLT transition " + compositor_info.mlt_service_id + " not found.")
             global not_found_transitions
@@ -21,8 +21,8 @@ from gi.repository import Gdk
 from gi.repository import Gtk, GLib
 
 import cairo
+import collections
 import mlt
-import numpy as np
 import os
 import threading
 import time
@@ -33,8 +33,8 @@ import editorstate
 from editorstate import PLAYER
 from editorstate import PROJECT
 import respaths
+import thumbtiles
 import utils
-import userfolders
 
 """
 Module is used to display trim views for Trim, Roll and Slip tools and selected match frames.
@@ -53,8 +53,6 @@ TC_LEFT_SIDE_PAD = 172
 TC_RIGHT_SIDE_PAD = 28
 TC_HEIGHT = 27
         
-MATCH_FRAME = "match_frame.png"
-
 MONITOR_INDICATOR_COLOR = utils.get_cairo_color_tuple_255_rgb(71, 131, 169)
 MONITOR_INDICATOR_COLOR_MATCH = utils.get_cairo_color_tuple_255_rgb(21, 71, 105)
 
@@ -62,15 +60,16 @@ FRAME_MATCH_VIEW_COLOR = (0.3, 0.3, 0.3)
 
 # Continuos match frame update
 CONTINUOS_UPDATE_PAUSE = 0.2
+MAX_CACHED_MATCH_FRAMES = 16
 _last_render_time = 0.0
 _producer = None
-_consumer = None
+_producer_path = None
+_match_frames = collections.OrderedDict() # (clip path, frame, size) -> cairo surface, least recently used first
+_match_frames_lock = threading.Lock()
 _frame_write_on = False
             
 _widget = None
 
-def _get_match_frame_path():
-    return userfolders.get_cache_dir() + appconsts.TRIM_VIEW_DIR + "/" + MATCH_FRAME
         
 class MonitorWidget:
     
@@ -168,13 +167,6 @@ class MonitorWidget:
         if PLAYER().is_rendering:
             return
 
-        # Delete match frame
-        try:
-            os.remove(_get_match_frame_path())
-        except:
-            # This fails when done first time ever  
-            pass
-        
         self.match_frame_surface = None
                 
         self.view = DEFAULT_VIEW
@@ -194,13 +186,6 @@ class MonitorWidget:
         if PLAYER().is_rendering:
             return
 
-        # Delete match frame
-        try:
-            os.remove(_get_match_frame_path())
-        except:
-            # This fails when done first time ever  
-            pass
-        
         self.match_frame_surface = None
                 
         self.view = FRAME_MATCH_VIEW
@@ -212,8 +197,7 @@ class MonitorWidget:
         self.clip_name = cname
         self.match_frame = frame
         
-        match_frame_write_thread = MonitorMatchFrameWriter(match_clip.path, frame, 
-                                                            MATCH_FRAME, self.match_frame_write_complete)
+        match_frame_write_thread = MonitorMatchFrameWriter(match_clip.path, frame, self.match_frame_write_complete)
                                         
         match_frame_write_thread.start()
         
@@ -251,7 +235,7 @@ class MonitorWidget:
 
         self.match_frame = match_clip.clip_out
         self.match_not_updateble = False
-        data = (match_clip.path, match_clip.clip_out, MATCH_FRAME, self.match_frame_write_complete)
+        data = (match_clip.path, match_clip.clip_out, self.match_frame_write_complete)
         GLib.idle_add(_launch_match_frame_writer, data)
         
     def set_end_trim_view(self, match_clip, edit_clip_start):
@@ -288,7 +272,7 @@ class MonitorWidget:
             
         self.match_frame = match_clip.clip_in
         self.match_not_updateble = False
-        data = (match_clip.path, match_clip.clip_in, MATCH_FRAME, self.match_frame_write_complete)
+        data = (match_clip.path, match_clip.clip_in, self.match_frame_write_complete)
         GLib.idle_add(_launch_match_frame_writer, data)
         
     def set_roll_trim_right_active_view(self, match_clip, edit_clip_start):
@@ -325,7 +309,7 @@ class MonitorWidget:
             
         self.match_frame = match_clip.clip_out
         self.match_not_updateble = False
-        data = (match_clip.path, match_clip.clip_out, MATCH_FRAME, self.match_frame_write_complete)
+        data = (match_clip.path, match_clip.clip_out, self.match_frame_write_complete)
         GLib.idle_add(_launch_match_frame_writer, data)
         
     def set_roll_trim_left_active_view(self, match_clip, edit_clip_start):
@@ -362,7 +346,7 @@ class MonitorWidget:
             
         self.match_frame = match_clip.clip_in
         self.match_not_updateble = False
-        data = (match_clip.path, match_clip.clip_in, MATCH_FRAME, self.match_frame_write_complete)
+        data = (match_clip.path, match_clip.clip_in, self.match_frame_write_complete)
         GLib.idle_add(_launch_match_frame_writer, data)
         
     def set_slip_trim_right_active_view(self, match_clip):
@@ -400,7 +384,7 @@ class MonitorWidget:
             return
 
         self.match_not_updateble = False
-        data = (match_clip.path, match_clip.clip_in, MATCH_FRAME, self.match_frame_write_complete)
+        data = (match_clip.path, match_clip.clip_in, self.match_frame_write_complete)
         GLib.idle_add(_launch_match_frame_writer, data)
 
     def set_slip_trim_left_active_view(self, match_clip):
@@ -439,7 +423,7 @@ class MonitorWidget:
             return
 
         self.match_not_updateble = False
-        data = (match_clip.path, match_clip.clip_out, MATCH_FRAME, self.match_frame_write_complete)
+        data = (match_clip.path, match_clip.clip_out, self.match_frame_write_complete)
         GLib.idle_add(_launch_match_frame_writer, data)
         
     # ------------------------------------------------------------------ LAYOUT
@@ -539,8 +523,14 @@ class MonitorWidget:
                 self.set_default_view_force()
             
     # ------------------------------------------------------------------ MATCH FRAME
-    def match_frame_write_complete(self, frame_name):
-        self.match_frame_surface = self.create_match_frame_image_surface(frame_name)
+    def match_frame_write_complete(self, tile_surface):
+        if tile_surface == None:
+            Gdk.threads_enter()
+            self.create_blank_match_frame()
+            Gdk.threads_leave()
+            return
+
+        self.match_frame_surface = self.create_match_frame_image_surface(tile_surface)
         
         Gdk.threads_enter()
         self.left_display.queue_draw()
@@ -575,12 +565,7 @@ class MonitorWidget:
         self.left_display.queue_draw()
         self.right_display.queue_draw()
         
-    def create_match_frame_image_surface(self, frame_name):
-        # Create non-scaled surface
-        matchframe_path = userfolders.get_cache_dir() + appconsts.TRIM_VIEW_DIR + "/" + frame_name 
-        
-        surface = cairo.ImageSurface.create_from_png(matchframe_path)
-
+    def create_match_frame_image_surface(self, surface):
         # Create and return scaled surface
         profile_screen_ratio = float(PROJECT().profile.width()) / float(PROJECT().profile.height())
         match_frame_width, match_frame_height = self.get_match_frame_panel_size()
@@ -594,16 +579,6 @@ class MonitorWidget:
         
         return scaled_surface
     
-    def _get_cairo_buf_from_mlt_rgb(self, screen_rgb_data, img_w, img_h ):
-        buf = np.fromstring(screen_rgb_data, dtype=np.uint8)
-        buf.shape = (img_h + 1, img_w, 4) # +1 in h, seemeed to need it
-        out = np.copy(buf)
-        r = np.index_exp[:, :, 0]
-        b = np.index_exp[:, :, 2]
-        out[r] = buf[b]
-        out[b] = buf[r]
-        return out
-        
     # ------------------------------------------------------------------ DRAW
     def _draw_match_frame_left(self, event, cr, allocation):
         if self.view == END_TRIM_VIEW or self.view == ROLL_TRIM_LEFT_ACTIVE_VIEW:
@@ -858,58 +833,37 @@ class MonitorWidget:
     
 # ---------------------------------------------------------------------------------- match frame cration
 def _launch_match_frame_writer(data):
-    match_clip_path, clip_frame, frame_name, callback = data        
+    match_clip_path, clip_frame, callback = data        
 
-    match_frame_write_thread = MonitorMatchFrameWriter(match_clip_path, clip_frame, frame_name, callback)
+    match_frame_write_thread = MonitorMatchFrameWriter(match_clip_path, clip_frame, callback)
     match_frame_write_thread.start()
 
 
 class MonitorMatchFrameWriter(threading.Thread):
-    def __init__(self, clip_path, clip_frame, frame_name, completion_callback):
+    def __init__(self, clip_path, clip_frame, completion_callback):
         self.clip_path = clip_path
         self.clip_frame = clip_frame
         self.completion_callback = completion_callback
-        self.frame_name = frame_name
         threading.Thread.__init__(self)
         
     def run(self):
         """
-        Writes thumbnail image from file producer
+        Gets match frame image from thumbnail tiles cache
         """
-        # Create consumer
-        matchframe_path = userfolders.get_cache_dir() + appconsts.TRIM_VIEW_DIR + "/" + self.frame_name
-        consumer = mlt.Consumer(PROJECT().profile, "avformat", matchframe_path)
-        consumer.set("real_time", 0)
-        consumer.set("vcodec", "png")
-
-        # Create one frame producer
-        producer = mlt.Producer(PROJECT().profile, str(self.clip_path))
-        producer.set("mlt_service", "avformat-novalidate")
-        producer = producer.cut(int(self.clip_frame), int(self.clip_frame))
-
-        # Delete match frame
-        try:
-            os.remove(matchframe_path)
-        except:
-            # This fails when done first time ever  
-            pass
-        
-        # Save producer and consumer for view needing continues match frame update
-        global _producer, _consumer
+        # Save producer for view needing continues match frame update
+        global _producer, _producer_path
         if _widget.view != START_TRIM_VIEW and _widget.view != END_TRIM_VIEW:
-            _producer = producer
-            _consumer = consumer
+            producer = mlt.Producer(PROJECT().profile, str(self.clip_path))
+            producer.set("mlt_service", "avformat-novalidate")
+            _producer = producer.cut(int(self.clip_frame), int(self.clip_frame))
+            _producer_path = self.clip_path
 
-        # Connect and write image
-        consumer.connect(producer)
-        consumer.run()
-        
-        # Wait until new file exists
-        while os.path.isfile(matchframe_path) != True:
-            time.sleep(0.1)
+        # Tile is decoded and saved in cache if not already there.
+        w, h = _widget.get_match_frame_panel_size()
+        tile_surface = thumbtiles.get_tile_sync(self.clip_path, int(self.clip_frame), h)
 
         # Do completion callback
-        self.completion_callback(self.frame_name)
+        self.completion_callback(tile_surface)
 
 
 class MatchSurfaceCreator(threading.Thread):
@@ -923,23 +877,22 @@ class MatchSurfaceCreator(threading.Thread):
             print("MatchSurfaceCreator: waiting for _producer")
             time.sleep(0.01)
             
-        image_producer = _producer.cut(int(self.match_frame), int(self.match_frame))
-        image_producer.set_speed(0)
-        image_producer.seek(0)
-        
-        # Get MLT rgb frame data
-        frame = image_producer.get_frame()
-        # And make sureto deinterlace if input is interlaced
-        frame.set("consumer_deinterlace", 1)
+        # Trim edits often move back and forth over same frames, recent frames are kept in memory.
         size = _widget.get_match_frame_panel_size()
-        mlt_rgb = frame.get_image(mlt.mlt_image_rgb24a, *size) 
-   
-        # Create cairo surface
-        cairo_buf = _widget._get_cairo_buf_from_mlt_rgb(mlt_rgb, *size)
-        img_w, img_h = size
-        stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, img_w)
-        surface = cairo.ImageSurface.create_for_data(cairo_buf, cairo.FORMAT_RGB24, img_w, img_h, stride)
-        
+        key = (_producer_path, int(self.match_frame), size)
+        with _match_frames_lock:
+            surface = _match_frames.get(key)
+            if surface != None:
+                _match_frames.move_to_end(key)
+
+        if surface == None:
+            image_producer = _producer.cut(int(self.match_frame), int(self.match_frame))
+            surface = thumbtiles.get_frame_surface(image_producer, 0, *size)
+            with _match_frames_lock:
+                _match_frames[key] = surface
+                while len(_match_frames) > MAX_CACHED_MATCH_FRAMES:
+                    _match_frames.popitem(last=False)
+
         _widget.match_frame_surface = surface
         
         # Repaint
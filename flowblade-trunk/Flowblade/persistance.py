@@ -32,6 +32,7 @@ import fnmatch
 import hashlib
 import os
 import pickle
+import struct
 import time
 
 from gi.repository import Gdk
@@ -44,6 +45,7 @@ import mltprofiles
 import mltfilters
 import mlttransitions
 import miscdataobjects
+import producercache
 import propertyparse
 import resync
 import userfolders
@@ -52,7 +54,7 @@ import utils
 # Unpickleable attributes for all objects
 # These are removed at save and recreated at load.
 PROJECT_REMOVE = ['profile','c_seq']
-SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter']
+SEQUENCE_REMOVE = ['profile','field','multitrack','tractor','monitor_clip','vectorscope','audiowave','rgbparade','outputfilter','watermark_filter','clip_id_index','lazy_build_data']
 PLAY_LIST_REMOVE = ['this','sequence','get_name','gain_filter','pan_filter']
 CLIP_REMOVE = ['this','clip_length']
 TRANSITION_REMOVE = ['this']
@@ -89,6 +91,18 @@ _fps_conv_mult = 1.0
 # A dict is put here when saving for profile change to contain paths to changed MLT XML files
 _xml_new_paths_for_profile_change = None
 
+# Project files are written as a sequence of separately pickled chunks:
+# header, chunks for project, media and every sequence, pickled chunks index dict, index offset.
+# Files that do not start with magic bytes are old single pickle project files.
+PROJECT_FILE_MAGIC = b"FLBCHUNK"
+PROJECT_FILE_FORMAT_VERSION = 1
+_PROJECT_FILE_HEADER = struct.Struct("<8sI")
+_PROJECT_FILE_TRAILER = struct.Struct("<Q")
+
+PROJECT_CHUNK = "project"
+MEDIA_CHUNK = "media"
+SEQUENCE_CHUNK = "sequence_"
+
 class FileProducerNotFoundError(Exception):
 
     def __init__(self, value):
@@ -117,7 +131,51 @@ def save_project(project, file_path, changed_profile_desc=None):
     Creates pickleable project object
     """
     print("Saving project...")  # + os.path.basename(file_path)
-    
+
+    s_proj, media_files = get_pickleable_project(project, changed_profile_desc)
+
+    # Write out file, sequences are made pickleable and written one at a time.
+    with atomicfile.AtomicFileWriter(file_path, "wb") as afw:
+        outfile = afw.get_file()
+        outfile.write(_PROJECT_FILE_HEADER.pack(PROJECT_FILE_MAGIC, PROJECT_FILE_FORMAT_VERSION))
+
+        chunks_index = {}
+        _write_chunk(outfile, chunks_index, PROJECT_CHUNK, s_proj)
+        _write_chunk(outfile, chunks_index, MEDIA_CHUNK, media_files)
+        for i in range(0, len(project.sequences)):
+            _write_chunk(outfile, chunks_index, SEQUENCE_CHUNK + str(i), get_p_sequence(project.sequences[i]))
+
+        _write_chunks_index(outfile, chunks_index)
+
+def write_pickled_chunks(file_path, chunks):
+    """
+    Writes project file from list of (chunk name, pickled bytes) tuples.
+    """
+    with atomicfile.AtomicFileWriter(file_path, "wb") as afw:
+        outfile = afw.get_file()
+        outfile.write(_PROJECT_FILE_HEADER.pack(PROJECT_FILE_MAGIC, PROJECT_FILE_FORMAT_VERSION))
+
+        chunks_index = {}
+        for name, data in chunks:
+            chunks_index[name] = (outfile.tell(), len(data))
+            outfile.write(data)
+
+        _write_chunks_index(outfile, chunks_index)
+
+def _write_chunk(outfile, chunks_index, name, obj):
+    offset = outfile.tell()
+    pickle.dump(obj, outfile)
+    chunks_index[name] = (offset, outfile.tell() - offset)
+
+def _write_chunks_index(outfile, chunks_index):
+    index_offset = outfile.tell()
+    pickle.dump(chunks_index, outfile)
+    outfile.write(_PROJECT_FILE_TRAILER.pack(index_offset))
+
+def get_pickleable_project(project, changed_profile_desc=None):
+    """
+    Returns pickleable (project, media files) pair, project has no media files or sequences.
+    """
     # Get shallow copy
     s_proj = copy.copy(project)
     
@@ -134,6 +192,12 @@ def save_project(project, file_path, changed_profile_desc=None):
 
     # Set current sequence index
     s_proj.c_seq_index = project.sequences.index(project.c_seq)
+
+    # Saves that change clip data need all sequences to have MLT objects.
+    if changed_profile_desc != None or snapshot_paths != None \
+        or project.proxy_data.proxy_mode == appconsts.CONVERTING_TO_USE_PROXY_MEDIA \
+        or project.proxy_data.proxy_mode == appconsts.CONVERTING_TO_USE_ORIGINAL_MEDIA:
+        build_all_sequences(project)
     
     # Set project SAVEFILE_VERSION to current in case this is a resave of older file type.
     # Older file type has been converted to newer file type on load.
@@ -179,28 +243,24 @@ def save_project(project, file_path, changed_profile_desc=None):
 
         media_files[s_media_file.id] = s_media_file
 
-    s_proj.media_files = media_files
-
-    # Replace sequences with pickleable objects
-    sequences = []
-    for i in range(0, len(project.sequences)):
-        add_seq = project.sequences[i]
-        sequences.append(get_p_sequence(add_seq))
-    s_proj.sequences = sequences
+    s_proj.media_files = None
+    s_proj.sequences = None
 
     # Remove unpickleable attributes
     remove_attrs(s_proj, PROJECT_REMOVE)
 
-    # Write out file.
-    with atomicfile.AtomicFileWriter(file_path, "wb") as afw:
-        outfile = afw.get_file()
-        pickle.dump(s_proj, outfile)
+    return (s_proj, media_files)
 
 def get_p_sequence(sequence):
     """
     Creates pickleable sequence object from MLT Playlist
     """
     s_seq = copy.copy(sequence)
+
+    # Sequences that have not been built after load still have their pickleable data.
+    if sequence_needs_build(sequence):
+        remove_attrs(s_seq, SEQUENCE_REMOVE)
+        return s_seq
     
     # Replace tracks with pickleable objects
     tracks = []
@@ -385,7 +445,7 @@ def _save_changed_xml_file(s_media_file, new_profile):
 def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
     _show_msg("Unpickling")
 
-    project = utils.unpickle(file_path)
+    project = read_project_file(file_path)
 
     # Relinker only operates on pickleable python data 
     if relinker_load:
@@ -456,31 +516,20 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
             if os.path.isfile(media_file.second_file_path): # Original media file exists, use it
                 media_file.set_as_original_media_file()
 
-    # Add MLT objects to sequences.
-    global all_clips, sync_clips
-    seq_count = 1
+    # Add MLT objects to current sequence. Other sequences get their MLT objects
+    # when first needed, data needed to build them later is saved with them.
+    build_data = (_load_file_path, project_proxy_mode, proxy_path_dict, project.SAVEFILE_VERSION)
     for seq in project.sequences:
         FIX_N_TO_3_SEQUENCE_COMPATIBILITY(seq)
             
         if not hasattr(seq, "compositing_mode"):
             seq.compositing_mode = appconsts.COMPOSITING_MODE_TOP_DOWN_FREE_MOVE
 
-        _show_msg(_("Building sequence ") + str(seq_count))
-        all_clips = {}
-        sync_clips = []
-                
-        seq.profile = project.profile
-        fill_sequence_mlt(seq, project.SAVEFILE_VERSION)
-
-        handle_seq_watermark(seq)
-
-        if not hasattr(seq, "seq_len"):
-            seq.update_edit_tracks_length()
-
-        seq_count = seq_count + 1
+        seq.lazy_build_data = build_data
 
-    all_clips = {}
-    sync_clips = []
+    c_seq = project.sequences[project.c_seq_index]
+    _show_msg(_("Building sequence ") + str(project.c_seq_index + 1))
+    _build_sequence(c_seq)
                 
     if(not hasattr(project, "update_media_lengths_on_load")):
         project.update_media_lengths_on_load = True # old projects < 1.10 had wrong media length data which just was never used.
@@ -495,8 +544,107 @@ def load_project(file_path, icons_and_thumnails=True, relinker_load=False):
     if icons_and_thumnails == True:
         project.init_thumbnailer()
 
+    producercache.save()
+
     return project
 
+def read_project_file(file_path):
+    """
+    Returns unpickled project with pickleable media files and sequences.
+    """
+    with open(file_path, "rb") as f:
+        if not _is_chunked_project_file(f):
+            return utils.unpickle(file_path) # Single pickle project file from earlier versions.
+
+        chunks_index = _read_chunks_index(f)
+
+        project = _read_chunk(f, chunks_index, PROJECT_CHUNK)
+        project.media_files = _read_chunk(f, chunks_index, MEDIA_CHUNK)
+        project.sequences = []
+        seq_index = 0
+        while SEQUENCE_CHUNK + str(seq_index) in chunks_index:
+            project.sequences.append(_read_chunk(f, chunks_index, SEQUENCE_CHUNK + str(seq_index)))
+            seq_index += 1
+
+    return project
+
+def read_pickled_chunks(file_path):
+    """
+    Returns dict chunk name -> pickled bytes, or None if file is not a chunked project file.
+    """
+    with open(file_path, "rb") as f:
+        if not _is_chunked_project_file(f):
+            return None
+
+        chunks_index = _read_chunks_index(f)
+        chunks = {}
+        for name, (offset, length) in chunks_index.items():
+            f.seek(offset)
+            chunks[name] = f.read(length)
+
+    return chunks
+
+def _is_chunked_project_file(f):
+    header_bytes = f.read(_PROJECT_FILE_HEADER.size)
+    return len(header_bytes) == _PROJECT_FILE_HEADER.size and header_bytes[0:len(PROJECT_FILE_MAGIC)] == PROJECT_FILE_MAGIC
+
+def _read_chunks_index(f):
+    f.seek(-_PROJECT_FILE_TRAILER.size, os.SEEK_END)
+    index_offset = _PROJECT_FILE_TRAILER.unpack(f.read(_PROJECT_FILE_TRAILER.size))[0]
+    f.seek(index_offset)
+    return pickle.load(f)
+
+def _read_chunk(f, chunks_index, name):
+    offset, length = chunks_index[name]
+    f.seek(offset)
+    return pickle.loads(f.read(length))
+
+def sequence_needs_build(seq):
+    return hasattr(seq, "lazy_build_data")
+
+def build_sequence(seq):
+    """
+    Adds MLT objects to a sequence that has not been built after project load.
+    """
+    if not sequence_needs_build(seq):
+        return
+
+    # Restore load state for building, sequence can be built long after load_project() has returned.
+    global _load_file_path, project_proxy_mode, proxy_path_dict, show_messages
+    saved_state = (_load_file_path, project_proxy_mode, proxy_path_dict, show_messages)
+    _load_file_path, project_proxy_mode, proxy_path_dict, save_file_version = seq.lazy_build_data
+    show_messages = False # Relative path searches would try to use load dialog
+
+    # Building sets sequence being built as current sequence.
+    c_seq = editorstate.project.c_seq
+    _build_sequence(seq)
+    editorstate.project.c_seq = c_seq
+
+    _load_file_path, project_proxy_mode, proxy_path_dict, show_messages = saved_state
+
+def build_all_sequences(project):
+    for seq in project.sequences:
+        build_sequence(seq)
+
+def _build_sequence(seq):
+    global all_clips, sync_clips
+    all_clips = {}
+    sync_clips = []
+
+    save_file_version = seq.lazy_build_data[3]
+    del seq.lazy_build_data
+
+    seq.profile = editorstate.project.profile
+    fill_sequence_mlt(seq, save_file_version)
+
+    handle_seq_watermark(seq)
+
+    if not hasattr(seq, "seq_len"):
+        seq.update_edit_tracks_length()
+
+    all_clips = {}
+    sync_clips = []
+
 def fill_sequence_mlt(seq, SAVEFILE_VERSION):
     """
     Replaces sequences py objects with mlt objects
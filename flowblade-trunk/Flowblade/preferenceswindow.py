@@ -30,6 +30,7 @@ import gui
 import guiutils
 import mltprofiles
 import multiprocessing
+import undo
 import utils
 
 PREFERENCES_WIDTH = 730
@@ -103,6 +104,15 @@ def _general_options_panel():
     undo_max_spin.set_adjustment(spin_adj)
     undo_max_spin.set_numeric(True)
 
+    spin_adj = Gtk.Adjustment(value=prefs.undo_memory_max, lower=editorpersistance.UNDO_MEMORY_MIN, upper=editorpersistance.UNDO_MEMORY_MAX, step_incr=32)
+    undo_memory_spin = Gtk.SpinButton.new_with_range(editorpersistance.UNDO_MEMORY_MIN, editorpersistance.UNDO_MEMORY_MAX, 32)
+    undo_memory_spin.set_adjustment(spin_adj)
+    undo_memory_spin.set_numeric(True)
+    undo_memory_use_mb = undo.get_undo_memory_use() // (1024 * 1024)
+    undo_memory_row = Gtk.HBox(False, 4)
+    undo_memory_row.pack_start(undo_memory_spin, False, False, 0)
+    undo_memory_row.pack_start(Gtk.Label(label=_("MB, now used: ") + str(undo_memory_use_mb) + " MB"), False, False, 0)
+
     autosave_combo = Gtk.ComboBoxText()
     # Aug-2019 - SvdB - AS - This is now initialized in app.main
     # Using editorpersistance.prefs.AUTO_SAVE_OPTS as source
@@ -138,6 +148,7 @@ def _general_options_panel():
     row1 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Default Profile:")), default_profile_combo, PREFERENCES_LEFT))
     row2 = _row(guiutils.get_checkbox_row_box(open_in_last_opened_check, Gtk.Label(label=_("Remember last media directory"))))
     row3 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Undo stack size:")), undo_max_spin, PREFERENCES_LEFT))
+    row4 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Undo stack memory limit:")), undo_memory_row, PREFERENCES_LEFT))
     row5 = _row(guiutils.get_checkbox_row_box(open_in_last_rendered_check, Gtk.Label(label=_("Remember last render directory"))))
     row6 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Autosave for crash recovery every:")), autosave_combo, PREFERENCES_LEFT))
     row9 = _row(guiutils.get_two_column_box(Gtk.Label(label=_("Media look-up order on load:")), load_order_combo, PREFERENCES_LEFT))
@@ -151,6 +162,7 @@ def _general_options_panel():
     vbox.pack_start(row10, False, False, 0)
     vbox.pack_start(row5, False, False, 0)
     vbox.pack_start(row3, False, False, 0)
+    vbox.pack_start(row4, False, False, 0)
     vbox.pack_start(row9, False, False, 0)
     vbox.pack_start(row11, False, False, 0)
     vbox.pack_start(Gtk.Label(), True, True, 0)
@@ -159,7 +171,7 @@ def _general_options_panel():
 
     # Aug-2019 - SvdB - AS - Added autosave_combo
     return vbox, ( default_profile_combo, open_in_last_opened_check, open_in_last_rendered_check,
-                    undo_max_spin, load_order_combo, autosave_combo, render_folder_select, disk_cache_warning_combo)
+                    undo_max_spin, load_order_combo, autosave_combo, render_folder_select, disk_cache_warning_combo, undo_memory_spin)
 
 def _edit_prefs_panel():
     prefs = editorpersistance.prefs
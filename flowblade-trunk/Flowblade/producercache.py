@@ -0,0 +1,153 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module caches probed properties of media file producers.
+
+Creating an avformat producer opens and probes the media file, which can take
+0.5s+ for some files. Properties of probed producers are cached here keyed by
+path, file size, modification time and profile frame rate. Later producers
+for the same media are created with "avformat-novalidate" service and cached
+properties are set on them, the same way MLT XML loading creates producers.
+Media file then gets opened only when producer is used to get frames.
+
+Every clip needs its own producer because filters are attached to producers,
+so only probed properties are shared between clips, not live producer objects.
+Cache is saved on disk and used across sessions, least recently used media
+is dropped when cache is full.
+"""
+
+import collections
+import mlt
+import os
+import pickle
+import threading
+
+import appconsts
+import atomicfile
+import userfolders
+import utils
+
+MAX_CACHED_MEDIA = 5000
+CACHE_FILE_VERSION = 1
+
+CACHED_SERVICE = "avformat"
+NOVALIDATE_SERVICE = "avformat-novalidate"
+
+# These are set by producer creation and are not copied from cache.
+_NOT_CACHED_PROPERTIES = ["resource", "mlt_service", "mlt_type", "mlt_profile"]
+
+_metadata = None # OrderedDict key -> list of (name, value), least recently used first
+_cache_changed = False
+_lock = threading.Lock()
+
+
+def create_file_producer(profile, path):
+    """
+    Returns producer for media file, cached properties are used if available.
+    """
+    key = _get_key(profile, path)
+    if key == None:
+        return mlt.Producer(profile, str(path))
+
+    properties = _get_properties(key)
+    if properties != None:
+        producer = mlt.Producer(profile, NOVALIDATE_SERVICE, str(path))
+        if producer.is_valid():
+            for name, value in properties:
+                producer.set(name, value)
+            return producer
+
+    producer = mlt.Producer(profile, str(path))
+    if producer.is_valid() and producer.get("mlt_service") == CACHED_SERVICE:
+        _add_properties(key, producer)
+
+    return producer
+
+def save():
+    global _cache_changed
+    with _lock:
+        if _cache_changed == False:
+            return
+        cache_data = (CACHE_FILE_VERSION, list(_metadata.items()))
+        _cache_changed = False
+
+    try:
+        with atomicfile.AtomicFileWriter(_get_cache_file_path(), "wb") as afw:
+            pickle.dump(cache_data, afw.get_file())
+    except Exception as e:
+        print("Saving producer properties cache failed", e)
+
+def _get_key(profile, path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None # Missing files and non-file resources are not cached.
+
+    return (path, stat.st_size, stat.st_mtime, profile.frame_rate_num(), profile.frame_rate_den())
+
+def _get_properties(key):
+    with _lock:
+        metadata = _get_metadata()
+        try:
+            properties = metadata[key]
+        except KeyError:
+            return None
+        metadata.move_to_end(key)
+        return properties
+
+def _add_properties(key, producer):
+    properties = []
+    for i in range(0, producer.count()):
+        name = producer.get_name(i)
+        if name == None or name.startswith("_") or name in _NOT_CACHED_PROPERTIES:
+            continue
+        value = producer.get(name)
+        if value != None:
+            properties.append((name, value))
+
+    global _cache_changed
+    with _lock:
+        metadata = _get_metadata()
+        metadata[key] = properties
+        while len(metadata) > MAX_CACHED_MEDIA:
+            metadata.popitem(last=False)
+        _cache_changed = True
+
+def _get_metadata():
+    # Cache file is read when first needed.
+    global _metadata
+    if _metadata != None:
+        return _metadata
+
+    _metadata = collections.OrderedDict()
+    cache_file_path = _get_cache_file_path()
+    if os.path.isfile(cache_file_path):
+        try:
+            version, items = utils.unpickle(cache_file_path)
+            if version == CACHE_FILE_VERSION:
+                _metadata = collections.OrderedDict(items)
+        except Exception as e:
+            print("Loading producer properties cache failed", e)
+
+    return _metadata
+
+def _get_cache_file_path():
+    return userfolders.get_cache_dir() + appconsts.PRODUCER_PROPERTIES_CACHE_FILE
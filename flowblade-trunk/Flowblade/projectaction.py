@@ -23,11 +23,13 @@ Module handles user actions that are not edits on the current sequence.
 Load, save, add media file, etc...
 """
 
+import concurrent.futures
 import copy
 import datetime
 import glob
 import hashlib
 import mlt
+import multiprocessing
 import os
 from os import listdir
 from os.path import isfile, join, expanduser
@@ -45,6 +47,7 @@ from gi.repository import GLib
 import app
 import audiowaveformrenderer
 import appconsts
+import autosaving
 import batchrendering
 import containerprogramedit
 import clipeffectseditor
@@ -79,6 +82,8 @@ import render
 import renderconsumer
 import rendergui
 import sequence
+import smartrender
+import splitrender
 import tlinerender
 import undo
 import updater
@@ -101,6 +106,10 @@ force_proxy = False
 # This is needed to pass only one event for double click, double init for monitor click possibly somewhat unstable
 _media_panel_double_click_counter = 0
 
+# Media import probes and thumbnails files in parallel and refreshes media panel at most this often
+MEDIA_IMPORT_MAX_WORKERS = 4
+MEDIA_IMPORT_GUI_UPDATE_INTERVAL = 0.5 # seconds
+
 
 #--------------------------------------- worker threads
 class LoadThread(threading.Thread):
@@ -242,23 +251,36 @@ class AddMediaFilesThread(threading.Thread):
         target_bin = PROJECT().c_bin
         succes_new_file = None
         filenames = self.filenames
+
+        # Files already in project or earlier in list are duplicates.
+        import_files = []
         for new_file in filenames:
             (folder, file_name) = os.path.split(new_file)
-            if PROJECT().media_file_exists(new_file):
+            if PROJECT().media_file_exists(new_file) or new_file in import_files:
                 duplicates.append(file_name)
             else:
-                try:
-                    PROJECT().add_media_file(new_file, self.compound_clip_name, target_bin)
+                import_files.append(new_file)
+
+        # Files are probed and thumbnailed by worker threads, media items are added 
+        # in file order on this thread as soon as data for them is available.
+        workers_count = max(1, min(MEDIA_IMPORT_MAX_WORKERS, multiprocessing.cpu_count(), len(import_files)))
+        last_gui_update = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers_count) as executor:
+            for new_file, media_data, err in executor.map(_get_import_media_file_data, import_files):
+                if err == None:
+                    PROJECT().add_probed_media_file(new_file, media_data, self.compound_clip_name, target_bin)
                     succes_new_file = new_file
-                except projectdata.ProducerNotValidError as err:
+                else:
                     print(err.__str__())
                     dialogs.not_valid_producer_dialog(err.value, gui.editor_window.window)
-            
-            Gdk.threads_enter()
-            gui.media_list_view.fill_data_model()
-            max_val = gui.editor_window.media_scroll_window.get_vadjustment().get_upper()
-            gui.editor_window.media_scroll_window.get_vadjustment().set_value(max_val)
-            Gdk.threads_leave()
+
+                if time.monotonic() - last_gui_update > MEDIA_IMPORT_GUI_UPDATE_INTERVAL:
+                    last_gui_update = time.monotonic()
+                    Gdk.threads_enter()
+                    gui.media_list_view.fill_data_model()
+                    max_val = gui.editor_window.media_scroll_window.get_vadjustment().get_upper()
+                    gui.editor_window.media_scroll_window.get_vadjustment().set_value(max_val)
+                    Gdk.threads_leave()
 
         add_count = len(filenames) - len(duplicates)
         project_event = projectdata.ProjectEvent(projectdata.EVENT_MEDIA_ADDED, str(add_count))
@@ -271,6 +293,8 @@ class AddMediaFilesThread(threading.Thread):
         # Update editor gui
         Gdk.threads_enter()
         gui.media_list_view.fill_data_model()
+        max_val = gui.editor_window.media_scroll_window.get_vadjustment().get_upper()
+        gui.editor_window.media_scroll_window.get_vadjustment().set_value(max_val)
         update_current_bin_files_count()
         _enable_save()
 
@@ -288,6 +312,13 @@ class AddMediaFilesThread(threading.Thread):
         audiowaveformrenderer.launch_audio_levels_rendering(filenames)
 
 
+def _get_import_media_file_data(file_path):
+    try:
+        return (file_path, projectdata.get_media_file_data(file_path), None)
+    except projectdata.ProducerNotValidError as err:
+        return (file_path, None, err)
+
+
 class UpdateMediaLengthsThread(threading.Thread):
     
     def __init__(self):
@@ -379,6 +410,7 @@ def _load_pulse_bar():
 
 def _enable_save():
     gui.editor_window.uimanager.get_widget("/MenuBar/FileMenu/Save").set_sensitive(True)
+    autosaving.project_changed()
 
 
 # ---------------------------------- project: new, load, save
@@ -896,6 +928,19 @@ def _write_out_render_item(single_render_item_item):
     r_data.proxy_mode = PROJECT().proxy_data.proxy_mode 
     if user_args == True:
         r_data.args_vals_list = args_vals_list # pack these to go for display purposes if used
+    if render.widgets.smart_render_check.get_active() == True:
+        if smartrender.can_smart_render(args_vals_list, render_path, profile, current_sequence().profile):
+            r_data.smart_render_segments = tlinerender.get_rendered_segments()
+        else:
+            primary_txt = _("Timeline Render segments not reused")
+            secondary_txt = _("Render args, output profile or file type do not match Timeline Render encoding,\nwhole sequence is rendered.")
+            dialogutils.info_message(primary_txt, secondary_txt, gui.editor_window.window)
+    if render.widgets.split_render_check.get_active() == True:
+        if end_frame == -1:
+            render_length = current_sequence().get_length() - start_frame
+        else:
+            render_length = end_frame - start_frame + 1
+        r_data.split_render = splitrender.can_split_render(args_vals_list, render_path, render_length)
     
     if single_render_item_item:
         # Add item
@@ -1215,6 +1260,7 @@ def media_file_name_edited(dialog, response_id, data):
         return
 
     media_file.name = new_text
+    autosaving.project_changed()
     gui.media_list_view.fill_data_model()
 
 def _display_file_info(media_file):
@@ -1434,6 +1480,7 @@ def _do_create_sequence_compound_clip_from_selected(dialog, response_id, name_en
     (model, rows) = selection.get_selected_rows()
     row = max(rows[0])
     selected_sequence = PROJECT().sequences[row]
+    persistance.build_sequence(selected_sequence)
 
     render_player = renderconsumer.XMLRenderPlayer( write_file, _sequence_xml_compound_render_done_callback, 
                                                     (write_file, media_name), selected_sequence, 
@@ -1569,6 +1616,7 @@ def _bin_menu_item_selected(widget, data):
 def _move_bin(pop_index, insert_index):
     PROJECT().bins.pop(pop_index)
     PROJECT().bins.insert(insert_index, PROJECT().c_bin)
+    autosaving.project_changed()
     gui.bin_list_view.fill_data_model()
     selection = gui.bin_list_view.treeview.get_selection()
     model, iterator = selection.get_selected()
@@ -1679,6 +1727,7 @@ def move_files_to_bin(new_bin, bin_indexes):
     # Add to target bin
     for file_id in moved_ids:
         PROJECT().bins[new_bin].file_ids.append(file_id)
+    autosaving.project_changed()
 
     gui.media_list_view.fill_data_model()
     gui.bin_list_view.fill_data_model()
@@ -1890,6 +1939,7 @@ def _combine_sequences_dialog_callback(dialog, response_id, action_select, seq_s
     
     action = action_select.get_active()
     seq = selectable_seqs[seq_select.get_active()]
+    persistance.build_sequence(seq)
     
     dialog.destroy()
     
@@ -30,10 +30,12 @@ import os
 from gi.repository import GdkPixbuf
 
 import appconsts
+import autosaving
 import editorpersistance
 from editorstate import PROJECT
 import mltprofiles
 import patternproducer
+import producercache
 import miscdataobjects
 import respaths
 import sequence
@@ -122,19 +124,16 @@ class Project:
         """
         Adds media file to project if exists and file is of right type.
         """
+        media_data = get_media_file_data(file_path)
+        return self.add_probed_media_file(file_path, media_data, compound_clip_name, target_bin)
+
+    def add_probed_media_file(self, file_path, media_data, compound_clip_name=None, target_bin=None):
+        """
+        Adds media file to project using data from get_media_file_data().
+        """
         (directory, file_name) = os.path.split(file_path)
         (name, ext) = os.path.splitext(file_name)
-
-        # Get media type
-        media_type = sequence.get_media_type(file_path)
-
-        # Get length and icon
-        if media_type == appconsts.AUDIO:
-            icon_path = respaths.IMAGE_PATH + "audio_file.png"
-            length = thumbnailer.get_file_length(file_path)
-            info = None
-        else: # For non-audio we need write a thumbbnail file and get file lengh while we're at it
-             (icon_path, length, info) = thumbnailer.write_image(file_path)
+        (media_type, icon_path, length, info) = media_data
 
         # Hide file extension if enabled in user preferences
         clip_name = file_name
@@ -167,6 +166,7 @@ class Project:
         """
         global media_files_changed_since_last_save
         media_files_changed_since_last_save = True
+        autosaving.project_changed()
         
         self.media_files[media_object.id] = media_object
         self.next_media_file_id += 1
@@ -197,6 +197,7 @@ class Project:
     def delete_media_file_from_current_bin(self, media_file):
         global media_files_changed_since_last_save
         media_files_changed_since_last_save = True
+        autosaving.project_changed()
 
         self.c_bin.file_ids.pop(media_file.id)
 
@@ -220,6 +221,7 @@ class Project:
         name = _("bin_") + str(self.next_bin_number)
         self.bins.append(Bin(name))
         self.next_bin_number += 1
+        autosaving.project_changed()
     
     def add_unnamed_sequence(self):
         """
@@ -233,6 +235,7 @@ class Project:
         seq.create_default_tracks()
         self.sequences.append(seq)
         self.next_seq_number += 1
+        autosaving.project_changed()
 
     def get_filtered_media_log_events(self, group_index, incl_starred, incl_not_starred, sorting_order):
         filtered_events = []
@@ -315,6 +318,7 @@ class Project:
 
     def set_project_property(self, property_name, value):
         self.project_properties[property_name] = value
+        autosaving.project_changed()
 
             
 class MediaFile:
@@ -486,8 +490,8 @@ class Thumbnailer:
         consumer.set("real_time", 0)
         consumer.set("vcodec", "png")
 
-        # Create one frame producer
-        producer = mlt.Producer(self.profile, str(file_path))
+        # Create one frame producer, probed properties get cached for creating clips later
+        producer = producercache.create_file_producer(self.profile, file_path)
         if producer.is_valid() == False:
             raise ProducerNotValidError(file_path)
 
@@ -508,10 +512,29 @@ class Thumbnailer:
         # but do need file length known
 
         # Create one frame producer
-        producer = mlt.Producer(self.profile, str(file_path))
+        producer = producercache.create_file_producer(self.profile, file_path)
         return producer.get_length()
 
 
+def get_media_file_data(file_path):
+    """
+    Returns (media type, icon path, length, info) for media file.
+    Does not touch project data and can be called from media import worker threads.
+    """
+    # Get media type
+    media_type = sequence.get_media_type(file_path)
+
+    # Get length and icon
+    if media_type == appconsts.AUDIO:
+        icon_path = respaths.IMAGE_PATH + "audio_file.png"
+        length = thumbnailer.get_file_length(file_path)
+        info = None
+    else: # For non-audio we need write a thumbbnail file and get file lengh while we're at it
+         (icon_path, length, info) = thumbnailer.write_image(file_path)
+
+    return (media_type, icon_path, length, info)
+
+
 # ----------------------------------- project and media log events
 class ProjectEvent:
     def __init__(self, event_type, data):
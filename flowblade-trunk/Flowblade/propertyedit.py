@@ -32,11 +32,13 @@ import json
 from gi.repository import Gtk, Gdk
 
 import appconsts
+import autosaving
 from editorstate import current_sequence
 import gui
 import mlttransitions
 import mltfilters
 import propertyparse
+import tlinerender
 import utils
 
 import traceback
@@ -345,6 +347,7 @@ class AbstractProperty:
        
     def enable_save_menu_item(self):
         gui.editor_window.uimanager.get_widget("/MenuBar/FileMenu/Save").set_sensitive(True)
+        autosaving.project_changed()
 
     
 class EditableProperty(AbstractProperty):
@@ -413,6 +416,7 @@ class EditableProperty(AbstractProperty):
         filter_object = self._get_filter_object()
         prop = (str(self.name), str(str_value), self.type)
         filter_object.properties[self.property_index] = prop
+        tlinerender.clip_content_changed(self.clip)
 
 
 class TransitionEditableProperty(AbstractProperty):
@@ -894,6 +898,7 @@ class MultipartKeyFrameProperty(AbstractProperty):
         self.value = val_str
         filter_object = self.clip.filters[self.filter_index]
         filter_object.update_value(val_str, self.clip, current_sequence().profile)
+        tlinerender.clip_content_changed(self.clip)
 
 
 class AffineScaleProperty(EditableProperty):
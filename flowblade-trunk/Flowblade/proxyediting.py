@@ -191,14 +191,31 @@ class ProxyManagerDialog:
                                 lambda w,e: self.size_changed(w.get_active()), 
                                 None)
                                 
+        self.img_seq_format_select = Gtk.ComboBoxText()
+        self.img_seq_format_select.append_text(_("PNG"))
+        self.img_seq_format_select.append_text(_("JPEG"))
+        self.img_seq_format_select.append_text(_("Uncompressed"))
+        self.img_seq_format_select.set_active(editorpersistance.prefs.img_seq_proxy_format)
+        self.img_seq_format_select.connect("changed", 
+                                lambda w,e: self.img_seq_format_changed(w.get_active()), 
+                                None)
+
         row_enc = Gtk.HBox(False, 2)
         row_enc.pack_start(Gtk.Label(), True, True, 0)
         row_enc.pack_start(self.enc_select, False, False, 0)
         row_enc.pack_start(self.size_select, False, False, 0)
         row_enc.pack_start(Gtk.Label(), True, True, 0)
+
+        img_seq_format_label = Gtk.Label(label=_("Image Sequence Frames:"))
+        row_img_seq = Gtk.HBox(False, 2)
+        row_img_seq.pack_start(Gtk.Label(), True, True, 0)
+        row_img_seq.pack_start(img_seq_format_label, False, False, 0)
+        row_img_seq.pack_start(self.img_seq_format_select, False, False, 0)
+        row_img_seq.pack_start(Gtk.Label(), True, True, 0)
         
         vbox_enc = Gtk.VBox(False, 2)
         vbox_enc.pack_start(row_enc, False, False, 0)
+        vbox_enc.pack_start(row_img_seq, False, False, 0)
         vbox_enc.pack_start(guiutils.pad_label(8, 12), False, False, 0)
         
         panel_encoding = guiutils.get_named_frame(_("Proxy Encoding"), vbox_enc)
@@ -292,6 +309,10 @@ class ProxyManagerDialog:
     def size_changed(self, size_index):
         editorstate.PROJECT().proxy_data.size = size_index
 
+    def img_seq_format_changed(self, format_index):
+        editorpersistance.prefs.img_seq_proxy_format = format_index
+        editorpersistance.save()
+
     def update_proxy_mode_display(self):
         self.set_convert_buttons_state()
         self.set_mode_display_value()
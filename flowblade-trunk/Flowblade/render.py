@@ -53,6 +53,7 @@ import renderconsumer
 import rendergui
 import respaths
 import sequence
+import smartrender
 import userfolders
 import utils
 
@@ -110,6 +111,8 @@ def get_args_vals_list_for_current_selections():
     if widgets.render_type_panel.type_combo.get_active() == 1: # Preset encodings                                                                             -1)
         encoding_option = renderconsumer.non_user_encodings[widgets.render_type_panel.presets_selector.widget.get_active()]
         args_vals_list = encoding_option.get_args_vals_tuples_list(profile)
+    elif widgets.render_type_panel.type_combo.get_active() == 2: # Timeline Render encoding
+        args_vals_list = smartrender.get_segments_args_vals_list(profile)
     elif widgets.args_panel.use_args_check.get_active() == False: # User encodings
         args_vals_list = renderconsumer.get_args_vals_tuples_list_for_encoding_and_quality( profile, 
                                                                                             encoding_option_index, 
@@ -225,6 +228,14 @@ def create_widgets():
     widgets.reset_button.connect("clicked", lambda w: set_default_values_for_widgets())
     widgets.queue_button = Gtk.Button(_("To Queue"))
     widgets.queue_button.set_tooltip_text(_("Save Project in Render Queue"))
+    widgets.smart_render_check = Gtk.CheckButton()
+    widgets.smart_render_check.set_active(False)
+    widgets.smart_render_check.set_sensitive(False)
+    widgets.smart_render_check.set_tooltip_text(_("Reuse valid Timeline Render segments, available with Timeline Render Encoding type or with render args matching it"))
+    widgets.args_panel.use_args_check.connect("toggled", lambda w: _update_smart_render_check())
+    widgets.split_render_check = Gtk.CheckButton()
+    widgets.split_render_check.set_active(False)
+    widgets.split_render_check.set_tooltip_text(_("Render parts of long sequences in parallel processes and join them into output file"))
     
     # Tooltips
     widgets.range_cb.set_tooltip_text(_("Select render range"))
@@ -343,10 +354,15 @@ def _render_type_changed():
         widgets.render_type_panel.presets_selector.widget.set_sensitive(False)
         _preset_selection_changed()
         widgets.encoding_panel.encoding_selector.encoding_selection_changed()
-    else: # Preset Encodings
+    else: # Preset Encodings or Timeline Render encoding
         enable_user_rendering(False)
-        widgets.render_type_panel.presets_selector.widget.set_sensitive(True)
-        _preset_selection_changed()
+        if widgets.render_type_panel.type_combo.get_active() == 1:
+            widgets.render_type_panel.presets_selector.widget.set_sensitive(True)
+            _preset_selection_changed()
+        else:
+            widgets.render_type_panel.presets_selector.widget.set_sensitive(False)
+            widgets.file_panel.extension_label.set_text("." + smartrender.get_segments_encoding().extension)
+            widgets.smart_render_check.set_active(True)
         widgets.args_panel.opts_save_button.set_sensitive(False)
         widgets.args_panel.opts_load_button.set_sensitive(False)
         if editorstate.screen_size_small_height() == False:
@@ -354,6 +370,16 @@ def _render_type_changed():
             widgets.args_panel.opts_view.set_sensitive(False)
             widgets.args_panel.opts_view.get_buffer().set_text("")
 
+    _update_smart_render_check()
+
+def _update_smart_render_check():
+    # User encodings and file type presets never match timeline render segments args.
+    render_type = widgets.render_type_panel.type_combo.get_active()
+    can_reuse = (render_type == 2 or (render_type == 0 and widgets.args_panel.use_args_check.get_active() == True))
+    widgets.smart_render_check.set_sensitive(can_reuse)
+    if can_reuse == False:
+        widgets.smart_render_check.set_active(False)
+
 def _out_profile_changed():
     selected_index = widgets.profile_panel.out_profile_combo.widget.get_active()
     if selected_index == 0:
@@ -368,6 +394,8 @@ def _fill_info_box(profile):
     widgets.profile_panel.out_profile_info_box.display_info(info_panel)
 
 def _preset_selection_changed():
+    if widgets.render_type_panel.type_combo.get_active() == 2: # Timeline Render encoding has its own extension
+        return
     enc_index = widgets.render_type_panel.presets_selector.widget.get_active()
     ext = renderconsumer.non_user_encodings[enc_index].extension
     widgets.file_panel.extension_label.set_text("." + ext)
@@ -26,6 +26,8 @@ Module contains objects and methods needed to create render consumers.
 from gi.repository import Gdk
 
 import mlt
+import shutil
+import subprocess
 import time
 import threading
 import xml.dom.minidom
@@ -37,6 +39,9 @@ import mltenv
 import respaths
 
 
+# Used to join separately rendered segments of a file.
+FFMPEG_CMD = "ffmpeg"
+
 # File describing existing encoding and quality options
 RENDER_ENCODING_FILE = "/res/render/renderencoding.xml"
 
@@ -399,6 +404,65 @@ def _parse_line(line_start, line_end, buf):
     return ((k,v), None)
 
 
+def get_proxy_render_rate(width, height):
+    # Bit rates for proxy files are counted using 2500kbs for 
+    # PAL size image as starting point.
+    pal_pix_count = 720.0 * 576.0
+    pal_proxy_rate = 2500.0
+    proxy_pix_count = float(width * height)
+    proxy_rate = pal_proxy_rate * (proxy_pix_count / pal_pix_count)
+    proxy_rate = int(proxy_rate / 100) * 100 # Make proxy rate even hundred
+    # There are no practical reasons to have bitrates lower than 500kbs.
+    if proxy_rate < 500:
+        proxy_rate = 500
+    return proxy_rate
+
+
+# ------------------------------------------------------ segment files
+def can_concat_files():
+    return shutil.which(FFMPEG_CMD) != None
+
+def concat_files(file_paths, out_path, durations=None, audio_path=None):
+    """
+    Joins files rendered with the same encoding into one file without re-encoding them.
+    durations can have used length in seconds for files, or None to use whole file.
+    If audio_path is given, audio is taken from that file instead of joined files.
+    Returns True if file was written.
+    """
+    list_file_path = out_path + ".concat"
+    with open(list_file_path, "w") as f:
+        for i in range(0, len(file_paths)):
+            f.write("file '" + file_paths[i].replace("'", "'\\''") + "'\n")
+            if durations != None and durations[i] != None:
+                f.write("outpoint " + str(durations[i]) + "\n")
+
+    # Output is written with temp name so that out_path only exists when it is complete.
+    root, ext = os.path.splitext(out_path)
+    temp_path = root + "_concat" + ext
+    args = [FFMPEG_CMD, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_file_path]
+    if audio_path == None:
+        args += ["-map", "0:v?", "-map", "0:a?"]
+    else:
+        args += ["-i", audio_path, "-map", "0:v?", "-map", "1:a?"]
+    args += ["-c", "copy", temp_path]
+    try:
+        process = subprocess.run(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except OSError as e:
+        print("Concatenating files failed", e)
+        return False
+    finally:
+        os.remove(list_file_path)
+
+    if process.returncode != 0:
+        print("Concatenating files failed:", process.stderr.decode("utf-8", "replace"))
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+    os.replace(temp_path, out_path)
+    return True
+
+
 class FileRenderPlayer(threading.Thread):
     def __init__(self, file_name, producer, consumer, start_frame, stop_frame):
         self.file_name = file_name
@@ -620,6 +620,14 @@ def get_render_panel_right(render_widgets, render_clicked_cb, to_queue_clicked_c
     bin_row.pack_start(Gtk.Label(label=_("Open File in Bin:")),  False, False, 0)
     bin_row.pack_start(guiutils.get_pad_label(10, 2),  False, False, 0)
     bin_row.pack_start(render_widgets.args_panel.open_in_bin,  False, False, 0)
+    bin_row.pack_start(guiutils.get_pad_label(24, 2),  False, False, 0)
+    bin_row.pack_start(Gtk.Label(label=_("Reuse Timeline Renders:")),  False, False, 0)
+    bin_row.pack_start(guiutils.get_pad_label(10, 2),  False, False, 0)
+    bin_row.pack_start(render_widgets.smart_render_check,  False, False, 0)
+    bin_row.pack_start(guiutils.get_pad_label(24, 2),  False, False, 0)
+    bin_row.pack_start(Gtk.Label(label=_("Parallel Render:")),  False, False, 0)
+    bin_row.pack_start(guiutils.get_pad_label(10, 2),  False, False, 0)
+    bin_row.pack_start(render_widgets.split_render_check,  False, False, 0)
     bin_row.pack_start(Gtk.Label(), True, True, 0)
 
     range_row = Gtk.HBox()
@@ -707,6 +715,7 @@ class RenderTypePanel():
         self.type_combo = Gtk.ComboBoxText() # filled later when current sequence known
         self.type_combo.append_text(_("User Defined"))
         self.type_combo.append_text(_("Preset File type"))
+        self.type_combo.append_text(_("Timeline Render Encoding"))
         self.type_combo.set_active(0)
         self.type_combo.connect('changed', lambda w: render_type_changed_callback())
     
@@ -33,6 +33,7 @@ import mltfilters
 import mlttransitions
 import mltrefhold
 import patternproducer
+import producercache
 import tlinerender
 import utils
 
@@ -125,6 +126,9 @@ class Sequence:
         self.tractor.mark_in = -1
         self.tractor.mark_out = -1
 
+        # Index for clip id lookups, built on first lookup and kept updated by edit.py atomic edit ops.
+        self.clip_id_index = None # clip id -> (clip, track)
+
         # Only create and add pan filter if actual pan is applied
         # This method gets called on load and we only want to add a filter then if pan is applied,
         # and not on initial creation.
@@ -397,7 +401,7 @@ class Sequence:
         Creates MLT Producer and adds attributes to it, but does 
         not add it to track/playlist object.
         """
-        producer = mlt.Producer(self.profile, str(path)) # this runs 0.5s+ on some clips
+        producer = producercache.create_file_producer(self.profile, path) # this runs 0.5s+ on some clips if media has not been probed before
 
         mltrefhold.hold_ref(producer)
         producer.path = path
@@ -1055,27 +1059,81 @@ class Sequence:
         """
         Returns clip or None if not found.
         """
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for j in range(0, len(track.clips)):
-                clip = track.clips[j]
-                if clip.id == clip_id:
-                    return clip
-
-        return None
+        clip, track = self._get_clip_id_index_entry(clip_id)
+        return clip
 
     def get_track_and_index_for_id(self, clip_id):
         """
-        Returns clip or None if not found.
+        Returns (track, clip index) or (None, None) if not found.
         """
-        for i in range(1, len(self.tracks)):
-            track = self.tracks[i]
-            for j in range(0, len(track.clips)):
-                clip = track.clips[j]
-                if clip.id == clip_id:
-                    return (track, j)
+        clip, track = self._get_clip_id_index_entry(clip_id)
+        if clip == None:
+            return (None, None)
+
+        return (track, track.clips.index(clip))
+
+    def _get_clip_id_index_entry(self, clip_id):
+        index_built = False
+        if self.clip_id_index == None:
+            self._build_clip_id_index()
+            index_built = True
+
+        clip, track = self._get_indexed_clip(clip_id)
+        if clip == None and index_built == False:
+            # Clips were added or removed without going through edit.py atomic edit ops, rebuild index.
+            self._build_clip_id_index()
+            clip, track = self._get_indexed_clip(clip_id)
+        if clip != None:
+            return (clip, track)
+
+        # Hidden track contents are replaced constantly and are not indexed.
+        track = self.tracks[-1]
+        for clip in track.clips:
+            if clip.id == clip_id:
+                return (clip, track)
 
         return (None, None)
+
+    def _get_indexed_clip(self, clip_id):
+        try:
+            clip, track = self.clip_id_index[clip_id]
+        except KeyError:
+            return (None, None)
+
+        # Indexed clip may have been removed from track.
+        for track_clip in track.clips:
+            if track_clip is clip:
+                return (clip, track)
+        return (None, None)
+
+    def _build_clip_id_index(self):
+        self.clip_id_index = {}
+        # Iterate backwards so that first clip in track order wins if ids are not unique.
+        for i in range(len(self.tracks) - 2, 0, -1):
+            track = self.tracks[i]
+            for clip in reversed(track.clips):
+                self.clip_id_index[clip.id] = (clip, track)
+
+    def clip_added_to_index(self, clip, track):
+        if self.clip_id_index == None or not self._is_indexed_track(track):
+            return
+        self.clip_id_index[clip.id] = (clip, track)
+
+    def clip_removed_from_index(self, clip, track):
+        if self.clip_id_index == None or not self._is_indexed_track(track):
+            return
+        try:
+            indexed_clip, indexed_track = self.clip_id_index[clip.id]
+            if indexed_clip is clip:
+                self.clip_id_index.pop(clip.id)
+        except KeyError:
+            pass
+
+    def invalidate_clip_id_index(self):
+        self.clip_id_index = None
+
+    def _is_indexed_track(self, track):
+        return (track.id > 0 and track.id < len(self.tracks) - 1)
         
     def set_track_mute_state(self, track_index, mute_state):
         track = self.tracks[track_index]
@@ -1251,6 +1309,7 @@ def _copy_track_contents(from_track, to_track, to_sequence):
     
     from_track.clear()
     from_track.clips = []
+    from_track.sequence.invalidate_clip_id_index()
 
     # Copy track attributes.
     to_sequence.set_track_mute_state(to_track.id, from_track.mute_state)
@@ -0,0 +1,238 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module renders sequences by reusing timeline render segment files.
+
+Segments that are still valid are used as they are and only ranges between them are
+rendered without audio using the render args of the render item. Audio is rendered once
+for the whole range so that there are no seams in it. All files are then joined and muxed
+with audio into output file without re-encoding. This can only be done when output file
+is rendered with exactly the same encoding args as timeline render segments.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import appconsts
+import editorpersistance
+import renderconsumer
+import userfolders
+
+SMART_RENDER_DIR = "smartrender"
+
+# Segments shorter than this are rendered again, joining very short files is not worth it.
+MIN_SEGMENT_FRAMES = 5
+
+
+def can_smart_render(args_vals_list, render_path, profile, seq_profile):
+    """
+    Returns True if output file can be created by joining timeline render segments.
+    """
+    if renderconsumer.can_concat_files() == False:
+        return False
+
+    # Timeline render segments are full size renders with project profile.
+    if editorpersistance.prefs.tline_render_size != appconsts.PROXY_SIZE_FULL:
+        return False
+    if _get_profile_key(profile) != _get_profile_key(seq_profile) or profile.progressive() == False:
+        return False
+
+    encoding = get_segments_encoding()
+    name, ext = os.path.splitext(render_path)
+    if ext.lstrip(".") != encoding.extension:
+        return False
+
+    # Bitrate, quality, preset and audio args all have to match, or output would have segments quality.
+    return (dict(args_vals_list) == dict(get_segments_args_vals_list(seq_profile)))
+
+def get_segments_encoding():
+    return renderconsumer.proxy_encodings[editorpersistance.prefs.tline_render_encoding]
+
+def get_segments_args_vals_list(profile):
+    # Timeline render segments are rendered with encoding args and proxy bitrate, see tlinerenderserver.py.
+    args_vals_list = get_segments_encoding().get_args_vals_tuples_list(profile)
+    proxy_rate = renderconsumer.get_proxy_render_rate(profile.width(), profile.height())
+    return [(k, v) for k, v in args_vals_list if k != "vb"] + [("vb", str(int(proxy_rate)) + "k")]
+
+def get_render_pieces(segments, start_frame, end_frame):
+    """
+    Returns list of (in frame, out frame, segment file path or None) covering range,
+    out frames are inclusive. Pieces with None for path need to be rendered.
+    """
+    pieces = []
+    frame = start_frame
+    for seg_start, seg_end, clip_path in sorted(segments):
+        # Only segments completely inside range are used.
+        if seg_start < frame or seg_end - 1 > end_frame:
+            continue
+        if seg_end - seg_start < MIN_SEGMENT_FRAMES or os.path.isfile(clip_path) == False:
+            continue
+        if seg_start > frame:
+            pieces.append((frame, seg_start - 1, None))
+        pieces.append((seg_start, seg_end - 1, clip_path))
+        frame = seg_end
+
+    if frame <= end_frame:
+        pieces.append((frame, end_frame, None))
+
+    return pieces
+
+def _get_profile_key(profile):
+    return (profile.width(), profile.height(), profile.frame_rate_num(), profile.frame_rate_den(),
+            profile.sample_aspect_num(), profile.sample_aspect_den())
+
+
+class SmartRenderPlayer(threading.Thread):
+    """
+    Renders range using valid timeline render segments, has the interface of
+    renderconsumer.FileRenderPlayer that is used by render threads.
+
+    If output file cannot be joined from pieces, range is rendered with given consumer.
+    """
+    def __init__(self, producer, consumer, profile, segments, args_vals_list, render_path, start_frame, stop_frame):
+        threading.Thread.__init__(self)
+        self.producer = producer
+        self.consumer = consumer
+        self.profile = profile
+        self.segments = segments
+        self.args_vals_list = args_vals_list
+        self.render_path = render_path
+        self.start_frame = start_frame
+        self.stop_frame = stop_frame
+        self.wait_for_producer_end_stop = True # for fallback render
+
+        self.running = False
+        self.has_started_running = False
+        self.stopped = False
+        self.aborted = False
+
+        self.has_audio = (dict(args_vals_list).get("an") == None)
+        self.frames_done = 0 # video and audio frames
+        self.piece_player = None
+        self.piece_start = 0
+        self.fallback_player = None
+
+    def run(self):
+        self.running = True
+        self.has_started_running = True
+
+        pieces = get_render_pieces(self.segments, self.start_frame, self.stop_frame)
+        reused_frames = sum([out_frame - in_frame + 1 for in_frame, out_frame, clip_path in pieces if clip_path != None])
+        print("Smart render, reused frames:", reused_frames, "/", self.stop_frame - self.start_frame + 1)
+
+        if reused_frames == 0 or self._render_pieces(pieces) == False:
+            if self.aborted == False:
+                print("Smart render could not join segments, rendering range.")
+                self._render_range()
+
+        self.running = False
+        self.stopped = True
+
+    def _render_pieces(self, pieces):
+        pieces_dir = userfolders.get_cache_dir() + SMART_RENDER_DIR
+        if not os.path.isdir(pieces_dir):
+            os.mkdir(pieces_dir)
+        render_dir = tempfile.mkdtemp(dir=pieces_dir)
+
+        try:
+            root, ext = os.path.splitext(self.render_path)
+
+            # Audio is rendered for the whole range, audio in segment files is not used.
+            audio_path = None
+            if self.has_audio == True:
+                audio_path = render_dir + "/audio" + ext
+                if self._render_piece(audio_path, [("vn", "1")], self.start_frame, self.stop_frame) == False:
+                    return False
+
+            file_paths = []
+            durations = []
+            for in_frame, out_frame, clip_path in pieces:
+                if clip_path == None:
+                    clip_path = render_dir + "/piece_" + str(len(file_paths)) + ext
+                    if self._render_piece(clip_path, [("an", "1")], in_frame, out_frame) == False:
+                        return False
+                else:
+                    self.frames_done += out_frame - in_frame + 1
+
+                # Segment files have a few padding frames after segment end, durations leave those out.
+                file_paths.append(clip_path)
+                durations.append(float(out_frame - in_frame + 1) / self.profile.fps())
+
+            if self.aborted == True:
+                return False
+
+            return renderconsumer.concat_files(file_paths, self.render_path, durations, audio_path)
+        finally:
+            shutil.rmtree(render_dir)
+
+    def _render_piece(self, file_path, extra_args_vals, in_frame, out_frame):
+        # Render item args are the same as timeline render segments args, see can_smart_render().
+        renderconsumer.performance_settings_enabled = False
+        consumer = renderconsumer.get_mlt_render_consumer(file_path, self.profile, self.args_vals_list + extra_args_vals)
+        renderconsumer.performance_settings_enabled = True
+
+        # Cut producer ends at piece end so that exactly piece frames get rendered.
+        piece_producer = self.producer.cut(in_frame, out_frame)
+        self.piece_start = self.frames_done
+        self.piece_player = renderconsumer.FileRenderPlayer(None, piece_producer, consumer, 0, out_frame - in_frame)
+        self.piece_player.start()
+
+        while self.piece_player.stopped == False:
+            if self.aborted == True:
+                self.piece_player.shutdown()
+                return False
+            time.sleep(0.2)
+
+        self.piece_player = None
+        self.frames_done += out_frame - in_frame + 1
+        return (self.aborted == False and os.path.isfile(file_path))
+
+    def _render_range(self):
+        self.fallback_player = renderconsumer.FileRenderPlayer(None, self.producer, self.consumer, self.start_frame, self.stop_frame)
+        self.fallback_player.wait_for_producer_end_stop = self.wait_for_producer_end_stop
+        self.fallback_player.start()
+        self.fallback_player.join()
+
+    def shutdown(self):
+        self.aborted = True
+        if self.piece_player != None:
+            self.piece_player.shutdown()
+        if self.fallback_player != None:
+            self.fallback_player.shutdown()
+        self.running = False
+
+    def get_render_fraction(self):
+        if self.fallback_player != None:
+            return self.fallback_player.get_render_fraction()
+
+        frames_done = self.frames_done
+        piece_player = self.piece_player
+        if piece_player != None:
+            frames_done = self.piece_start + max(piece_player.producer.frame(), 0)
+
+        # Video and audio are counted as equal amounts of work.
+        render_length = self.stop_frame - self.start_frame + 1
+        if self.has_audio == True:
+            render_length = render_length * 2
+        return min(float(frames_done) / float(render_length), 1.0)
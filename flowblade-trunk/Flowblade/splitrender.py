@@ -0,0 +1,259 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module renders sequences in parts in parallel processes.
+
+Render range is split into parts that are rendered without audio in pool processes
+using the render args of the render item. Audio is rendered once for the whole range
+in its own process so that there are no seams in it. Parts are then joined and muxed
+with audio into output file without re-encoding.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import mltprofiles
+import persistance
+import renderconsumer
+import userfolders
+
+SPLIT_RENDER_DIR = "splitrender"
+
+# Encoders use several threads, so there are less processes than cores.
+SPLIT_RENDER_MAX_PROCESSES = 4
+SPLIT_RENDER_MIN_PART_FRAMES = 250
+
+# Output formats and codecs that are not single video files that could be joined.
+_NOT_SPLITTABLE_FORMATS = ["image2"]
+_NOT_SPLITTABLE_VCODECS = ["png", "bmp", "dpx", "ppm", "targa", "tiff"]
+
+# Set in pool processes by _init_part_render_process()
+_project = None
+_render_profile = None
+_args_vals_list = None
+_parts_progress = None
+
+
+def can_split_render(args_vals_list, render_path, length):
+    """
+    Returns True if sequence can be rendered in parts that are joined into output file.
+    """
+    if renderconsumer.can_concat_files() == False:
+        return False
+    if _get_processes_count() < 2 or length < SPLIT_RENDER_MIN_PART_FRAMES * 2:
+        return False
+    if render_path.find("%") != -1:
+        return False
+
+    args = dict(args_vals_list)
+    if args.get("f") in _NOT_SPLITTABLE_FORMATS or args.get("vcodec") in _NOT_SPLITTABLE_VCODECS:
+        return False
+
+    return True
+
+def get_render_parts(start_frame, end_frame, parts_count, gop_size):
+    """
+    Returns list of (in frame, out frame) parts covering range, out frames are inclusive.
+    Part lengths are multiples of GOP size so that GOP structure is same as in a single render.
+    """
+    length = end_frame - start_frame + 1
+    part_frames = max(length // parts_count, SPLIT_RENDER_MIN_PART_FRAMES)
+    if gop_size > 0:
+        part_frames = max((part_frames // gop_size) * gop_size, gop_size)
+
+    parts = []
+    for in_frame in range(start_frame, end_frame + 1, part_frames):
+        parts.append((in_frame, min(in_frame + part_frames - 1, end_frame)))
+
+    # Very short last part is added to previous part.
+    if len(parts) > 1 and parts[-1][1] - parts[-1][0] + 1 < SPLIT_RENDER_MIN_PART_FRAMES // 2:
+        last_in, last_out = parts.pop()
+        prev_in, prev_out = parts.pop()
+        parts.append((prev_in, last_out))
+
+    return parts
+
+def _get_processes_count():
+    return min(SPLIT_RENDER_MAX_PROCESSES, multiprocessing.cpu_count())
+
+def _get_gop_size(args_vals_list):
+    try:
+        return int(dict(args_vals_list).get("g", 0))
+    except ValueError:
+        return 0
+
+
+class SplitRenderPlayer(threading.Thread):
+    """
+    Renders range in parallel parts, has the interface of renderconsumer.FileRenderPlayer
+    that is used by render threads.
+
+    If parts cannot be rendered or joined, range is rendered with given consumer.
+    """
+    def __init__(self, producer, consumer, project_file_path, profile_name, args_vals_list, render_path, start_frame, stop_frame):
+        threading.Thread.__init__(self)
+        self.producer = producer
+        self.consumer = consumer
+        self.project_file_path = project_file_path
+        self.profile_name = profile_name
+        self.args_vals_list = args_vals_list
+        self.render_path = render_path
+        self.start_frame = start_frame
+        self.stop_frame = stop_frame
+        self.wait_for_producer_end_stop = True # for fallback render
+
+        self.running = False
+        self.has_started_running = False
+        self.stopped = False
+        self.aborted = False
+
+        self.parts_progress = None
+        self.fallback_player = None
+
+    def run(self):
+        self.running = True
+        self.has_started_running = True
+
+        if self._render_parts() == False and self.aborted == False:
+            print("Split render failed, rendering range in one piece.")
+            self._render_range()
+
+        self.running = False
+        self.stopped = True
+
+    def _render_parts(self):
+        parts_dir = userfolders.get_cache_dir() + SPLIT_RENDER_DIR
+        if not os.path.isdir(parts_dir):
+            os.mkdir(parts_dir)
+        render_dir = tempfile.mkdtemp(dir=parts_dir)
+
+        try:
+            processes_count = _get_processes_count()
+            # Two parts per process keep all processes busy when some parts render slower.
+            parts = get_render_parts(self.start_frame, self.stop_frame, processes_count * 2, _get_gop_size(self.args_vals_list))
+            root, ext = os.path.splitext(self.render_path)
+            has_audio = (dict(self.args_vals_list).get("an") == None)
+
+            # Audio is rendered first because it is the longest task.
+            tasks = []
+            audio_path = None
+            if has_audio == True:
+                audio_path = render_dir + "/audio" + ext
+                tasks.append((len(parts), self.start_frame, self.stop_frame, audio_path, [("vn", "1")]))
+
+            part_paths = []
+            for in_frame, out_frame in parts:
+                part_path = render_dir + "/part_" + str(len(part_paths)).zfill(3) + ext
+                tasks.append((len(part_paths), in_frame, out_frame, part_path, [("an", "1")]))
+                part_paths.append(part_path)
+
+            print("Split render, parts:", len(parts), ", processes:", processes_count)
+
+            pool_context = multiprocessing.get_context("fork")
+            self.parts_progress = pool_context.Array("i", len(parts) + 1, lock=False) # rendered frames for parts and audio
+            pool = pool_context.Pool(processes_count, _init_part_render_process,
+                                     (self.project_file_path, self.profile_name, self.args_vals_list, self.parts_progress))
+            try:
+                results = pool.imap_unordered(_render_part, tasks)
+                tasks_left = len(tasks)
+                while tasks_left > 0:
+                    if self.aborted == True:
+                        return False
+
+                    try:
+                        task_rendered = results.next(0.3)
+                    except multiprocessing.TimeoutError:
+                        continue
+
+                    if task_rendered == False:
+                        return False
+                    tasks_left -= 1
+            finally:
+                pool.terminate()
+                pool.join()
+
+            if self.aborted == True:
+                return False
+
+            return renderconsumer.concat_files(part_paths, self.render_path, None, audio_path)
+        finally:
+            shutil.rmtree(render_dir)
+
+    def _render_range(self):
+        self.fallback_player = renderconsumer.FileRenderPlayer(None, self.producer, self.consumer, self.start_frame, self.stop_frame)
+        self.fallback_player.wait_for_producer_end_stop = self.wait_for_producer_end_stop
+        self.fallback_player.start()
+        self.fallback_player.join()
+
+    def shutdown(self):
+        self.aborted = True
+        if self.fallback_player != None:
+            self.fallback_player.shutdown()
+        self.running = False
+
+    def get_render_fraction(self):
+        if self.fallback_player != None:
+            return self.fallback_player.get_render_fraction()
+        if self.parts_progress == None:
+            return 0.0
+
+        # Video parts and audio are counted as equal amounts of work.
+        render_length = self.stop_frame - self.start_frame + 1
+        audio_frames = self.parts_progress[-1]
+        video_frames = sum(self.parts_progress[:-1])
+        if dict(self.args_vals_list).get("an") != None:
+            return min(float(video_frames) / float(render_length), 1.0)
+        return min(float(video_frames + audio_frames) / float(render_length * 2), 1.0)
+
+
+# --------------------------------------------------- pool processes
+def _init_part_render_process(project_file_path, profile_name, args_vals_list, parts_progress):
+    # Every process loads its own project so that parts do not share MLT objects.
+    global _project, _render_profile, _args_vals_list, _parts_progress
+    persistance.show_messages = False
+    _project = persistance.load_project(project_file_path, False)
+    _render_profile = mltprofiles.get_profile(profile_name)
+    _args_vals_list = args_vals_list
+    _parts_progress = parts_progress
+
+def _render_part(task):
+    # Runs in pool process, returns True if part was rendered.
+    progress_index, in_frame, out_frame, part_path, extra_args_vals = task
+    try:
+        consumer = renderconsumer.get_mlt_render_consumer(part_path, _render_profile, _args_vals_list + extra_args_vals)
+        part_producer = _project.c_seq.tractor.cut(in_frame, out_frame)
+
+        render_player = renderconsumer.FileRenderPlayer(None, part_producer, consumer, 0, out_frame - in_frame)
+        render_player.start()
+        while render_player.stopped == False:
+            _parts_progress[progress_index] = max(part_producer.frame(), 0)
+            time.sleep(0.3)
+
+        _parts_progress[progress_index] = out_frame - in_frame + 1
+    except Exception as e:
+        print("Split render part failed", part_path, e)
+        return False
+
+    return os.path.isfile(part_path)
@@ -0,0 +1,136 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module caches data that is slow to create when application or a render process starts.
+
+MLT environment detection starts avformat consumers to list codecs and formats, and
+filters and compositors XML files are parsed with minidom. Results of these are
+saved pickled in a cache file and used on later launches until MLT version, MLT modules
+directories, application version or the XML files change.
+"""
+
+import glob
+import mlt
+import os
+import pickle
+
+import appconsts
+import atomicfile
+import editorstate
+import respaths
+import userfolders
+import utils
+
+CACHE_FILE_VERSION = 1
+
+# Cached data names
+ENV_FEATURES = "env_features"
+FILTER_INFOS = "filter_infos"
+COMPOSITOR_INFOS = "compositor_infos"
+
+# Used to find MLT modules directories when MLT_REPOSITORY is not set.
+MLT_MODULES_DIRS_GLOBS = ["/usr/lib*/mlt*", "/usr/lib/*/mlt*", "/usr/local/lib*/mlt*", "/app/lib/mlt*"]
+
+_cache = None # data name -> pickled data
+_cache_changed = False
+
+
+def get_data(name):
+    """
+    Returns cached data or None if data is not cached for current environment.
+    """
+    try:
+        return pickle.loads(_get_cache()[name])
+    except KeyError:
+        return None
+
+def set_data(name, data):
+    # Data is pickled now so that later changes to data objects do not end up in cache.
+    global _cache_changed
+    _get_cache()[name] = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    _cache_changed = True
+
+def save():
+    global _cache_changed
+    if _cache_changed == False:
+        return
+
+    try:
+        with atomicfile.AtomicFileWriter(_get_cache_file_path(), "wb") as afw:
+            pickle.dump((CACHE_FILE_VERSION, _get_cache_key(), _cache), afw.get_file(), pickle.HIGHEST_PROTOCOL)
+        _cache_changed = False
+    except Exception as e:
+        print("Saving startup cache failed", e)
+
+def _get_cache():
+    # Cache file is read when first needed.
+    global _cache
+    if _cache != None:
+        return _cache
+
+    _cache = {}
+    cache_file_path = _get_cache_file_path()
+    if os.path.isfile(cache_file_path):
+        try:
+            version, cache_key, cache = utils.unpickle(cache_file_path)
+            if version == CACHE_FILE_VERSION and cache_key == _get_cache_key():
+                _cache = cache
+            else:
+                print("Startup cache is out of date.")
+        except Exception as e:
+            print("Loading startup cache failed", e)
+
+    return _cache
+
+def _get_cache_key():
+    try:
+        mlt_version = mlt.LIBMLT_VERSION
+    except:
+        mlt_version = None
+
+    # Installing or updating MLT modules changes modules directories mtimes.
+    modules_dirs = []
+    for modules_dir in _get_mlt_modules_dirs():
+        modules_dirs.append((modules_dir, _get_mtime(modules_dir)))
+
+    return (mlt_version, modules_dirs, editorstate.appversion,
+            _get_mtime(respaths.FILTERS_XML_DOC), _get_mtime(respaths.COMPOSITORS_XML_DOC))
+
+def _get_mlt_modules_dirs():
+    repository = os.environ.get("MLT_REPOSITORY")
+    if repository != None:
+        return [repository]
+
+    modules_dirs = []
+    for dirs_glob in MLT_MODULES_DIRS_GLOBS:
+        for modules_dir in glob.glob(dirs_glob):
+            if os.path.isdir(modules_dir) and not modules_dir in modules_dirs:
+                modules_dirs.append(modules_dir)
+    return sorted(modules_dirs)
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _get_cache_file_path():
+    return userfolders.get_cache_dir() + appconsts.STARTUP_CACHE_FILE
@@ -0,0 +1,270 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module creates and caches thumbnail tiles of media frames.
+
+Tiles are addressed by media file, frame and tile height. Timeline filmstrips
+get tiles at frame intervals that depend on zoom level, and intervals are powers of two
+so that zoom levels share tiles. Trim view match frames are also tiles.
+
+Missing tiles are decoded by a thread pool and saved as PNG files in a cache folder
+that is kept between sessions, least recently used tiles are deleted when cache
+is larger than set in preferences. Recently used tiles are also kept in memory.
+
+Frames are fetched from producers already scaled to surface size by MLT and
+written straight into cairo surface data, see get_frame_surface().
+"""
+
+from gi.repository import GLib
+
+import cairo
+import collections
+import concurrent.futures
+import hashlib
+import mlt
+import numpy as np
+import os
+import threading
+
+import appconsts
+import editorpersistance
+from editorstate import PROJECT
+import updater
+import userfolders
+
+# Frame intervals between filmstrip tiles, smallest one that leaves room for tile is used.
+TILE_INTERVALS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192]
+
+MIN_TILE_HEIGHT = 16
+MAX_MEMORY_TILES = 1000
+DECODER_THREADS = 2
+MAX_THREAD_PRODUCERS = 8
+
+# Timeline is repainted this long after first of tiles decoded together is ready.
+REPAINT_DELAY_MS = 150
+
+_tiles = collections.OrderedDict() # (media path, frame, width, height) -> cairo surface, least recently used first
+_pending = set()
+_failed = set()
+_lock = threading.Lock()
+
+_executor = None
+_thread_data = threading.local()
+_repaint_queued = False
+
+
+# --------------------------------------------------------------- interface
+def get_tile_width(height):
+    profile = PROJECT().profile
+    return int(height * float(profile.display_aspect_num()) / float(profile.display_aspect_den()))
+
+def get_tile_interval(pix_per_frame, tile_width):
+    for interval in TILE_INTERVALS:
+        if interval * pix_per_frame >= tile_width:
+            return interval
+    return TILE_INTERVALS[-1]
+
+def get_tile(media_path, frame, height):
+    """
+    Returns tile surface or None if tile is not available yet.
+    Missing tiles are created in background and timeline is repainted when they are ready.
+    """
+    key = (media_path, frame, get_tile_width(height), height)
+    with _lock:
+        surface = _get_memory_tile(key)
+        if surface != None or key in _pending or key in _failed:
+            return surface
+        _pending.add(key)
+
+    _get_executor().submit(_create_tile_task, key)
+    return None
+
+def get_tile_sync(media_path, frame, height):
+    """
+    Returns tile surface, tile is created in calling thread if needed.
+    Returns None if frame could not be decoded.
+    """
+    key = (media_path, frame, get_tile_width(height), height)
+    with _lock:
+        surface = _get_memory_tile(key)
+    if surface != None:
+        return surface
+
+    try:
+        surface = _load_or_create_tile(*key)
+    except Exception as e:
+        print("Thumbnail tile create failed", media_path, frame, e)
+        return None
+
+    with _lock:
+        _add_memory_tile(key, surface)
+    return surface
+
+def get_frame_surface(producer, frame, width, height):
+    """
+    Returns cairo image surface of producer frame scaled by MLT to given size.
+    """
+    producer.set_speed(0)
+    producer.seek(frame)
+    mlt_frame = producer.get_frame()
+    mlt_frame.set("consumer_deinterlace", 1)
+    mlt_rgba = mlt_frame.get_image(mlt.mlt_image_rgb24a, width, height)
+
+    # MLT RGBA bytes are swizzled directly into surface data that cairo reads as native endian BGRA,
+    # so frame data is copied only once.
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    src = np.frombuffer(mlt_rgba, dtype=np.uint8, count=width * height * 4).reshape((height, width, 4))
+    dst = np.ndarray((height, width, 4), dtype=np.uint8, buffer=surface.get_data(), strides=(surface.get_stride(), 4, 1))
+    surface.flush()
+    dst[:, :, 0:3] = src[:, :, 2::-1]
+    surface.mark_dirty()
+    return surface
+
+def evict_cached_tiles():
+    """
+    Deletes least recently used tile files until cache is within size set in preferences.
+    """
+    max_size = editorpersistance.prefs.thumb_tile_cache_size * 1024 * 1024
+    tiles_dir = _get_tiles_dir()
+    cached_files = []
+    cache_size = 0
+    for f in os.listdir(tiles_dir):
+        file_path = tiles_dir + "/" + f
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        cached_files.append((stat.st_mtime, stat.st_size, file_path))
+        cache_size += stat.st_size
+
+    # Tile files get their modification time updated when loaded.
+    cached_files.sort()
+    for mtime, size, file_path in cached_files:
+        if cache_size <= max_size:
+            break
+        try:
+            os.remove(file_path)
+            cache_size -= size
+        except OSError:
+            pass
+
+
+# --------------------------------------------------------------- memory cache
+def _get_memory_tile(key):
+    try:
+        surface = _tiles[key]
+    except KeyError:
+        return None
+    _tiles.move_to_end(key)
+    return surface
+
+def _add_memory_tile(key, surface):
+    _tiles[key] = surface
+    while len(_tiles) > MAX_MEMORY_TILES:
+        _tiles.popitem(last=False)
+
+
+# --------------------------------------------------------------- tile creation
+def _get_executor():
+    global _executor
+    if _executor == None:
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers=DECODER_THREADS)
+    return _executor
+
+def _create_tile_task(key):
+    media_path, frame, width, height = key
+    try:
+        surface = _load_or_create_tile(media_path, frame, width, height)
+    except Exception as e:
+        print("Thumbnail tile create failed", media_path, frame, e)
+        surface = None
+
+    with _lock:
+        _pending.discard(key)
+        if surface == None:
+            _failed.add(key) # Not tried again every time timeline is drawn.
+            return
+        _add_memory_tile(key, surface)
+
+    _queue_repaint()
+
+def _queue_repaint():
+    global _repaint_queued
+    if _repaint_queued == True:
+        return
+    _repaint_queued = True
+    GLib.timeout_add(REPAINT_DELAY_MS, _do_repaint)
+
+def _do_repaint():
+    global _repaint_queued
+    _repaint_queued = False
+    updater.repaint_tline()
+    return False
+
+def _load_or_create_tile(media_path, frame, width, height):
+    tile_path = _get_tile_path(media_path, frame, width, height)
+    if os.path.isfile(tile_path):
+        os.utime(tile_path) # Marks tile as recently used for cache eviction.
+        return cairo.ImageSurface.create_from_png(tile_path)
+
+    surface = _decode_tile(media_path, frame, width, height)
+
+    # Tile is written with temp name so that other threads never load partial files.
+    temp_path = tile_path + "_" + str(threading.get_ident())
+    surface.write_to_png(temp_path)
+    os.replace(temp_path, tile_path)
+    return surface
+
+def _decode_tile(media_path, frame, width, height):
+    return get_frame_surface(_get_thread_producer(media_path), frame, width, height)
+
+def _get_thread_producer(media_path):
+    # Producers are not shared between threads, every decoder thread keeps its own.
+    try:
+        producers = _thread_data.producers
+    except AttributeError:
+        producers = collections.OrderedDict()
+        _thread_data.producers = producers
+
+    try:
+        producer = producers[media_path]
+        producers.move_to_end(media_path)
+        return producer
+    except KeyError:
+        pass
+
+    producer = mlt.Producer(PROJECT().profile, str(media_path))
+    if producer.is_valid() == False:
+        raise IOError("Producer not valid")
+    producers[media_path] = producer
+    while len(producers) > MAX_THREAD_PRODUCERS:
+        producers.popitem(last=False)
+    return producer
+
+def _get_tile_path(media_path, frame, width, height):
+    # Tiles of changed media files have different names.
+    stat = os.stat(media_path)
+    md_str = str((media_path, stat.st_size, stat.st_mtime))
+    media_hash = hashlib.md5(md_str.encode('utf-8')).hexdigest()
+    return _get_tiles_dir() + "/" + media_hash + "_" + str(frame) + "_" + str(width) + "x" + str(height) + ".png"
+
+def _get_tiles_dir():
+    return userfolders.get_cache_dir() + appconsts.THUMB_TILES_DIR
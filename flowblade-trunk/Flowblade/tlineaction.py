@@ -36,6 +36,7 @@ import time
 
 import app
 import appconsts
+import autosaving
 import boxmove
 import clipeffectseditor
 import compositeeditor
@@ -822,12 +823,16 @@ def split_audio_button_pressed():
 def sync_all_compositors():
     full_sync_data, orphaned_compositors = edit.get_full_compositor_sync_data()
     
-    for sync_item in full_sync_data:
-        destroy_id, orig_in, orig_out, clip_start, clip_end, clip_track, orig_compositor_track = sync_item
-        compositor = current_sequence().get_compositor_for_destroy_id(destroy_id)
-        data = {"compositor":compositor,"clip_in":clip_start,"clip_out":clip_end}
-        action = edit.move_compositor_action(data)
-        action.do_edit()
+    edit.begin_transaction()
+    try:
+        for sync_item in full_sync_data:
+            destroy_id, orig_in, orig_out, clip_start, clip_end, clip_track, orig_compositor_track = sync_item
+            compositor = current_sequence().get_compositor_for_destroy_id(destroy_id)
+            data = {"compositor":compositor,"clip_in":clip_start,"clip_out":clip_end}
+            action = edit.move_compositor_action(data)
+            action.do_edit()
+    finally:
+        edit.commit_transaction()
 
 def add_transition_menu_item_selected():
     if movemodes.selected_track == -1:
@@ -1912,10 +1917,14 @@ def do_timeline_filters_paste():
     for i in range(movemodes.selected_range_in, movemodes.selected_range_out + 1):
         target_clips.append(track.clips[i])
         
-    for target_clip in target_clips:
-        data = {"clip":target_clip,"clone_source_clip":source_clip}
-        action = edit.paste_filters_action(data)
-        action.do_edit()
+    edit.begin_transaction()
+    try:
+        for target_clip in target_clips:
+            data = {"clip":target_clip,"clone_source_clip":source_clip}
+            action = edit.paste_filters_action(data)
+            action.do_edit()
+    finally:
+        edit.commit_transaction()
 
 def do_compositor_data_paste(paste_objs):
     data_type, paste_data = paste_objs
@@ -1955,9 +1964,11 @@ def _marker_menu_item_activated(widget, msg):
                 mrk_index = i
         if mrk_index != -1:
             current_sequence().markers.pop(mrk_index)
+            autosaving.project_changed()
             updater.repaint_tline()
     elif msg == "deleteall":
         current_sequence().markers = []
+        autosaving.project_changed()
         updater.repaint_tline()
     else: # seek to marker
         name, frame = current_sequence().markers[int(msg)]
@@ -1981,6 +1992,7 @@ def _marker_add_dialog_callback(dialog, response_id, name_entry):
 
     current_sequence().markers.append((name, current_frame))
     current_sequence().markers = sorted(current_sequence().markers, key=itemgetter(1))
+    autosaving.project_changed()
 
     updater.update_position_bar()
     updater.repaint_tline()
@@ -17,8 +17,10 @@
     You should have received a copy of the GNU General Public License
     along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
 """
+import bisect
 import hashlib
 from gi.repository import Gdk, Gtk
+import multiprocessing
 import os
 from os import listdir
 from os.path import isfile, join
@@ -68,15 +70,30 @@ _segment_colors = { SEGMENT_NOOP:(0.26, 0.29, 0.42),
                     
 DRAG_RANGE_COLOR = (1,1,1,0.3)
 
+# Rendered segment files are kept here between sessions, file names are created from segment content and render settings.
+SEGMENT_CACHE_DIR = "segment_cache"
+
 _project_session_id = -1
 _timeline_renderer = None # this gets set to NoOpRenderer on launch, is never None for long.
 
 _update_thread = None
 
+# Filters content hashes for clips, clip ref is kept so that object ids are not reused while cached.
+_clip_content_hashes = {} # id(clip) -> (clip, content hash)
+
 # ------------------------------------------------------------ MODULE INTERFACE
 def app_launch_clean_up():
     for old_session_dir in listdir(_get_tline_render_dir()):
+        if old_session_dir == SEGMENT_CACHE_DIR:
+            continue
         _delete_dir_and_contents(_get_tline_render_dir() + "/" + old_session_dir)
+
+    # Renders that were interrupted when app last exited.
+    cache_dir = _get_segment_cache_dir()
+    if os.path.isdir(cache_dir):
+        for f in _get_folder_files(cache_dir):
+            if tlinerenderserver.RENDERING_FILE_ID in f:
+                os.remove(cache_dir + "/" + f)
     
 def init_session(): # called when project is loaded
     
@@ -86,6 +103,10 @@ def init_session(): # called when project is loaded
 
     _project_session_id = hashlib.md5(str(os.urandom(32)).encode('utf-8')).hexdigest()
     os.mkdir(_get_session_dir())
+    
+    if not os.path.isdir(_get_segment_cache_dir()):
+        os.mkdir(_get_segment_cache_dir())
+    evict_cached_segments()
 
     tlinerenderserver.launch_render_server()
 
@@ -94,6 +115,7 @@ def delete_session():
     _delete_session_dir()
 
 def init_for_sequence():
+    clear_clip_content_hashes()
     update_renderer_to_mode(None)
 
 def update_renderer_to_mode(old_mode):
@@ -112,6 +134,82 @@ def settings_dialog_launch(widget, event):
 def get_renderer():
     return _timeline_renderer
 
+def clip_content_changed(clip):
+    _clip_content_hashes.pop(id(clip), None)
+
+def edit_action_done(action):
+    # Clips referenced by edit action data may have had their filters changed.
+    for value in action.__dict__.values():
+        if isinstance(value, list):
+            for item in value:
+                if id(item) in _clip_content_hashes:
+                    clip_content_changed(item)
+        elif id(value) in _clip_content_hashes:
+            clip_content_changed(value)
+
+def clear_clip_content_hashes():
+    global _clip_content_hashes
+    _clip_content_hashes = {}
+
+def get_rendered_segments():
+    """
+    Returns list of (start frame, end frame, segment file path) for segments that are rendered
+    and have not been changed since, end frames are exclusive.
+    """
+    if not isinstance(_timeline_renderer, TimeLineRenderer):
+        return []
+
+    rendered_segments = []
+    segments = list(_timeline_renderer.segments)
+    segments_inputs = _timeline_renderer.get_segments_inputs(segments)
+    for seg in segments:
+        if seg.segment_state != SEGMENT_RENDERED or seg.content_hash == "-1":
+            continue
+        if seg.end_frame > current_sequence().seq_len:
+            continue
+        if seg._get_content_hash_for_inputs(segments_inputs[seg]) != seg.content_hash:
+            continue
+        clip_path = seg.get_clip_path()
+        if os.path.isfile(clip_path):
+            rendered_segments.append((seg.start_frame, seg.end_frame, clip_path))
+
+    return rendered_segments
+
+def evict_cached_segments():
+    """
+    Deletes least recently used segment files until cache is within size set in preferences.
+    Files of current segments are not deleted.
+    """
+    max_size = editorpersistance.prefs.tline_render_cache_size * 1024 * 1024
+    in_use = set()
+    for seg in list(getattr(_timeline_renderer, "segments", [])):
+        in_use.add(seg.get_clip_path())
+
+    cache_dir = _get_segment_cache_dir()
+    cached_files = []
+    cache_size = 0
+    for f in _get_folder_files(cache_dir):
+        file_path = cache_dir + "/" + f
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        cached_files.append((stat.st_mtime, stat.st_size, file_path))
+        cache_size += stat.st_size
+
+    # Segment files get their modification time updated when used.
+    cached_files.sort()
+    for mtime, size, file_path in cached_files:
+        if cache_size <= max_size:
+            break
+        if file_path in in_use or tlinerenderserver.RENDERING_FILE_ID in file_path:
+            continue
+        try:
+            os.remove(file_path)
+            cache_size -= size
+        except OSError:
+            pass
+
 # --------------------------------------------------------- menus
 def corner_mode_menu_launched(widget, event):
     guiutils.remove_children(tlinerender_mode_menu)
@@ -155,7 +253,7 @@ def _strip_menu_item_callback(widget, data):
         get_renderer().clear_selection()
         get_renderer().launch_update_thread()
     elif msg == "delete_all":
-        get_renderer().segments = []
+        get_renderer().delete_all_segments()
         if timeline_visible() == True:
             current_sequence().update_hidden_track_for_timeline_rendering()
         gui.tline_render_strip.widget.queue_draw()
@@ -193,6 +291,17 @@ def _get_tline_render_dir():
 def _get_session_dir():
     return _get_tline_render_dir() + "/" + _project_session_id
 
+def _get_segment_cache_dir():
+    return _get_tline_render_dir() + "/" + SEGMENT_CACHE_DIR
+
+def _get_render_settings_id():
+    # Segment files rendered with different profile or render settings are different files.
+    profile = current_sequence().profile
+    settings = (profile.width(), profile.height(), profile.frame_rate_num(), profile.frame_rate_den(),
+                profile.sample_aspect_num(), profile.sample_aspect_den(),
+                editorpersistance.prefs.tline_render_encoding, editorpersistance.prefs.tline_render_size)
+    return str(settings)
+
 def _delete_session_dir():
     session_dir = _get_session_dir()
     _delete_dir_and_contents(session_dir)
@@ -215,7 +324,8 @@ def _sort_segments_comparator(segment):
 class TimeLineRenderer:
 
     def __init__(self):
-        self.segments = []
+        self.segments = [] # sorted by start frame, segments do not overlap
+        self.segment_starts = None # start frames of segments for bisect lookups, None when needs to be rebuilt
         
         self.press_frame = -1
         self.release_frame = -1
@@ -236,9 +346,7 @@ class TimeLineRenderer:
         cr.set_source_rgb(0, 0, 0)
         cr.stroke()
 
-        for seg in self.segments:
-            if seg.end_frame < pos:
-                continue
+        for seg in self.segments[self._get_first_segment_index_ending_after(pos):]:
             if seg.start_frame > _get_last_tline_view_frame_func():
                 break
             if seg.segment_state == SEGMENT_NOOP:
@@ -324,8 +432,6 @@ class TimeLineRenderer:
             self.add_segment(range_start, range_end + 1)
         else:
             self.add_segment(range_start, range_end + 1)
-        
-        self.segments.sort(key=_sort_segments_comparator)
 
     def mouse_clicked(self):
         hit_seg = self.get_hit_segment(self.release_frame)
@@ -369,6 +475,7 @@ class TimeLineRenderer:
     
     def delete_segment(self, segment):
         self.segments.remove(segment)
+        self.segment_starts = None
         if timeline_visible() == True:
             current_sequence().update_hidden_track_for_timeline_rendering()
         gui.tline_render_strip.widget.queue_draw()
@@ -395,8 +502,60 @@ class TimeLineRenderer:
         return (len(self.get_dirty_segments()) == 0)
 
     def update_segments(self):
+        # Segments are rehashed only if their inputs have changed.
+        segments_inputs = self.get_segments_inputs(self.segments)
         for seg in self.segments:
-            seg.update_segment()
+            seg.update_segment(segments_inputs[seg])
+
+    def get_segments_inputs(self, segments):
+        """
+        Returns dict segment -> list of content records for all clips and compositors overlapping segment.
+        Tracks and compositors are walked once and items are matched to segments they overlap,
+        so cost does not multiply with number of segments.
+        """
+        segments_inputs = {}
+        for seg in segments:
+            segments_inputs[seg] = []
+
+        sorted_segments = sorted(segments, key=_sort_segments_comparator)
+        segment_starts = [seg.start_frame for seg in sorted_segments]
+
+        seq = current_sequence()
+        for i in range(1, len(seq.tracks) - 1):
+            track = seq.tracks[i]
+            track_segments = set()
+            clip_start = 0
+            for clip in track.clips:
+                clip_length = clip.clip_out - clip.clip_in + 1 # +1 out inclusive
+                for seg in self._get_overlapping_segments(sorted_segments, segment_starts, clip_start, clip_start + clip_length):
+                    segments_inputs[seg].append((i, clip_start - seg.start_frame, clip.clip_in, clip.clip_out, _get_clip_content_hash(clip)))
+                    track_segments.add(seg)
+                clip_start += clip_length
+            
+            # Segments with no clips on this track.
+            for seg in segments:
+                if not seg in track_segments:
+                    segments_inputs[seg].append((i, "-1"))
+
+        for compositor in seq.compositors:
+            for seg in self._get_overlapping_segments(sorted_segments, segment_starts, compositor.clip_in, compositor.clip_out + 1):
+                segments_inputs[seg].append(_get_compositor_content_record(compositor, seg.start_frame))
+
+        return segments_inputs
+
+    def _get_overlapping_segments(self, sorted_segments, segment_starts, range_start, range_end):
+        # Segment end frame is exclusive but item starting at segment end frame is considered overlapping,
+        # range_end is exclusive.
+        overlapping = []
+        index = bisect.bisect_right(segment_starts, range_end - 1) - 1
+        while index >= 0:
+            seg = sorted_segments[index]
+            if seg.end_frame < range_start:
+                break # Segments do not overlap, so all earlier segments end before range too.
+            overlapping.append(seg)
+            index -= 1
+
+        return overlapping
 
     def get_dirty_segments(self):
         dirty = []
@@ -437,33 +596,59 @@ class TimeLineRenderer:
                 edit._insert_blank(hidden_track, index, seq_len - hidden_track.get_length())
 
     def get_hit_segment(self, frame):
-        for segment in self.segments:
-            if segment.hit(frame) == True:
-                return segment
+        # Segments do not overlap so only the last segment starting at or before frame can be hit.
+        index = bisect.bisect_right(self._get_segment_starts(), frame) - 1
+        if index >= 0 and self.segments[index].hit(frame) == True:
+            return self.segments[index]
         
         return None
 
     def get_covered_segments(self, range_start, range_end):
+        # Covered segments start after range start, we can stop at first segment ending after range end.
         covered = []
-        for segment in self.segments:
-            if segment.covered(range_start, range_end) == True:
-                covered.append(segment)
+        index = bisect.bisect_right(self._get_segment_starts(), range_start)
+        for segment in self.segments[index:]:
+            if segment.covered(range_start, range_end) == False:
+                break
+            covered.append(segment)
         return covered
 
     def add_segment(self, seg_start, seg_end):
         seg = TimeLineSegment(seg_start, seg_end)
-        _timeline_renderer.segments.append(seg)
+        self.segments.append(seg)
+        self.segments.sort(key=_sort_segments_comparator)
+        self.segment_starts = None
         
     def remove_segments(self, remove_list):
-        remaining_set = set(self.segments) - set(remove_list)
-        self.segments = list(remaining_set)
+        remove_set = set(remove_list)
+        self.segments = [seg for seg in self.segments if not seg in remove_set]
+        self.segment_starts = None
+
+    def delete_all_segments(self):
+        self.segments = []
+        self.segment_starts = None
+
+    def _get_segment_starts(self):
+        if self.segment_starts == None:
+            self.segment_starts = [seg.start_frame for seg in self.segments]
+        return self.segment_starts
+
+    def _get_first_segment_index_ending_after(self, frame):
+        index = bisect.bisect_right(self._get_segment_starts(), frame) - 1
+        if index < 0:
+            return 0
+        if self.segments[index].end_frame < frame:
+            return index + 1
+        return index
 
     # ------------------------------------------------ RENDERING
-    def update_timeline_rendering_status(self, rendering_file, fract, render_completed, completed_segments):
+    def update_timeline_rendering_status(self, rendering_files, fractions, render_completed, completed_segments):
+        # Multiple segments may be rendering at the same time, fractions are in same order as rendering_files.
         dirty = self.get_dirty_segments()
         for segment in dirty:
-            if segment.get_clip_path() == rendering_file:
-                segment.rendered_fract = fract
+            clip_path = segment.get_clip_path()
+            if clip_path in rendering_files:
+                segment.rendered_fract = fractions[rendering_files.index(clip_path)]
             else:
                 segment.maybe_set_completed(completed_segments)
                 
@@ -512,6 +697,7 @@ class TimeLineSegment:
         self.selected = False
 
         self.content_hash = "-1"
+        self.content_inputs = None
 
         self.rendered_fract = 0.0
     
@@ -548,7 +734,10 @@ class TimeLineSegment:
 
     # -------------------------------------------- CLIP AND RENDERING
     def get_clip_path(self):
-        return _get_session_dir() + "/" + self.content_hash + "." + tlinerenderserver.get_encoding_extension()
+        # Segment contents hash has clip positions relative to segment start but not segment length.
+        file_id_str = self.content_hash + str(self.end_frame - self.start_frame) + _get_render_settings_id()
+        file_id = hashlib.md5(file_id_str.encode('utf-8')).hexdigest()
+        return _get_segment_cache_dir() + "/" + file_id + "." + tlinerenderserver.get_encoding_extension()
     
     def maybe_set_completed(self, completed_segments):
         if self.get_clip_path() in completed_segments:
@@ -561,7 +750,12 @@ class TimeLineSegment:
         self.create_clip()
     
     def create_clip(self):
-        self.producer = current_sequence().create_file_producer_clip(str(self.get_clip_path()))
+        clip_path = self.get_clip_path()
+        try:
+            os.utime(clip_path) # Marks segment file as recently used for cache eviction.
+        except OSError:
+            pass
+        self.producer = current_sequence().create_file_producer_clip(str(clip_path))
         
         """
         # THIS IS USEFUL WHEN TESTING
@@ -584,8 +778,12 @@ class TimeLineSegment:
         return False
         
     # ----------------------------------------- CONTENT HASH
-    def update_segment(self):
-        new_hash = self.get_content_hash()
+    def update_segment(self, content_inputs):
+        if content_inputs != self.content_inputs:
+            new_hash = self._get_content_hash_for_inputs(content_inputs)
+            self.content_inputs = content_inputs
+        else:
+            new_hash = self.content_hash
         
         if new_hash != self.content_hash:
             if get_tline_rendering_mode() == appconsts.TLINE_RENDERING_AUTO:
@@ -603,80 +801,62 @@ class TimeLineSegment:
         self.content_hash = new_hash
     
     def get_content_hash(self):
-        content_strings = []
-        for i in range(1, len(current_sequence().tracks) - 1):
-            track = current_sequence().tracks[i]
-            self._get_track_segment_content_strings(track, content_strings)
-        
-        content_desc = "".join(content_strings)
-        
+        content_inputs = _timeline_renderer.get_segments_inputs([self])[self]
+        self.content_inputs = content_inputs
+        return self._get_content_hash_for_inputs(content_inputs)
+
+    def _get_content_hash_for_inputs(self, content_inputs):
+        content_desc = "".join([str(record) for record in content_inputs])
         return hashlib.md5(content_desc.encode('utf-8')).hexdigest()
-        
-    def _get_track_segment_content_strings(self, track, content_strings):
-        start_clip_index, clips = self._get_track_segment_clips(track, self.start_frame, self.end_frame)
-        if len(clips) == 0:
-            content_strings.append("-1")
-            return
-            
-        for i in range(0, len(clips)):
-            clip = clips[i]
-            self._get_clip_content_strings(track, clip, start_clip_index + i, content_strings)
-                
-    def _get_track_segment_clips(self, track, start_frame, end_frame):
-        clips = []
-        
-        # Get start range index, outer selection required
-        start_clip_index = current_sequence().get_clip_index(track, start_frame)
-        if start_clip_index == -1:
-            # Segment start aftr track end no clips in segments on this track
-            return (-1, clips)
-        
-        # Get end range index, outer selection required
-        end_clip_index = current_sequence().get_clip_index(track, end_frame)
-        if end_clip_index == -1:
-            # Segment contains last clip on track
-            end_clip_index = len(track.clips) - 1
-
-        for i in range(start_clip_index, end_clip_index + 1):
-            clips.append(track.clips[i])
-        
-        return (start_clip_index, clips)
-        
-    def _get_clip_content_strings(self, track, clip, clip_index, content_strings):
 
-        length = clip.clip_out - clip.clip_in 
-    
-        # Position and range data
-        # offset from segment start + in, out
-        clip_start_in_tline = track.clip_start(clip_index)
-        content_strings.append(str(clip_start_in_tline - self.start_frame))
-        content_strings.append(str(clip.clip_in))
-        content_strings.append(str(clip.clip_out))
-        
-        # Content data
-        if clip.is_blanck_clip == True:
-            content_strings.append("##blank")
-            return
 
+def _get_clip_content_hash(clip):
+    try:
+        cached_clip, content_hash = _clip_content_hashes[id(clip)]
+        if cached_clip is clip:
+            return content_hash
+    except KeyError:
+        pass
+
+    content_strings = []
+    if clip.is_blanck_clip == True:
+        content_strings.append("##blank")
+    else:
+        content_strings.append(clip.path)
+        # Segment files are cached across sessions, media file may have been replaced.
+        try:
+            content_strings.append(str(os.path.getmtime(clip.path)))
+        except (OSError, TypeError):
+            pass
         if len(clip.filters) == 0:
             content_strings.append("##no_filters")
         else:
             for filter_object in clip.filters:
-                self._get_filter_content_strings(filter_object, content_strings)
+                _get_properties_content_strings(filter_object.properties, content_strings)
         
         if clip.mute_filter == None:
             content_strings.append("##no_mute")
         else:
-            self._get_filter_content_strings(clip.mute_filter, content_strings)
-
-    def _get_filter_content_strings(self, filter_object, content_strings):
-        for i in range(0, len(filter_object.properties)):
-            p_name, p_value, p_type = filter_object.properties[i]
-            content_strings.append(p_name)
-            content_strings.append(str(p_type))
-            content_strings.append(str(p_value))
+            _get_properties_content_strings(clip.mute_filter.properties, content_strings)
+
+    content_hash = hashlib.md5("".join(content_strings).encode('utf-8')).hexdigest()
+    _clip_content_hashes[id(clip)] = (clip, content_hash)
+    return content_hash
+
+def _get_compositor_content_record(compositor, segment_start):
+    # Compositor properties are edited in place so these are not cached.
+    content_strings = [str(compositor.transition.a_track), str(compositor.transition.b_track),
+                       str(compositor.clip_in - segment_start), str(compositor.clip_out - segment_start)]
+    _get_properties_content_strings(compositor.transition.properties, content_strings)
+    return ("##compositor", "".join(content_strings))
+    
+def _get_properties_content_strings(properties, content_strings):
+    for i in range(0, len(properties)):
+        p_name, p_value, p_type = properties[i]
+        content_strings.append(p_name)
+        content_strings.append(str(p_type))
+        content_strings.append(str(p_value))
 
-        
 
 
 #--------------------------------------- worker threads
@@ -759,7 +939,7 @@ class TimeLineUpdateThread(threading.Thread):
                 segments_outs.append(segment.end_frame)
         
         for seg in destroy_segments: # There can only be 1 of these but whatever.
-            _timeline_renderer.segments.remove(seg)
+            _timeline_renderer.remove_segments([seg])
         
         if len(segments_paths) == 0:
             # clips for all new dirty segments existed or all segments after sequence end (or both in some combination)
@@ -785,8 +965,8 @@ class TimeLineStatusPollingThread(threading.Thread):
         running = True
         
         while running:
-            rendering_file, fract, render_completed, completed_segments = tlinerenderserver.get_render_status()
-            get_renderer().update_timeline_rendering_status(rendering_file, fract, render_completed, completed_segments)
+            rendering_files, fractions, render_completed, completed_segments = tlinerenderserver.get_render_status()
+            get_renderer().update_timeline_rendering_status(rendering_files, fractions, render_completed, completed_segments)
 
             Gdk.threads_enter()
             gui.tline_render_strip.widget.queue_draw()
@@ -802,6 +982,8 @@ class TimeLineStatusPollingThread(threading.Thread):
             
         current_sequence().update_hidden_track_for_timeline_rendering() # We should have correct sequence length known because this always comes after edits.
 
+        evict_cached_segments()
+
 
 
 # ---------------------------------------------------------------- settings
@@ -839,6 +1021,12 @@ class TLineSettingsRenderDialog:
         self.size_select.connect("changed", 
                                 lambda w,e: self.size_changed(w.get_active()), 
                                 None)
+
+        workers_adj = Gtk.Adjustment(value=editorpersistance.prefs.tline_render_workers, lower=0, upper=multiprocessing.cpu_count(), step_incr=1)
+        self.workers_spin = Gtk.SpinButton(adjustment=workers_adj)
+        self.workers_spin.set_numeric(True)
+        self.workers_spin.set_tooltip_text(_("Number of segments rendered at the same time, 0 uses one render worker per CPU core"))
+        self.workers_spin.connect("value-changed", lambda w: self.workers_changed(w.get_value_as_int()))
                                 
         row_enc = Gtk.HBox(False, 2)
         row_enc.pack_start(Gtk.Label(), True, True, 0)
@@ -846,8 +1034,28 @@ class TLineSettingsRenderDialog:
         row_enc.pack_start(self.size_select, False, False, 0)
         row_enc.pack_start(Gtk.Label(), True, True, 0)
         
+        cache_adj = Gtk.Adjustment(value=editorpersistance.prefs.tline_render_cache_size, lower=256, upper=1024 * 1024, step_incr=256)
+        self.cache_spin = Gtk.SpinButton(adjustment=cache_adj)
+        self.cache_spin.set_numeric(True)
+        self.cache_spin.set_tooltip_text(_("Disk space used to keep rendered segments between sessions"))
+        self.cache_spin.connect("value-changed", lambda w: self.cache_size_changed(w.get_value_as_int()))
+
+        row_workers = Gtk.HBox(False, 2)
+        row_workers.pack_start(Gtk.Label(), True, True, 0)
+        row_workers.pack_start(Gtk.Label(label=_("Render Workers:")), False, False, 0)
+        row_workers.pack_start(self.workers_spin, False, False, 0)
+        row_workers.pack_start(Gtk.Label(), True, True, 0)
+
+        row_cache = Gtk.HBox(False, 2)
+        row_cache.pack_start(Gtk.Label(), True, True, 0)
+        row_cache.pack_start(Gtk.Label(label=_("Render Cache Size MB:")), False, False, 0)
+        row_cache.pack_start(self.cache_spin, False, False, 0)
+        row_cache.pack_start(Gtk.Label(), True, True, 0)
+        
         vbox_enc = Gtk.VBox(False, 2)
         vbox_enc.pack_start(row_enc, False, False, 0)
+        vbox_enc.pack_start(row_workers, False, False, 0)
+        vbox_enc.pack_start(row_cache, False, False, 0)
         vbox_enc.pack_start(guiutils.pad_label(8, 12), False, False, 0)
         
         panel_encoding = guiutils.get_named_frame(_("Render Encoding"), vbox_enc)
@@ -872,4 +1080,11 @@ class TLineSettingsRenderDialog:
     def size_changed(self, size_index):
         editorpersistance.prefs.tline_render_size = size_index
         editorpersistance.save()
-    
+
+    def workers_changed(self, workers):
+        editorpersistance.prefs.tline_render_workers = workers
+        editorpersistance.save()
+
+    def cache_size_changed(self, cache_size):
+        editorpersistance.prefs.tline_render_cache_size = cache_size
+        editorpersistance.save()
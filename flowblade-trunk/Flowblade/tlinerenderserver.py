@@ -33,6 +33,7 @@ import dbus.service
 from dbus.mainloop.glib import DBusGMainLoop
 import locale
 import mlt
+import multiprocessing
 import os
 import subprocess
 import sys
@@ -56,9 +57,13 @@ import userfolders
 
 TLINE_RENDER_ENCODING_INDEX = 0
 RENDERING_PAD_FRAMES = 3
+RENDERING_FILE_ID = "_rendering" # added to segment file names while they are being rendered
 
 _dbus_service = None
 
+# Consumer creation toggles renderconsumer module state so it must not happen concurrently.
+_consumer_create_lock = threading.Lock()
+
 
 # --------------------------------------------------------------- interface
 def launch_render_server():
@@ -177,20 +182,20 @@ class TLineRenderDBUSService(dbus.service.Object):
         self.render_runner_thread = TLineRenderRunnerThread(self, sequence_xml_path, segments, profile_name)
         self.render_runner_thread.start()
 
-    @dbus.service.method('flowblade.movie.editor.tlinerenderserver')
+    @dbus.service.method('flowblade.movie.editor.tlinerenderserver', out_signature='asadbas')
     def get_render_status(self):
+        # Returns (files being rendered, render fractions for those files, render complete, completed files).
         dummy_list = ["nothing"]
         if self.render_runner_thread == None:
-            return ("none", 1.0,  False, dummy_list)
+            return ([], [], False, dummy_list)
         
         if self.render_runner_thread.render_complete:
-            return ("none", 1.0, self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
+            return ([], [], self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
         
-        print(self.render_runner_thread.current_render_file_path, self.render_runner_thread.get_fraction(), 
-                  self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
+        render_files, fractions = self.render_runner_thread.get_segments_in_progress()
+        print(render_files, fractions, self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
                   
-        return ( self.render_runner_thread.current_render_file_path, self.render_runner_thread.get_fraction(), 
-                  self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
+        return (render_files, fractions, self.render_runner_thread.render_complete, self.render_runner_thread.completed_segments)
 
     @dbus.service.method('flowblade.movie.editor.tlinerenderserver')
     def abort_renders(self):
@@ -214,7 +219,9 @@ class TLineRenderDBUSService(dbus.service.Object):
 # --------------------------------------------------------------------- rendering
 class TLineRenderRunnerThread(threading.Thread):
     """
-    SINGLE THREADED RENDERING, SHOULD WE GET MULTIPLE PROCESSES GOING FOR MULTIPLE CLIPS AT THE SAME TIME IN MODERN MULTICORE MACHINES?
+    Renders dirty segments using a pool of worker threads, each worker drives its own MLT
+    producer and avformat consumer so that multiple segments are rendered at the same time
+    on multicore machines.
     """
     def __init__(self, dbus_service, sequence_xml_path, segments, profile_name):
         threading.Thread.__init__(self)
@@ -222,12 +229,14 @@ class TLineRenderRunnerThread(threading.Thread):
         self.dbus_service = dbus_service
         self.sequence_xml_path = sequence_xml_path
         self.render_folder = os.path.dirname(sequence_xml_path)
-        self.current_render_file_path = None
         self.profile = mltprofiles.get_profile(profile_name)
         self.segments = segments
         self.completed_segments =  ["nothing"]
         self.render_complete = False
-        self.render_thread = None
+        self.workers = []
+        
+        self.segments_lock = threading.Lock()
+        self.next_segment_index = 0
 
         self.aborted = False
 
@@ -236,40 +245,86 @@ class TLineRenderRunnerThread(threading.Thread):
         
         start_time = time.monotonic()
  
-        width, height = _get_render_dimensions(self.profile, editorpersistance.prefs.tline_render_size)
-        encoding = _get_render_encoding()
+        self.width, self.height = _get_render_dimensions(self.profile, editorpersistance.prefs.tline_render_size)
+        self.encoding = _get_render_encoding()
         self.render_profile = _get_render_profile(self.profile, editorpersistance.prefs.tline_render_size, self.render_folder)
+
+        workers_count = min(get_render_workers_count(), len(self.segments))
+        print("tline render workers:", workers_count)
+        for i in range(0, workers_count):
+            worker = TLineSegmentRenderWorker(self)
+            self.workers.append(worker)
+            worker.start()
+
+        for worker in self.workers:
+            worker.join()
+
+        self.render_complete = True
+        print("tline render done, time:", time.monotonic() - start_time)
+
+    def get_next_segment(self):
+        # Called from worker threads, returns None when all segments have been given out or render was aborted.
+        with self.segments_lock:
+            if self.aborted == True or self.next_segment_index >= len(self.segments):
+                return None
+            segment = self.segments[self.next_segment_index]
+            self.next_segment_index += 1
+            return segment
+
+    def segment_completed(self, clip_file_path):
+        with self.segments_lock:
+            self.completed_segments.append(clip_file_path)
+
+    def get_segments_in_progress(self):
+        render_files = []
+        fractions = []
+        for worker in self.workers:
+            render_file, fraction = worker.get_status()
+            if render_file != None:
+                render_files.append(render_file)
+                fractions.append(fraction)
         
-        self.current_render_file_path = None
+        return (render_files, fractions)
+
+    def abort(self):
+        self.aborted = True
+        for worker in self.workers:
+            worker.abort()
+
+
+class TLineSegmentRenderWorker(threading.Thread):
+    """
+    Renders segments given out by TLineRenderRunnerThread one after another until none are left.
+    """
+    def __init__(self, runner):
+        threading.Thread.__init__(self)
         
-        sequence_xml_producer = mlt.Producer(self.profile, str(self.sequence_xml_path))
+        self.runner = runner
+        self.current_render_file_path = None
+        self.render_thread = None
+        self.aborted = False
+
+    def run(self):
+        # Producers are not shared between workers, every worker seeks and renders its own.
+        sequence_xml_producer = mlt.Producer(self.runner.profile, str(self.runner.sequence_xml_path))
         
-        for segment in self.segments:
-            if self.aborted == True:
+        while self.aborted == False:
+            segment = self.runner.get_next_segment()
+            if segment == None:
                 break
-                
+
             clip_file_path, clip_range_in, clip_range_out = segment
 
             # Create render objects
-            self.current_render_file_path = clip_file_path
-            renderconsumer.performance_settings_enabled = False
-            
-            consumer = renderconsumer.get_render_consumer_for_encoding( clip_file_path,
-                                                                        self.render_profile, 
-                                                                        encoding)
-            renderconsumer.performance_settings_enabled = True
+            with _consumer_create_lock:
+                renderconsumer.performance_settings_enabled = False
+                consumer = renderconsumer.get_render_consumer_for_encoding( get_rendering_file_path(clip_file_path),
+                                                                            self.runner.render_profile, 
+                                                                            self.runner.encoding)
+                renderconsumer.performance_settings_enabled = True
             
             # We are using proxy file rendering code here mostly, didn't vhange all names.
-            # Bit rates for proxy files are counted using 2500kbs for 
-            # PAL size image as starting point.
-            pal_pix_count = 720.0 * 576.0
-            pal_proxy_rate = 2500.0
-            proxy_pix_count = float(width * height)
-            proxy_rate = pal_proxy_rate * (proxy_pix_count / pal_pix_count)
-            proxy_rate = int(proxy_rate / 100) * 100 # Make proxy rate even hundred
-            # There are no practical reasons to have bitrates lower than 500kbs.
-            if proxy_rate < 500:
-                proxy_rate = 500
+            proxy_rate = renderconsumer.get_proxy_render_rate(self.runner.width, self.runner.height)
             consumer.set("vb", str(int(proxy_rate)) + "k")
 
             consumer.set("rescale", "nearest")
@@ -283,44 +338,52 @@ class TLineRenderRunnerThread(threading.Thread):
             # Create and launch render thread
             self.render_thread = renderconsumer.FileRenderPlayer(None, sequence_xml_producer, consumer, start_frame, stop_frame)
             self.render_thread.wait_for_producer_end_stop = False
+            self.current_render_file_path = clip_file_path
             self.render_thread.start()
 
-            # Render view update loop
-            self.render_in_progress = True
-            self.aborted = False
-            while self.render_in_progress:
+            # Wait for render to complete
+            while self.render_thread.running == True or self.render_thread.has_started_running == False:
                 if self.aborted == True:
                     break
+                time.sleep(0.1)
 
-                if self.render_thread.running == False: # Rendering has reached end
-                    self.render_in_progress = False
-                    self.current_render_file_path = None
-                else:
-                    time.sleep(0.1)
+            self.render_thread.shutdown()
+            self.current_render_file_path = None
 
-            if self.aborted:
-                self.render_thread.shutdown()
+            if self.aborted == True:
                 break
 
-            self.completed_segments.append(clip_file_path)
-
-            self.render_thread.shutdown()
-        
-        self.render_complete = True
-        print("tline render done, time:", time.monotonic() - start_time)
+            # Segment files are cached across sessions, so only completed renders get the segment file name.
+            try:
+                os.replace(get_rendering_file_path(clip_file_path), clip_file_path)
+            except OSError as e:
+                print("tline render segment file missing", e)
+            self.runner.segment_completed(clip_file_path)
 
-    def get_fraction(self):
+    def get_status(self):
         # Sometimes we get request for status before rendering has advanced enough to create the actual render thread.
-        if self.render_thread == None:
-            return 0.0
+        render_thread = self.render_thread
+        render_file = self.current_render_file_path
+        if render_thread == None or render_file == None:
+            return (render_file, 0.0)
     
-        return self.render_thread.get_render_fraction()
+        return (render_file, render_thread.get_render_fraction())
 
     def abort(self):
-        self.render_thread.shutdown()
         self.aborted = True
-        self.thread_running = False
+        if self.render_thread != None:
+            self.render_thread.shutdown()
+
+
+def get_rendering_file_path(clip_file_path):
+    root, ext = os.path.splitext(clip_file_path)
+    return root + RENDERING_FILE_ID + ext
 
+def get_render_workers_count():
+    workers = editorpersistance.prefs.tline_render_workers
+    if workers < 1:
+        workers = multiprocessing.cpu_count()
+    return workers
 
 def _get_render_encoding():
     return renderconsumer.proxy_encodings[editorpersistance.prefs.tline_render_encoding]
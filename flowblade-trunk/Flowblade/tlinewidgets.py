@@ -32,6 +32,7 @@ from gi.repository import Pango
 from gi.repository import PangoCairo
 
 import appconsts
+import audiolevelsfile
 import audiowaveformrenderer
 import boxmove
 import cairoarea
@@ -50,6 +51,7 @@ import guiutils
 import respaths
 import sequence
 import snapping
+import thumbtiles
 import tlinerender
 import trimmodes
 import userfolders
@@ -1458,6 +1460,11 @@ class TimeLineCanvas:
         # Edit mode
         self.edit_mode_data = None
         self.edit_mode_overlay_draw_func = draw_insert_overlay
+
+        # Cached clips layer and last drawn frame pointer position
+        self.clips_layer = None
+        self.clips_layer_key = None
+        self.drawn_pointer_x = None
         
         # Drag state
         self.drag_on = False
@@ -1621,28 +1628,27 @@ class TimeLineCanvas:
     def _draw(self, event, cr, allocation):
         x, y, w, h = allocation
 
-        # Draw bg
-        cr.set_source_rgb(*BG_COLOR)
-        cr.rectangle(0, 0, w, h)
-        cr.fill()
-
         # This can get called during loads by unwanted expose events
         if editorstate.project_is_loading == True:
+            cr.set_source_rgb(*BG_COLOR)
+            cr.rectangle(0, 0, w, h)
+            cr.fill()
+            self.clips_layer = None
             return
 
-        # Init sync draw structures
-        self.parent_positions = {}
-        self.sync_children = []
-
-        # Draw tracks
-        for i in range(1, len(current_sequence().tracks) - 1): # black and hidden tracks are ignored
-            self.draw_track(cr
-                            ,current_sequence().tracks[i]
-                            ,_get_track_y(i)
-                            ,w)
-
-        self.draw_compositors(cr)
-        self.draw_sync_relations(cr)
+        # Clips layer is drawn again when whole canvas is repainted. Edits, scrolling and zooming
+        # repaint whole canvas, so only frame pointer updates get to use cached clips layer.
+        clip_x1, clip_y1, clip_x2, clip_y2 = cr.clip_extents()
+        full_repaint = (clip_x2 - clip_x1 >= w and clip_y2 - clip_y1 >= h)
+        clips_layer_key = (w, h, pos, pix_per_frame, id(current_sequence()))
+        if full_repaint or self.clips_layer == None or self.clips_layer_key != clips_layer_key:
+            if self.clips_layer == None or self.clips_layer_key[0:2] != (w, h):
+                self.clips_layer = cr.get_target().create_similar(cairo.CONTENT_COLOR, w, h)
+            self.clips_layer_key = clips_layer_key
+            self.draw_clips_layer(cairo.Context(self.clips_layer), w, h)
+
+        cr.set_source_surface(self.clips_layer, 0, 0)
+        cr.paint()
 
         # Exit displaying from fake_current_pointer for SLIDE_TRIM mode if last displayed 
         # was from fake_pointer but this is not anymore
@@ -1655,23 +1661,16 @@ class TimeLineCanvas:
         self.draw_match_frame(cr)
             
         # Draw frame pointer
-        if EDIT_MODE() != editorstate.SLIDE_TRIM or PLAYER().looping():
-            current_frame = PLAYER().tracktor_producer.frame()
-        else:
-            current_frame = fake_current_frame
-
         if timeline_visible():
-            pointer_frame = current_frame
             cr.set_source_rgb(0, 0, 0)
         else:
-            pointer_frame = editorstate.tline_shadow_frame
             cr.set_source_rgb(*SHADOW_POINTER_COLOR)
-        disp_frame = pointer_frame - pos
-        frame_x = math.floor(disp_frame * pix_per_frame) + 0.5
+        frame_x = self.get_pointer_x()
         cr.move_to(frame_x, 0)
         cr.line_to(frame_x, h)
         cr.set_line_width(1.0)
         cr.stroke()
+        self.drawn_pointer_x = frame_x
 
         # Draw edit mode overlay
         if self.edit_mode_overlay_draw_func != None:
@@ -1679,6 +1678,76 @@ class TimeLineCanvas:
         
         audiowaveformrenderer.launch_queued_renders()
 
+    def draw_clips_layer(self, cr, w, h):
+        # Draw bg
+        cr.set_source_rgb(*BG_COLOR)
+        cr.rectangle(0, 0, w, h)
+        cr.fill()
+
+        # Init sync draw structures
+        self.parent_positions = {}
+        self.sync_children = []
+
+        # Draw tracks
+        for i in range(1, len(current_sequence().tracks) - 1): # black and hidden tracks are ignored
+            self.draw_track(cr
+                            ,current_sequence().tracks[i]
+                            ,_get_track_y(i)
+                            ,w)
+
+        self.draw_compositors(cr)
+        self.draw_sync_relations(cr)
+
+    def draw_filmstrip(self, cr, clip, scale_in, scale_length, y, track_height, width):
+        """
+        Draws media frames along video clip, tiles not yet available are drawn when ready.
+        """
+        tile_height = int(track_height - 8)
+        if tile_height < thumbtiles.MIN_TILE_HEIGHT:
+            return
+        tile_width = thumbtiles.get_tile_width(tile_height)
+        interval = thumbtiles.get_tile_interval(pix_per_frame, tile_width)
+
+        self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
+        cr.clip()
+
+        # Only tiles in visible part of clip are drawn, tiles are at interval multiples so that they stay in place when scrolling.
+        first_frame = clip.clip_in + max(int(-scale_in / pix_per_frame), 0)
+        last_frame = min(clip.clip_out, clip.clip_in + int((width - scale_in) / pix_per_frame))
+        tile_frame = (first_frame // interval) * interval
+        while tile_frame <= last_frame:
+            tile = thumbtiles.get_tile(clip.path, tile_frame, tile_height)
+            if tile != None:
+                cr.set_source_surface(tile, scale_in + (tile_frame - clip.clip_in) * pix_per_frame, y + 4)
+                cr.paint()
+            tile_frame += interval
+
+    def get_pointer_x(self):
+        if timeline_visible() == False:
+            pointer_frame = editorstate.tline_shadow_frame
+        elif EDIT_MODE() != editorstate.SLIDE_TRIM or PLAYER().looping() or fake_current_frame == None:
+            pointer_frame = PLAYER().tracktor_producer.frame()
+        else:
+            pointer_frame = fake_current_frame
+        disp_frame = pointer_frame - pos
+        return math.floor(disp_frame * pix_per_frame) + 0.5
+
+    def queue_playhead_draw(self):
+        """
+        Repaints frame pointer areas only, clips are drawn from cached clips layer.
+        """
+        # Keyframe tool overlay displays current frame, so all of it needs to be drawn.
+        if self.drawn_pointer_x == None or EDIT_MODE() == editorstate.KF_TOOL:
+            self.widget.queue_draw()
+            return
+
+        h = self.widget.get_allocated_height()
+        frame_x = self.get_pointer_x()
+        if frame_x == self.drawn_pointer_x:
+            return
+        self.widget.queue_draw_area(int(self.drawn_pointer_x) - 1, 0, 3, h)
+        self.widget.queue_draw_area(int(frame_x) - 1, 0, 3, h)
+
     def draw_track(self, cr, track, y, width):
         """
         Draws visible clips in track.
@@ -1881,31 +1950,34 @@ class TimeLineCanvas:
                         
                     text_x_add = 115
                     cr.save()
-                    try: # paint thumbnail
-                        thumb_img = clip_thumbnails[clip.path]
-                        self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
-                        cr.clip()
-                        cr.set_source_surface(thumb_img,scale_in, y - 20)
-                        cr.paint()
-                    except: # thumbnail not found  in dict, get it and  paint it
-                        try:
-                            if clip.container_data == None:
-                                media_file = PROJECT().get_media_file_for_path(clip.path)
-                                thumb_img = media_file.icon
-                            else:
-                                media_file = PROJECT().get_media_file_for_path(clip.path)
-                                if media_file != None:
-                                    thumb_img = media_file.icon
-                                else:
-                                    thumb_img = clip.container_data.get_rendered_thumbnail()
-
-                            cr.rectangle(scale_in + 4, y + 3.5, scale_length - 8, track_height - 6)
+                    if clip.media_type == sequence.VIDEO and clip.container_data == None:
+                        self.draw_filmstrip(cr, clip, scale_in, scale_length, y, track_height, width)
+                    else:
+                        try: # paint thumbnail
+                            thumb_img = clip_thumbnails[clip.path]
+                            self.create_round_rect_path(cr, scale_in + 5, y + 4.5, scale_length - 10, track_height - 8, 3.0)
                             cr.clip()
-                            cr.set_source_surface(thumb_img, scale_in, y - 20)
+                            cr.set_source_surface(thumb_img,scale_in, y - 20)
                             cr.paint()
-                            clip_thumbnails[clip.path] = thumb_img
-                        except:
-                            pass # This fails for rendered fades and transitions
+                        except: # thumbnail not found  in dict, get it and  paint it
+                            try:
+                                if clip.container_data == None:
+                                    media_file = PROJECT().get_media_file_for_path(clip.path)
+                                    thumb_img = media_file.icon
+                                else:
+                                    media_file = PROJECT().get_media_file_for_path(clip.path)
+                                    if media_file != None:
+                                        thumb_img = media_file.icon
+                                    else:
+                                        thumb_img = clip.container_data.get_rendered_thumbnail()
+
+                                cr.rectangle(scale_in + 4, y + 3.5, scale_length - 8, track_height - 6)
+                                cr.clip()
+                                cr.set_source_surface(thumb_img, scale_in, y - 20)
+                                cr.paint()
+                                clip_thumbnails[clip.path] = thumb_img
+                            except:
+                                pass # This fails for rendered fades and transitions
                     
                     if clip.selected:
                         if scale_length - 8 < appconsts.THUMB_WIDTH:
@@ -2019,11 +2091,11 @@ class TimeLineCanvas:
 
             # Draw audio level data if needed.
             # Init data rendering if data needed and not available
-            if clip.is_blanck_clip == False and clip.waveform_data == None and editorstate.display_all_audio_levels == True \
+            if clip.is_blanck_clip == False and (clip.waveform_data is None or clip.waveform_data.partial == True) and editorstate.display_all_audio_levels == True \
                 and clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
                  clip.waveform_data = audiowaveformrenderer.get_waveform_data(clip)
             # Draw data if available large enough scale
-            if clip.is_blanck_clip == False and clip.waveform_data != None and scale_length > FILL_MIN:
+            if clip.is_blanck_clip == False and clip.waveform_data is not None and scale_length > FILL_MIN:
                 r, g, b = clip_bg_col
                 cr.set_source_rgb(r * 1.9, g * 1.9, b * 1.9)
                 
@@ -2060,20 +2132,33 @@ class TimeLineCanvas:
                 if draw_first + width_frames < draw_last:
                     draw_last = int(draw_first + width_frames) + 1
 
+                # Levels data may be shorter then clip media length, e.g. with 23.98 fps media.
+                if draw_last > len(clip.waveform_data):
+                    draw_last = len(clip.waveform_data)
+
                 # Get media frame 0 position in screen pixels
                 media_start_pos_pix = scale_in - clip_in * pix_per_frame
                 
-                # Draw level bar for each frame in draw range
-                for f in range(draw_first, draw_last, step):
-                    try:
-                        x = media_start_pos_pix + f * pix_per_frame
-                        h = bar_height * clip.waveform_data[f]
-                        if h < 1:
-                            h = 1
-                        cr.rectangle(x, y + y_pad + (bar_height - h), draw_pix_per_frame, h)
-                    except:
-                        # This is just dirty fix a when 23.98 fps does not work
-                        break
+                # When zoomed out draw max values from levels summary that has about one value per pixel.
+                decimation, summaries = clip.waveform_data.get_pyramid_level(pix_per_frame)
+                if summaries != None:
+                    draw_levels = summaries[audiolevelsfile.SUMMARY_MAX][draw_first // decimation:(draw_last - 1) // decimation + 1]
+                    f = (draw_first // decimation) * decimation
+                    step = decimation
+                    draw_pix_per_frame = decimation * pix_per_frame
+                else:
+                    # Slicing mapped levels data creates a view, not a copy.
+                    draw_levels = clip.waveform_data[draw_first:draw_last:step]
+                    f = draw_first
+
+                # Draw level bar for each frame or summary in draw range.
+                for level in draw_levels:
+                    x = media_start_pos_pix + f * pix_per_frame
+                    h = bar_height * level
+                    if h < 1:
+                        h = 1
+                    cr.rectangle(x, y + y_pad + (bar_height - h), draw_pix_per_frame, h)
+                    f += step
 
                 cr.fill()
                 cr.restore()
@@ -2109,7 +2194,7 @@ class TimeLineCanvas:
                         cr.move_to(scale_in + TEXT_X, y + track_height - 2)
                         cr.show_text(str(clip.sync_diff))
 
-            if clip.waveform_data == None and editorstate.display_all_audio_levels == True and scale_length > FILL_MIN:
+            if clip.waveform_data is None and editorstate.display_all_audio_levels == True and scale_length > FILL_MIN:
                 if clip.media_type != appconsts.IMAGE_SEQUENCE and clip.media_type != appconsts.PATTERN_PRODUCER:
                     cr.set_source_surface(LEVELS_RENDER_ICON, int(scale_in) + 4, y + 8)
                     cr.paint()
@@ -60,6 +60,8 @@ import processutils
 import persistance
 import respaths
 import renderconsumer
+import smartrender
+import splitrender
 import translations
 import userfolders
 import utils
@@ -137,7 +139,7 @@ class QueueRunnerThread(threading.Thread):
             
             # Create and launch render thread
             global render_thread 
-            render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
+            render_thread = get_render_player(render_item, producer, consumer, profile, start_frame, end_frame, project_file_path)
             render_thread.wait_for_producer_end_stop = wait_for_stop_render
             render_thread.start()
 
@@ -623,6 +625,8 @@ class RenderData:
         self.profile_desc = profile_desc
         self.profile_name = profile_name
         self.fps = fps
+        self.smart_render_segments = None # Timeline render segments that can be used in output, see smartrender.py
+        self.split_render = False # Render in parallel parts, see splitrender.py
 
 def get_render_range(render_item):
     if render_item.mark_in < 0: # no range defined
@@ -642,6 +646,19 @@ def get_render_range(render_item):
     
     return (start_frame, end_frame, wait_for_stop_render)
 
+def get_render_player(render_item, producer, consumer, profile, start_frame, end_frame, project_file_path):
+    # Items saved by earlier versions do not have smart or split render data.
+    smart_render_segments = getattr(render_item.render_data, "smart_render_segments", None)
+    if smart_render_segments != None and len(smart_render_segments) > 0:
+        return smartrender.SmartRenderPlayer(producer, consumer, profile, smart_render_segments,
+                                             render_item.args_vals_list, render_item.render_path, start_frame, end_frame)
+
+    if getattr(render_item.render_data, "split_render", False) == True:
+        return splitrender.SplitRenderPlayer(producer, consumer, project_file_path, render_item.render_data.profile_name,
+                                             render_item.args_vals_list, render_item.render_path, start_frame, end_frame)
+
+    return renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
+
 
 # -------------------------------------------------------------------- gui
 class BatchRenderWindow:
@@ -1305,7 +1322,7 @@ class SingleRenderThread(threading.Thread):
         start_frame, end_frame, wait_for_stop_render = get_render_range(render_item)
         
         # Create and launch render thread
-        render_thread = renderconsumer.FileRenderPlayer(None, producer, consumer, start_frame, end_frame) # None == file name not needed this time when using FileRenderPlayer because callsite keeps track of things
+        render_thread = get_render_player(render_item, producer, consumer, profile, start_frame, end_frame, project_file_path)
         render_thread.wait_for_producer_end_stop = wait_for_stop_render
         render_thread.start()
 
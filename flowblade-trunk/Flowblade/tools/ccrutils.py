@@ -24,7 +24,10 @@ Used mostly for container clips rendering, hence ContainerClipsRenderingUTILS.
 """
 import os
 import pickle
+import selectors
+import socket
 import sys
+import threading
 
 import appconsts
 import atomicfile
@@ -40,6 +43,13 @@ STATUS_MSG_FILE = "status"
 ABORT_MSG_FILE = "abort"
 RENDER_DATA_FILE = "render_data"
 
+# Status channel messages
+STATUS_MSG = "status"
+COMPLETED_MSG = "completed"
+ABORT_MSG = "abort"
+
+MAX_CHANNEL_MSG_SIZE = 4096
+
 
 _session_folder = None
 _clip_frames_folder_internal = None
@@ -47,10 +57,27 @@ _rendered_frames_folder_internal = None
 
 _render_data = None
 
+# App side status channel state
+_status_channels = {} # session_id -> socket
+_received_status = {} # session_id -> last status message
+_received_completed = set()
+_status_listener = None
+_status_selector = None
+_channels_lock = threading.Lock()
+
+# Render process side status channel sockets
+_status_send_socket = None
+_control_socket = None
+_session_id = None
+
 
 # ----------------------------------------------------- interface with message files, used by main appp
 # We are using message files to communicate with application.
 def clear_flag_files(session_id):
+    with _channels_lock:
+        _received_status.pop(session_id, None)
+        _received_completed.discard(session_id)
+
     folder = _get_session_folder(session_id)
     
     completed_msg = folder + "/" + COMPLETED_MSG_FILE
@@ -77,6 +104,9 @@ def set_render_data(session_id, video_render_data):
         pickle.dump(video_render_data, outfile)
     
 def session_render_complete(session_id):
+    if session_id in _received_completed:
+        return True
+
     folder = _get_session_folder(session_id)
     completed_msg_path = folder + "/" + COMPLETED_MSG_FILE
 
@@ -94,6 +124,11 @@ def get_session_status(session_id):
     return (step, frame, length, elapsed)
 
 def get_session_status_message(session_id):
+    try:
+        return _received_status[session_id]
+    except KeyError:
+        pass # Nothing received from channel, try message file.
+
     try:
         status_msg_file = _get_session_folder(session_id) + "/" + STATUS_MSG_FILE
         with open(status_msg_file) as f:
@@ -103,6 +138,14 @@ def get_session_status_message(session_id):
         return None
         
 def abort_render(session_id):
+    # Abort goes through channel immediately, abort file is written too in case render process has no channel.
+    try:
+        abort_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        abort_socket.sendto(ABORT_MSG.encode("utf-8"), _get_control_address(session_id))
+        abort_socket.close()
+    except OSError:
+        pass
+
     folder = _get_session_folder(session_id)
     abort_msg_file = folder + "/" +  ABORT_MSG_FILE
     with atomicfile.AtomicFileWriter(abort_msg_file, "wb") as afw:
@@ -111,7 +154,90 @@ def abort_render(session_id):
         
 def _get_session_folder(session_id):
     return userfolders.get_data_dir() + appconsts.CONTAINER_CLIPS_DIR +  "/" + session_id
-    
+
+
+# ----------------------------------------------------- status channel, used by main app
+# Render processes push status and completion messages to app through Unix datagram sockets
+# and app sends abort requests to render processes the same way. Sockets use Linux abstract 
+# namespace addresses so no files are created. Message files are still used as fallback 
+# if a channel can not be opened or a message can not be sent.
+def open_status_channel(session_id, status_listener):
+    """
+    Starts receiving status messages for session, status_listener(session_id) is called
+    from listener thread when a message is received.
+    """
+    global _status_listener, _status_selector
+    _status_listener = status_listener
+    close_status_channel(session_id) # Sessions for container clips get rendered again with same id.
+
+    try:
+        status_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        status_socket.bind(_get_status_address(session_id))
+        status_socket.setblocking(False)
+    except OSError as e:
+        print("Opening status channel failed for session", session_id, e)
+        return False
+
+    with _channels_lock:
+        _received_status.pop(session_id, None)
+        _received_completed.discard(session_id)
+        _status_channels[session_id] = status_socket
+        if _status_selector == None:
+            _status_selector = selectors.DefaultSelector()
+            _status_selector.register(status_socket, selectors.EVENT_READ, session_id)
+            listener_thread = StatusChannelListenerThread()
+            listener_thread.daemon = True
+            listener_thread.start()
+        else:
+            _status_selector.register(status_socket, selectors.EVENT_READ, session_id)
+
+    return True
+
+def close_status_channel(session_id):
+    with _channels_lock:
+        _received_status.pop(session_id, None)
+        _received_completed.discard(session_id)
+        try:
+            status_socket = _status_channels.pop(session_id)
+        except KeyError:
+            return
+        _status_selector.unregister(status_socket)
+        status_socket.close()
+
+def status_channel_open(session_id):
+    return session_id in _status_channels
+
+def _get_status_address(session_id):
+    return "\0flowblade_job_status_" + session_id
+
+def _get_control_address(session_id):
+    return "\0flowblade_job_control_" + session_id
+
+
+class StatusChannelListenerThread(threading.Thread):
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+
+    def run(self):
+        while True:
+            # Timeout lets sockets registered after select() was called get noticed.
+            for key, events in _status_selector.select(timeout=0.5):
+                session_id = key.data
+                with _channels_lock:
+                    if session_id not in _status_channels:
+                        continue
+                    try:
+                        msg = key.fileobj.recv(MAX_CHANNEL_MSG_SIZE).decode("utf-8")
+                    except OSError:
+                        continue
+                    if msg == COMPLETED_MSG:
+                        _received_completed.add(session_id)
+                    elif msg.startswith(STATUS_MSG + " "):
+                        _received_status[session_id] = msg[len(STATUS_MSG) + 1:]
+
+                _status_listener(session_id)
+
 
 # ------------------------------------------------------ headless session folders and files, used by render processes
 def init_session_folders(session_id):
@@ -128,6 +254,31 @@ def init_session_folders(session_id):
     if not os.path.exists(_rendered_frames_folder_internal):
         os.mkdir(_rendered_frames_folder_internal)
 
+    _init_render_process_channel(session_id)
+
+def _init_render_process_channel(session_id):
+    # Render process can work without channel using only message files.
+    global _status_send_socket, _control_socket, _session_id
+    _session_id = session_id
+    try:
+        _status_send_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        _control_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        _control_socket.bind(_get_control_address(session_id))
+        _control_socket.setblocking(False)
+    except OSError as e:
+        print("Status channel not available, using message files", e)
+        _status_send_socket = None
+        _control_socket = None
+
+def _send_channel_message(msg):
+    if _status_send_socket == None:
+        return False
+    try:
+        _status_send_socket.sendto(msg.encode("utf-8"), _get_status_address(_session_id))
+        return True
+    except OSError:
+        return False # App is not listening, e.g. status channel could not be opened.
+
 def delete_internal_folders(session_id):
     # This works only if clip frames and rendered frames folder are empty already.
     # This is used my motinheadless.py that uses container clips folders only to communicate render status
@@ -173,6 +324,9 @@ def rendered_frames_folder():
         return _render_data.render_dir + RENDERED_FRAMES_DIR
 
 def write_status_message(msg):
+    if _send_channel_message(STATUS_MSG + " " + msg) == True:
+        return
+
     try:
         status_msg_file = session_folder() + "/" + STATUS_MSG_FILE
         with atomicfile.AtomicFileWriter(status_msg_file, "w") as afw:
@@ -182,6 +336,9 @@ def write_status_message(msg):
         pass # this failing because we can't get file access will show as progress hickup to user, we don't care
 
 def write_completed_message():
+    # Completed file is always written, app uses it if channel message gets lost.
+    _send_channel_message(COMPLETED_MSG)
+
     completed_msg_file = session_folder() + "/" + COMPLETED_MSG_FILE
     script_text = "##completed##" # let's put something in here
     with atomicfile.AtomicFileWriter(completed_msg_file, "w") as afw:
@@ -214,6 +371,14 @@ def delete_rendered_frames():
         os.remove(file_path)
 
 def abort_requested():
+    if _control_socket != None:
+        try:
+            while True:
+                if _control_socket.recv(MAX_CHANNEL_MSG_SIZE).decode("utf-8") == ABORT_MSG:
+                    return True
+        except (BlockingIOError, InterruptedError):
+            pass # No more messages.
+
     abort_file = session_folder() + "/" + ABORT_MSG_FILE
     if os.path.exists(abort_file):
         return True
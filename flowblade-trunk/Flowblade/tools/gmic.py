@@ -1153,7 +1153,6 @@ class GmicEffectRendererer(threading.Thread):
 
     def run(self):
         self.render_player = None
-        self.frames_range_writer = None
         
         self.abort = False
         self.script_renderer = None
@@ -1195,32 +1194,25 @@ class GmicEffectRendererer(threading.Thread):
         
         frame_name = _window.frame_name.get_text()
 
-        self.frames_range_writer = gmicplayer.get_frames_range_writer_for_current_profile(_current_path, self.frames_update)
-        self.frames_range_writer.write_frames(get_render_frames_dir() + "/", frame_name, mark_in, mark_out)
-
-        if self.abort == True:
-            return
-        
-        # Render effect for frames
         # Get user script 
         Gdk.threads_enter()
         buf = _window.script_view.get_buffer()
         user_script = buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
-        _window.render_percentage.set_markup("<small>" + _("Waiting for frames write to complete...") + "</small>")
         Gdk.threads_leave()
 
-        while len(os.listdir(folder)) != self.length:
-            time.sleep(0.5)
-        
         # Render frames with gmic script
-        self.script_renderer = gmicplayer.FolderFramesScriptRenderer(   user_script, 
-                                                                        folder,
-                                                                        out_folder,
-                                                                        frame_name,
-                                                                        self.script_render_update_callback, 
-                                                                        self.script_render_output_callback)
+        self.script_renderer = gmicplayer.get_script_renderer_for_current_profile(  user_script,
+                                                                                    _current_path,
+                                                                                    mark_in,
+                                                                                    mark_out,
+                                                                                    out_folder,
+                                                                                    frame_name,
+                                                                                    self.script_render_update_callback, 
+                                                                                    self.script_render_output_callback)
         self.script_renderer.write_frames()
-        
+        if self.abort == True:
+            return
+
         # Render video
         if _window.encode_check.get_active() == True:
             # Render consumer
@@ -1239,9 +1231,7 @@ class GmicEffectRendererer(threading.Thread):
             resource_path = out_folder + "/" + resource_name_str
             producer = mlt.Producer(profile, str(resource_path))
 
-            clip_frames = os.listdir(get_render_frames_dir())
-
-            self.render_player = renderconsumer.FileRenderPlayer("", producer, consumer, 0, len(clip_frames) - 1)
+            self.render_player = renderconsumer.FileRenderPlayer("", producer, consumer, 0, self.length - 1)
             self.render_player.wait_for_producer_end_stop = False
             self.render_player.start()
 
@@ -1269,19 +1259,6 @@ class GmicEffectRendererer(threading.Thread):
         self.set_render_stopped_gui_state()
         Gdk.threads_leave()
         
-    def frames_update(self, frame):
-        if frame - self.mark_in < 0:
-            frame = self.length # hack fix, producer suddenly changes the frame it thinks it is in
-        else:
-            frame = frame - self.mark_in # producer returns original clip frames
-        
-        update_info = _("Writing clip frame: ") + str(frame) + "/" +  str(self.length)
-
-        Gdk.threads_enter()
-        _window.render_percentage.set_markup("<small>" + update_info + "</small>")
-        _window.render_progress_bar.set_fraction(float(frame + 1)/float(self.length))
-        Gdk.threads_leave()
-
     def script_render_update_callback(self, frame_count):
         update_info = _("Rendering frame: ") + str(frame_count) + "/" +  str(self.length)
 
@@ -1326,9 +1303,6 @@ class GmicEffectRendererer(threading.Thread):
             _window.encode_desc.set_sensitive(True)
 
     def shutdown(self):
-        if self.frames_range_writer != None:
-            self.frames_range_writer.shutdown()
-        
         if self.render_player != None:
             self.render_player.shutdown()        
 
@@ -29,7 +29,6 @@ import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import GLib
 
-import locale
 import mlt
 import os
 import pickle
@@ -41,19 +40,12 @@ import time
 import appconsts
 import atomicfile
 import ccrutils
-import editorstate
-import editorpersistance
 import gmicplayer
-import mltfilters
-import mltenv
+import mltheadlessutils
 import mltprofiles
-import mlttransitions
-import processutils
 import renderconsumer
 import respaths
 import toolsencoding
-import translations
-import userfolders
 import utils
 
 
@@ -96,15 +88,7 @@ def abort_render(session_id):
 # --------------------------------------------------- render process
 def main(root_path, session_id, script, clip_path, range_in, range_out, profile_desc, gmic_frame_offset):
     
-    os.nice(10) # make user configurable
-
-    try:
-        editorstate.mlt_version = mlt.LIBMLT_VERSION
-    except:
-        editorstate.mlt_version = "0.0.99" # magic string for "not found"
-
-    # Set paths.
-    respaths.set_paths(root_path)
+    render_data = mltheadlessutils.mlt_env_init(root_path, session_id)
 
     # Check G'MIC version
     global _gmic_version
@@ -112,39 +96,6 @@ def main(root_path, session_id, script, clip_path, range_in, range_out, profile_
     if _gmic_version == 2:
         respaths.set_gmic2(root_path)
 
-    userfolders.init()
-    editorpersistance.load()
-
-    # Init translations module with translations data
-    translations.init_languages()
-    translations.load_filters_translations()
-    mlttransitions.init_module()
-
-    repo = mlt.Factory().init()
-    processutils.prepare_mlt_repo(repo)
-    
-    # Set numeric locale to use "." as radix, MLT initilizes this to OS locale and this causes bugs 
-    locale.setlocale(locale.LC_NUMERIC, 'C')
-
-    # Check for codecs and formats on the system
-    mltenv.check_available_features(repo)
-    renderconsumer.load_render_profiles()
-
-    # Load filter and compositor descriptions from xml files.
-    mltfilters.load_filters_xml(mltenv.services)
-    mlttransitions.load_compositors_xml(mltenv.transitions)
-
-    # Create list of available mlt profiles
-    mltprofiles.load_profile_list()
-    
-    ccrutils.init_session_folders(session_id)
-    
-    ccrutils.load_render_data()
-    render_data = ccrutils.get_render_data()
-    
-    # This needs to have render data loaded to know if we are using external folders.
-    ccrutils.maybe_init_external_session_folders()
-
     global _render_thread
     _render_thread = GMicHeadlessRunnerThread(script, render_data, clip_path, range_in, range_out, profile_desc, gmic_frame_offset)
     _render_thread.start()
@@ -188,7 +139,6 @@ class GMicHeadlessRunnerThread(threading.Thread):
         self.start_time = time.monotonic()
         
         self.render_player = None
-        self.frames_range_writer = None
         
         self.script_renderer = None
        
@@ -212,27 +162,20 @@ class GMicHeadlessRunnerThread(threading.Thread):
             file_path = os.path.join(rendered_frames_folder, frame_file)
             os.remove(file_path)
             
-        self.frames_range_writer = gmicplayer.FramesRangeWriter(self.clip_path, self.frames_update, profile)
-        self.frames_range_writer.write_frames(clip_frames_folder + "/", frame_name, self.range_in, self.range_out)
-
-        if self.abort == True:
-            return
-
         script_file = open(self.script_path)
         user_script = script_file.read()
 
-        while len(os.listdir(clip_frames_folder)) != self.length:
-            time.sleep(0.5)
-        
         # Render frames with gmic script
-        self.script_renderer = gmicplayer.FolderFramesScriptRenderer(   user_script, 
-                                                                        clip_frames_folder,
+        self.script_renderer = gmicplayer.FramesScriptPipelineRenderer( user_script, 
+                                                                        self.clip_path,
+                                                                        profile,
+                                                                        self.range_in,
+                                                                        self.range_out,
                                                                         rendered_frames_folder + "/",
                                                                         frame_name,
                                                                         self.script_render_update_callback, 
                                                                         self.script_render_output_callback,
                                                                         10,
-                                                                        False,  # this is not useful until we get MLT to fin frames sequences not startin from 0001
                                                                         0)
         self.script_renderer.write_frames()
 
@@ -289,19 +232,9 @@ class GMicHeadlessRunnerThread(threading.Thread):
         self.abort = ccrutils.abort_requested()
         return self.abort
 
-    def frames_update(self, frame):
-        if self.abort_requested() == True:
-             self.frames_range_writer.shutdown()
-             return
-             
-        # step 1, frame , range
-        elapsed = time.monotonic() - self.start_time
-        msg = "1 " + str(frame) + " " + str(self.length) + " " + str(elapsed)
-        self.write_status_message(msg)
-        
     def script_render_update_callback(self, frame_count):
         if self.abort_requested() == True:
-             self.script_renderer.abort = True
+             self.script_renderer.abort_rendering()
              return
         
         # step 1, frame , range
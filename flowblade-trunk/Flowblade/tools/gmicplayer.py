@@ -24,21 +24,46 @@ Clip player used to select frames for preview and range selection.
 
 
 import mlt
+import multiprocessing
+import numpy as np
 import os
 from os import listdir
 from os.path import isfile, join
+from PIL import Image
+import queue
 import re
+import shlex
 import sys
 import subprocess
-import time
+import tempfile
+import threading
 
 import mltprofiles
-import userfolders
 import utils
 
 TICKER_DELAY = 0.25
 RENDER_TICKER_DELAY = 0.05
 
+# Script renders send this many frames to one gmic process.
+SCRIPT_RENDER_BATCH_FRAMES = 8
+# G'MIC uses multiple threads for many commands, so we do not run a process for every core.
+SCRIPT_RENDER_MAX_PROCESSES = 4
+
+try:
+    RGB_IMAGE_FORMAT = mlt.mlt_image_rgb24
+except AttributeError:
+    RGB_IMAGE_FORMAT = mlt.mlt_image_rgb # MLT 7 name
+
+# .cimg file pixel type names -> numpy types
+_CIMG_PIXEL_TYPES = {   "bool":"u1", "unsigned_char":"u1", "uchar":"u1", "uint8":"u1",
+                        "char":"i1", "int8":"i1",
+                        "unsigned_short":"u2", "ushort":"u2", "uint16":"u2",
+                        "short":"i2", "int16":"i2",
+                        "unsigned_int":"u4", "uint":"u4", "uint32":"u4",
+                        "int":"i4", "int32":"i4",
+                        "unsigned_int64":"u8", "uint64":"u8", "int64":"i8",
+                        "float":"f4", "float32":"f4", "double":"f8", "float64":"f8"}
+
 _current_profile = None
 
 def set_current_profile(clip_path):
@@ -49,8 +74,10 @@ def set_current_profile(clip_path):
     _current_profile = mltprofiles.get_profile_for_index(profile_index)
     return profile_index
 
-def get_frames_range_writer_for_current_profile(file_path, callback):
-    return FramesRangeWriter(file_path, callback, _current_profile)
+def get_script_renderer_for_current_profile(user_script, file_path, mark_in, mark_out, out_folder, frame_name,
+                                            update_callback, render_output_callback):
+    return FramesScriptPipelineRenderer(user_script, file_path, _current_profile, mark_in, mark_out, out_folder,
+                                        frame_name, update_callback, render_output_callback)
 
         
 class GmicPlayer:
@@ -150,53 +177,260 @@ class PreviewFrameWriter:
         consumer.run()
         
         
-class FramesRangeWriter:
-
-    def __init__(self, file_path, callback, profile):
-        self.producer = mlt.Producer(profile, str(file_path))
+class FramesScriptPipelineRenderer:
+    """
+    Renders G'MIC script for a range of clip frames and writes results as PNG files.
+
+    Frames are read from MLT producer as raw RGB and streamed in batches to gmic processes
+    through pipes in .cimg format. Script is applied to each image of batch separately and 
+    results are read back from gmic stdout. Several gmic processes run concurrently 
+    while frames for next batches are being read.
+
+    If gmic fails to render a batch, frames are rendered one at a time
+    with PNG input files and a gmic process for each frame.
+    """
+    def __init__(   self, user_script, clip_path, profile, mark_in, mark_out, out_folder, frame_name, 
+                    update_callback, render_output_callback, nice=0, out_frame_offset=0):
+        self.user_script = user_script
+        self.clip_path = clip_path
         self.profile = profile
-        self.callback = callback
-        self.running = True
+        self.mark_in = mark_in
+        self.mark_out = mark_out
+        self.out_folder = out_folder
+        self.frame_name = frame_name
+        self.update_callback = update_callback
+        self.render_output_callback = render_output_callback
+        self.nice = nice
+        self.out_frame_offset = out_frame_offset
 
-    def write_frames(self, clip_folder, frame_name, mark_in, mark_out):
-        """
-        Writes thumbnail image from file producer
-        """
-        # Get data
-        render_path = clip_folder + frame_name + "_%04d." + "png"
+        self.width = profile.width()
+        self.height = profile.height()
+        self.frames_done = 0
+        self.processes = []
+        self.lock = threading.Lock()
+        
+        try:
+            # Script was earlier given to gmic through shell, this splits it to args the same way.
+            self.script_args = shlex.split(user_script, comments=True)
+            self.use_pipeline = True
+        except ValueError:
+            self.use_pipeline = False
 
-        self.consumer = mlt.Consumer(self.profile, "avformat", str(render_path))
-        self.consumer.set("real_time", -1)
-        self.consumer.set("rescale", "bicubic")
-        self.consumer.set("vcodec", "png")
-    
-        self.frame_producer = self.producer.cut(mark_in, mark_out)
+        self.abort = False
 
-        self.consumer.connect(self.frame_producer)
-        self.frame_producer.set_speed(0)
-        self.frame_producer.seek(0)
-        self.frame_producer.set_speed(1)
-        self.consumer.start()
-                
-        while self.running: # set false at shutdown() for abort
-            if self.frame_producer.frame() >= mark_out:
-                
-                self.callback(self.frame_producer.frame() - mark_in)
-                time.sleep(2.0) # This seems enough, other methods produced bad waits
-                                # IF WE CAN REMOVE THIS WAIT. THAT WOULD BE GOOD.
-
-                self.running = False
-            else:
-                self.callback(self.frame_producer.frame()) # This is wrong for container clips but we fix it there not break G'mic tool, lazy yeah...
-                time.sleep(0.2)
-    
-    def shutdown(self):
-        if self.running == False:
+    def write_frames(self):
+        producer = mlt.Producer(self.profile, str(self.clip_path))
+        frame_producer = producer.cut(self.mark_in, self.mark_out)
+        length = self.mark_out - self.mark_in + 1
+
+        # First frame is rendered alone so that gmic output gets displayed and checked for errors.
+        if self.abort == True:
             return
+        self._render_batch([(0, self._get_frame_rgb(frame_producer, 0))], True)
+
+        processes_count = min(SCRIPT_RENDER_MAX_PROCESSES, multiprocessing.cpu_count())
+        batches_queue = queue.Queue(processes_count) # Limits amount of read frames waiting to be rendered.
+        render_threads = []
+        for i in range(0, processes_count):
+            render_thread = threading.Thread(target=self._render_batches, args=(batches_queue,))
+            render_thread.start()
+            render_threads.append(render_thread)
+
+        try:
+            batch = []
+            for frame_index in range(1, length):
+                if self.abort == True:
+                    break
+
+                batch.append((frame_index, self._get_frame_rgb(frame_producer, frame_index)))
+                if len(batch) == SCRIPT_RENDER_BATCH_FRAMES:
+                    batches_queue.put(batch)
+                    batch = []
+
+            if len(batch) > 0 and self.abort == False:
+                batches_queue.put(batch)
+        finally:
+            for render_thread in render_threads:
+                batches_queue.put(None)
+            for render_thread in render_threads:
+                render_thread.join()
 
-        self.consumer.stop()
-        self.frame_producer.set_speed(0)
-        self.running = False
+    def abort_rendering(self):
+        self.abort = True
+        with self.lock:
+            for process in self.processes:
+                try:
+                    process.kill()
+                except OSError:
+                    pass
+
+    def _get_frame_rgb(self, frame_producer, frame_index):
+        frame_producer.seek(frame_index)
+        frame = frame_producer.get_frame()
+        # And make sure we deinterlace if input is interlaced
+        frame.set("consumer_deinterlace", 1)
+        frame.set("rescale.interp", "bicubic")
+        return mlt.frame_get_image(frame, RGB_IMAGE_FORMAT, self.width, self.height)
+
+    def _render_batches(self, batches_queue):
+        while True:
+            batch = batches_queue.get()
+            if batch == None:
+                return
+            if self.abort == False:
+                try:
+                    self._render_batch(batch)
+                except Exception as e:
+                    # Render threads need to keep taking batches or frames reading gets blocked.
+                    print("G'MIC batch render failed", e)
+
+    def _render_batch(self, batch, is_first_batch=False):
+        with tempfile.TemporaryFile() as log_file:
+            process = None
+            if self.use_pipeline == True:
+                process = self._render_batch_pipeline(batch, log_file)
+                if process == None and self.abort == False:
+                    print("G'MIC pipeline render failed, rendering frames one at a time.")
+                    self.use_pipeline = False
+                    log_file.seek(0)
+                    log_file.truncate()
+
+            if process == None:
+                process = self._render_batch_frames(batch, log_file)
+
+            if self.abort == True:
+                return
+
+            if is_first_batch == True:
+                log_file.seek(0)
+                out = log_file.read().decode("utf-8", "replace")
+                self.render_output_callback(process, out)
+
+        with self.lock:
+            self.frames_done += len(batch)
+            frames_done = self.frames_done
+        self.update_callback(frames_done)
+
+    def _render_batch_pipeline(self, batch, log_file):
+        # Returns finished process or None if rendering failed.
+        args = ["nice", "-n", str(self.nice), "gmic", "-input", "-.cimg", "-repeat", "$!", "-local[$>]"] \
+                + self.script_args + ["-endlocal", "-done", "-output", "-.cimg"]
+        process = self._start_process(args, subprocess.PIPE, subprocess.PIPE, log_file)
+        if process == None:
+            return None
+
+        try:
+            out_data, err_data = process.communicate(_get_cimg_data([rgb for frame_index, rgb in batch], self.width, self.height))
+        except OSError:
+            out_data = None
+        self._remove_process(process)
+
+        if out_data == None or process.returncode != 0 or self.abort == True:
+            return None
+
+        try:
+            images = _get_cimg_images(out_data)
+        except (ValueError, KeyError, IndexError) as e:
+            print("G'MIC output could not be read", e)
+            return None
+
+        if len(images) != len(batch):
+            return None # Script does not create one output image per input image.
+
+        for i in range(0, len(batch)):
+            frame_index, rgb = batch[i]
+            _write_png_image(images[i], self._get_rendered_file_path(frame_index))
+        
+        return process
+
+    def _render_batch_frames(self, batch, log_file):
+        # Returns last finished process.
+        process = None
+        with tempfile.TemporaryDirectory() as frames_dir:
+            for frame_index, rgb in batch:
+                if self.abort == True:
+                    return process
+
+                clip_frame_path = os.path.join(frames_dir, "frame" + str(frame_index) + ".png")
+                pixels = np.frombuffer(rgb, dtype=np.uint8).reshape(self.height, self.width, 3)
+                _write_png_image(pixels, clip_frame_path)
+                
+                # Run with nice to lower priority if requested
+                nice_command = "nice -n " + str(self.nice) + " "
+                rendered_file_path = self._get_rendered_file_path(frame_index)
+                script_str = nice_command + "gmic " + clip_frame_path.replace(" ", "\ ") + " " + self.user_script + " -output " +  rendered_file_path.replace(" ", "\ ")
+
+                process = self._start_process(script_str, log_file, log_file, log_file, True)
+                if process == None:
+                    return None
+                process.wait()
+                self._remove_process(process)
+
+        return process
+
+    def _get_rendered_file_path(self, frame_index):
+        # Numbering starts from 1 like with frames written by avformat consumer.
+        filled_number_str = str(frame_index + 1 + self.out_frame_offset).zfill(4)
+        return str(self.out_folder + self.frame_name + "_" + filled_number_str + ".png")
+
+    def _start_process(self, args, stdin, stdout, stderr, shell=False):
+        with self.lock:
+            if self.abort == True:
+                return None
+            process = subprocess.Popen(args, stdin=stdin, stdout=stdout, stderr=stderr, shell=shell)
+            self.processes.append(process)
+            return process
+
+    def _remove_process(self, process):
+        with self.lock:
+            self.processes.remove(process)
+
+
+def _get_cimg_data(rgb_images, width, height):
+    # .cimg files have images with planar pixel data.
+    data = [(str(len(rgb_images)) + " unsigned_char little_endian\n").encode("ascii")]
+    for rgb in rgb_images:
+        pixels = np.frombuffer(rgb, dtype=np.uint8).reshape(height, width, 3)
+        data.append((str(width) + " " + str(height) + " 1 3\n").encode("ascii"))
+        data.append(pixels.transpose(2, 0, 1).tobytes())
+    return b"".join(data)
+
+def _get_cimg_images(data):
+    # Returns list of (height, width, channels) uint8 arrays.
+    pos = data.index(b"\n")
+    header = data[0:pos].decode("ascii").split()
+    images_count = int(header[0])
+    dtype = np.dtype(_CIMG_PIXEL_TYPES[header[1]])
+    if len(header) > 2 and header[2] == "big_endian":
+        dtype = dtype.newbyteorder(">")
+    else:
+        dtype = dtype.newbyteorder("<")
+    pos += 1
+    
+    images = []
+    for i in range(0, images_count):
+        end = data.index(b"\n", pos)
+        image_header = data[pos:end].decode("ascii").split()
+        if len(image_header) != 4:
+            raise ValueError("compressed .cimg data")
+        width, height, depth, channels = [int(value) for value in image_header]
+        pos = end + 1
+
+        values_count = width * height * depth * channels
+        pixels = np.frombuffer(data, dtype, values_count, pos).reshape(channels, depth, height, width)[:, 0]
+        pos += values_count * dtype.itemsize
+        images.append(np.clip(pixels, 0, 255).astype(np.uint8).transpose(1, 2, 0))
+
+    return images
+
+def _write_png_image(pixels, file_path):
+    channels = pixels.shape[2]
+    if channels > 4:
+        pixels = pixels[:, :, 0:3]
+        channels = 3
+    if channels == 1:
+        pixels = pixels[:, :, 0]
+    Image.fromarray(np.ascontiguousarray(pixels)).save(file_path)
 
 
 class FolderFramesInfo:
@@ -295,79 +529,6 @@ class FolderFramesInfo:
         return path_name_part
 
 
-class FolderFramesScriptRenderer:
-
-    def __init__(   self, user_script, folder, out_folder, frame_name, update_callback, 
-                    render_output_callback, nice=0, re_render_existing=True, out_frame_offset=0):
-        self.user_script = user_script
-        self.folder = folder
-        self.out_folder = out_folder
-        self.frame_name = frame_name
-        self.update_callback = update_callback
-        self.render_output_callback = render_output_callback
-        self.nice = nice
-        self.re_render_existing = re_render_existing
-        self.out_frame_offset = out_frame_offset
-
-        self.abort = False
-
-    def write_frames(self):
-        clip_frames = os.listdir(self.folder)
-
-        frame_count = 1
-        for clip_frame in clip_frames:
-
-            if self.abort == True:
-                return
-            
-            self.do_update_callback(frame_count)
-
-            # Run with nice to lower priority if requested
-            nice_command = "nice -n " + str(self.nice) + " "
-
-            file_numbers_list = re.findall(r'\d+', clip_frame)
-            filled_number_str = str(int(file_numbers_list[0]) + self.out_frame_offset).zfill(4)
-
-            clip_frame_path = str(os.path.join(self.folder, clip_frame)).replace(" ", "\ ")
-            rendered_file_path = str(self.out_folder + self.frame_name + "_" + filled_number_str + ".png").replace(" ", "\ ")
-            
-            script_str = nice_command + "gmic " + clip_frame_path + " " + self.user_script + " -output " +  rendered_file_path
-
-            if self.re_render_existing == False:
-                if os.path.exists(rendered_file_path) == True:
-                    frame_count = frame_count + 1
-                    continue
-
-            if frame_count == 1: # first frame displays shell output and does error checking
-                FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(script_str, shell=True, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
- 
-                # read log
-                f = open(userfolders.get_cache_dir() + "log_gmic_preview", 'r')
-                out = f.read()
-                f.close()
-
-                self.do_render_output_callback(p, out)
-            else:
-                FLOG = open(userfolders.get_cache_dir() + "log_gmic_preview", 'w')
-                p = subprocess.Popen(script_str, shell=True, stdin=FLOG, stdout=FLOG, stderr=FLOG)
-                p.wait()
-                FLOG.close()
-
-            frame_count = frame_count + 1
-
-    def do_update_callback(self, frame_count):
-        self.update_callback(frame_count)
-
-    def do_render_output_callback(self, process, out_text):
-        self.render_output_callback(process, out_text)
-
-    def abort_rendering(self):
-        self.abort = True
-
-
 # ---- Debug helper
 def prints_to_log_file(log_file):
     so = se = open(log_file, 'w', buffering=1)
@@ -0,0 +1,387 @@
+"""
+    Flowblade Movie Editor is a nonlinear video editor.
+    Copyright 2012 Janne Liljeblad.
+
+    This file is part of Flowblade Movie Editor <http://code.google.com/p/flowblade>.
+
+    Flowblade Movie Editor is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Flowblade Movie Editor is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Flowblade Movie Editor. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Module runs headless renders in a persistent worker process.
+
+Headless render processes spend most of their startup time initializing MLT,
+checking available codecs and loading filters, compositors and profiles. Worker process
+does this once and then forks a child process for each job, so jobs start with
+initialized enviroment and a crashing render only takes down its own child process.
+
+Jobs are requested over a Unix socket. Connection stays open while job is running
+and gets closed when child process exits, so requester can poll for job end
+the same way as for a subprocess.
+
+If worker process is not running, jobs are run in their own processes as before
+and worker process is started for later jobs. Worker exits after being idle for a while.
+"""
+
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import audiowaveformrenderer
+import editorpersistance
+import gmicheadless
+import mltheadlessutils
+import mltxmlheadless
+import motionheadless
+import proxyheadless
+import respaths
+import userfolders
+
+# Job types are names of launch scripts that run jobs in their own processes.
+GMIC_JOB = "flowbladegmicheadless"
+MLT_XML_JOB = "flowblademltxmlheadless"
+MOTION_JOB = "flowblademotionheadless"
+PROXY_JOB = "flowbladeproxyheadless"
+AUDIO_LEVELS_JOB = "flowbladeaudiorender"
+
+WORKER_POOL_SIZE = multiprocessing.cpu_count() # max concurrently running jobs, jobs module does the actual scheduling
+WORKER_IDLE_TIMEOUT = 300.0 # seconds
+WORKER_POLL_INTERVAL = 0.5 # seconds
+WORKER_LISTEN_BACKLOG = 16
+WORKER_REQUEST_TIMEOUT = 1.0 # seconds
+MAX_REQUEST_SIZE = 1024 * 1024
+
+WORKER_CRASHED = -1 # return code for jobs that exited without sending exit code
+
+# Worker sends these as replies: job accepted, child process pid, exit code.
+JOB_ACCEPTED = 0
+_REPLY = struct.Struct("<i")
+_PEER_CREDENTIALS = struct.Struct("3i") # pid, uid, gid
+
+_worker_process = None
+_worker_start_lock = threading.Lock()
+
+
+# ------------------------------------------------- requesting jobs
+def launch_render(job_type, args):
+    """
+    Runs headless render in worker process, or in its own process if worker is not available.
+    args are 'key:value' strings with spaces escaped for shell, same as launch scripts get.
+    """
+    job_args = {}
+    for arg in args:
+        key, value = arg.split(":", 1)
+        job_args[key] = value.replace("\\ ", " ")
+
+    worker_job = submit_job(job_type, job_args)
+    if worker_job != None:
+        worker_job.close() # Render reports to app using ccrutils.
+        return
+
+    # Run with nice to lower priority if requested (currently hard coded to lower)
+    nice_command = "nice -n " + str(10) + " " + respaths.LAUNCH_DIR + job_type
+    for arg in args:
+        nice_command += " "
+        nice_command += arg
+
+    subprocess.Popen([nice_command], shell=True)
+
+def submit_job(job_type, job_args):
+    """
+    Sends job to worker process and returns WorkerJob object, or None if worker is not running.
+    Worker process is started if needed so that it is available for later jobs.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(WORKER_REQUEST_TIMEOUT)
+    try:
+        sock.connect(_get_worker_address(respaths.ROOT_PATH))
+    except OSError:
+        sock.close()
+        _start_worker()
+        return None
+
+    try:
+        request = json.dumps((job_type, job_args)).encode("utf-8")
+        sock.sendall(_REPLY.pack(len(request)) + request)
+        # Worker closes connection without accepting job if it is exiting or request is bad.
+        if _receive_all(sock, _REPLY.size) == None:
+            raise OSError("job not accepted")
+    except OSError:
+        sock.close()
+        return None
+
+    return WorkerJob(sock)
+
+def _start_worker():
+    global _worker_process
+    with _worker_start_lock:
+        if _worker_process != None and _worker_process.poll() == None:
+            return # Worker is initializing.
+
+        FLOG = open(userfolders.get_cache_dir() + "log_headless_worker", 'w')
+        _worker_process = subprocess.Popen([sys.executable, respaths.LAUNCH_DIR + "flowbladeheadlessworker", respaths.ROOT_PATH], stdin=FLOG, stdout=FLOG, stderr=FLOG)
+
+def _get_worker_address(root_path):
+    # Abstract namespace address, one worker per user and installation.
+    root_path_hash = hashlib.md5(root_path.encode("utf-8")).hexdigest()
+    return "\0flowblade_headless_worker_" + str(os.getuid()) + "_" + root_path_hash
+
+def _receive_all(sock, size):
+    data = b""
+    while len(data) < size:
+        received = sock.recv(size - len(data))
+        if len(received) == 0:
+            return None
+        data += received
+    return data
+
+
+class WorkerJob:
+    """
+    Job running in worker process, has poll() and terminate() like subprocess.Popen objects.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.pid = None
+        self.returncode = None
+        self.data = b""
+
+    def poll(self):
+        while self.returncode == None and self._receive(0.0) == True:
+            pass
+        return self.returncode
+
+    def terminate(self):
+        if self.returncode != None:
+            return
+
+        # Job may still be waiting to be started if worker is busy.
+        if self.pid == None:
+            self._receive(WORKER_REQUEST_TIMEOUT)
+
+        if self.pid != None:
+            try:
+                os.kill(self.pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+        self.close()
+        self.returncode = -signal.SIGTERM
+
+    def close(self):
+        self.sock.close()
+
+    def _receive(self, timeout):
+        if self.sock.fileno() == -1:
+            return False
+
+        readable, writable, exceptional = select.select([self.sock], [], [], timeout)
+        if len(readable) == 0:
+            return False
+
+        try:
+            data = self.sock.recv(_REPLY.size * 2)
+        except OSError:
+            data = b""
+
+        if len(data) == 0:
+            # Child process exited without sending exit code.
+            self.returncode = WORKER_CRASHED
+            self.close()
+            return False
+
+        self.data += data
+        if self.pid == None and len(self.data) >= _REPLY.size:
+            self.pid = _REPLY.unpack(self.data[0:_REPLY.size])[0]
+        if len(self.data) >= _REPLY.size * 2:
+            self.returncode = _REPLY.unpack(self.data[_REPLY.size:_REPLY.size * 2])[0]
+            self.close()
+
+        return True
+
+
+# ------------------------------------------------- worker process
+def main(root_path):
+    mltheadlessutils.init_mlt_env(root_path)
+
+    listen_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listen_socket.bind(_get_worker_address(root_path))
+    except OSError:
+        print("Headless worker already running.")
+        return
+    listen_socket.listen(WORKER_LISTEN_BACKLOG)
+    print("Headless worker started, pool size", WORKER_POOL_SIZE)
+
+    queued_jobs = collections.deque() # (connection, job type, job args)
+    running_jobs = {} # pid -> job type
+    idle_start = time.monotonic()
+    while True:
+        readable, writable, exceptional = select.select([listen_socket], [], [], WORKER_POLL_INTERVAL)
+        if len(readable) > 0:
+            job = _accept_job(listen_socket)
+            if job != None:
+                queued_jobs.append(job)
+
+        _reap_jobs(running_jobs)
+
+        while len(queued_jobs) > 0 and len(running_jobs) < WORKER_POOL_SIZE:
+            connection, job_type, job_args = queued_jobs.popleft()
+            pid = _fork_job(root_path, listen_socket, queued_jobs, connection, job_type, job_args)
+            running_jobs[pid] = job_type
+
+        if len(running_jobs) > 0 or len(queued_jobs) > 0 or len(readable) > 0:
+            idle_start = time.monotonic()
+        elif time.monotonic() - idle_start > WORKER_IDLE_TIMEOUT:
+            break
+
+    # Requests not accepted before this get run in their own processes.
+    listen_socket.close()
+    print("Headless worker exited after being idle.")
+
+def _accept_job(listen_socket):
+    connection, address = listen_socket.accept()
+    try:
+        connection.settimeout(WORKER_REQUEST_TIMEOUT)
+
+        # Only processes of the same user can request jobs.
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEER_CREDENTIALS.size)
+        pid, uid, gid = _PEER_CREDENTIALS.unpack(credentials)
+        if uid != os.getuid():
+            raise ValueError("request from other user")
+
+        length_data = _receive_all(connection, _REPLY.size)
+        if length_data == None or _REPLY.unpack(length_data)[0] > MAX_REQUEST_SIZE:
+            raise ValueError("bad request")
+        request = _receive_all(connection, _REPLY.unpack(length_data)[0])
+        if request == None:
+            raise ValueError("bad request")
+        job_type, job_args = json.loads(request.decode("utf-8"))
+        if job_type not in _JOB_RUNNERS:
+            raise ValueError("unknown job type " + str(job_type))
+
+        connection.sendall(_REPLY.pack(JOB_ACCEPTED))
+    except (OSError, ValueError) as e:
+        print("Headless worker job request failed:", e)
+        connection.close()
+        return None
+
+    connection.settimeout(None)
+    return (connection, job_type, job_args)
+
+def _fork_job(root_path, listen_socket, queued_jobs, connection, job_type, job_args):
+    pid = os.fork()
+    if pid != 0:
+        connection.close()
+        return pid
+
+    # Child process runs job and exits, it never returns to worker loop.
+    exit_code = 1
+    try:
+        # Connections of other jobs need to be closed when their child processes exit.
+        listen_socket.close()
+        for queued_connection, queued_job_type, queued_job_args in queued_jobs:
+            queued_connection.close()
+        _send_reply(connection, os.getpid())
+        _run_job(root_path, job_type, job_args)
+        exit_code = 0
+    except Exception:
+        traceback.print_exc()
+    finally:
+        _send_reply(connection, exit_code)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+def _send_reply(connection, value):
+    try:
+        connection.sendall(_REPLY.pack(value))
+    except OSError:
+        pass # Requester does not wait for job end.
+
+def _run_job(root_path, job_type, job_args):
+    print("Headless worker running job", job_type, os.getpid())
+
+    # Preferences may have changed after worker was started.
+    editorpersistance.load()
+
+    _JOB_RUNNERS[job_type](root_path, job_args)
+
+    # Renders run in threads, job is done when they exit.
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon == False:
+            thread.join()
+
+def _reap_jobs(running_jobs):
+    for pid in list(running_jobs.keys()):
+        try:
+            exited_pid, status = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            exited_pid, status = (pid, 0)
+        if exited_pid == 0:
+            continue
+
+        job_type = running_jobs.pop(pid)
+        if os.WIFSIGNALED(status):
+            print("Headless worker job", job_type, pid, "killed by signal", os.WTERMSIG(status))
+        elif os.WEXITSTATUS(status) != 0:
+            print("Headless worker job", job_type, pid, "failed with exit code", os.WEXITSTATUS(status))
+
+
+# ------------------------------------------------- job runners
+# Arguments are the same ones that launch scripts parse from command line.
+def _get_profile_desc(job_args, key="profile_desc"):
+    # Profile names have underscores in place of spaces to get them through command line in one piece.
+    return job_args[key].replace("_", " ")
+
+def _run_gmic_job(root_path, job_args):
+    gmicheadless.main(root_path, job_args["session_id"], job_args["script"], job_args["clip_path"],
+                      job_args["range_in"], job_args["range_out"], _get_profile_desc(job_args),
+                      job_args["gmic_frame_offset"])
+
+def _run_mlt_xml_job(root_path, job_args):
+    mltxmlheadless.main(root_path, job_args["session_id"], job_args["xml_file_path"],
+                        job_args["range_in"], job_args["range_out"], _get_profile_desc(job_args))
+
+def _run_motion_job(root_path, job_args):
+    motionheadless.main(root_path, job_args["session_id"], job_args["speed"], job_args["write_file"],
+                        _get_profile_desc(job_args), job_args["encoding_option_index"],
+                        job_args["quality_option_index"], job_args["source_path"],
+                        job_args["render_full_range"], job_args["start_frame"], job_args["end_frame"])
+
+def _run_proxy_job(root_path, job_args):
+    proxyheadless.main(root_path, job_args["session_id"], job_args["media_file_id"],
+                       job_args["proxy_w"], job_args["proxy_h"], job_args["enc_index"],
+                       job_args["proxy_file_path"], job_args["proxy_rate"], job_args["media_file_path"],
+                       _get_profile_desc(job_args, "proxy_profile_desc"), job_args["lookup_path"])
+
+def _run_audio_levels_job(root_path, job_args):
+    audiowaveformrenderer.render_levels(job_args["files"], job_args["profile_desc"])
+
+_JOB_RUNNERS = {GMIC_JOB: _run_gmic_job,
+                MLT_XML_JOB: _run_mlt_xml_job,
+                MOTION_JOB: _run_motion_job,
+                PROXY_JOB: _run_proxy_job,
+                AUDIO_LEVELS_JOB: _run_audio_levels_job}
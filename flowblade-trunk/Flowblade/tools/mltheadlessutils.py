@@ -21,6 +21,9 @@
 """
 Module provides utility methods for moduless creating headless render procesesses
 in initialized Flowblade/MLT enviroment.
+
+Enviroment is initialized once per process, headless worker process forks
+render processes that already have initialized enviroment.
 """
 
 import locale
@@ -37,11 +40,20 @@ import mlttransitions
 import processutils
 import renderconsumer
 import respaths
+import startupcache
 import translations
 import userfolders
 
+_mlt_env_initialized = False
+
 
 def mlt_env_init(root_path, session_id):
+    if _mlt_env_initialized == False:
+        init_mlt_env(root_path)
+
+    return init_session(session_id)
+
+def init_mlt_env(root_path):
     os.nice(10) # make user configurable
 
     try:
@@ -76,7 +88,13 @@ def mlt_env_init(root_path, session_id):
 
     # Create list of available mlt profiles
     mltprofiles.load_profile_list()
-    
+
+    startupcache.save()
+
+    global _mlt_env_initialized
+    _mlt_env_initialized = True
+
+def init_session(session_id):
     ccrutils.init_session_folders(session_id)
     
     ccrutils.load_render_data()
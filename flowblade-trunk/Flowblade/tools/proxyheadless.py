@@ -20,21 +20,39 @@
 
 import glob
 import mlt
+import multiprocessing
 import os
 from PIL import Image
+import shutil
 import threading
 import time
 
 import appconsts
 import ccrutils
+import editorpersistance
 import mltheadlessutils
-import mltprofiles
 import processutils
 import renderconsumer
 import toolsencoding
 import userfolders
 
+# Image sequence frames are given to pool processes in chunks of this many frames,
+# progress is updated when a chunk is done.
+IMG_SEQ_CHUNK_FRAMES = 24
+
+# appconsts.IMG_SEQ_PROXY_* -> (PIL format, PIL save params)
+_IMG_SEQ_PROXY_SAVE_FORMATS = { appconsts.IMG_SEQ_PROXY_PNG: ("PNG", {"compress_level":1}),
+                                appconsts.IMG_SEQ_PROXY_JPEG: ("JPEG", {"quality":90}),
+                                appconsts.IMG_SEQ_PROXY_UNCOMPRESSED: ("PPM", {})}
+
+# Video files longer than two chunks are rendered in chunks.
+PROXY_CHUNK_SECONDS = 60
+PROXY_CHUNK_MAX_PROCESSES = 4
+PROXY_CHUNKS_FOLDER_EXTENSION = ".chunks"
+PROXY_CHUNKS_KEY_FILE = "render_key"
+
 _render_thread = None
+_chunks_progress = None # Shared array in chunk render processes
 
 
 # ----------------------------------------------------- module interface with message files
@@ -46,8 +64,14 @@ def get_session_status(session_id):
     msg = ccrutils.get_session_status_message(session_id)
     if msg == None:
         return None
-    fraction, elapsed = msg.split(" ")
-    return (fraction, elapsed)
+    # Chunked renders add 'done/count' chunks info.
+    msg_parts = msg.split(" ")
+    fraction = msg_parts[0]
+    elapsed = msg_parts[1]
+    chunks_info = None
+    if len(msg_parts) > 2:
+        chunks_info = msg_parts[2]
+    return (fraction, elapsed, chunks_info)
     
 def abort_render(session_id):
     ccrutils.abort_render(session_id)
@@ -93,82 +117,300 @@ class ProxyClipRenderThread(threading.Thread):
         
         if self.lookup_path == "None":
             # Video clips
-            
-            proxy_profile = mltprofiles.get_profile(self.proxy_profile_desc)
-            
-            # App wrote the temp profile when launching proxy render.
-            # NOTE: this needs to be created here for future
-            proxy_profile_path = userfolders.get_cache_dir() + "temp_proxy_profile"
-            proxy_profile = mlt.Profile(proxy_profile_path)
-        
-            renderconsumer.performance_settings_enabled = False # uuh...we're obivously disabling something momentarily.
-            consumer = renderconsumer.get_render_consumer_for_encoding(
-                                                        self.proxy_file_path,
-                                                        proxy_profile, 
-                                                        renderconsumer.proxy_encodings[self.enc_index])
-            renderconsumer.performance_settings_enabled = True
-            
-            consumer.set("vb", str(int(self.proxy_rate)) + "k")
-            consumer.set("rescale", "nearest")
-            
-            file_producer = mlt.Producer(proxy_profile, str(self.media_file_path))
-
-            start_frame = 0
-            end_frame = file_producer.get_length() - 1
-            
-            self.render_player = renderconsumer.FileRenderPlayer(None, file_producer, consumer, 0, end_frame)
-            self.render_player.wait_for_producer_end_stop = False
-            self.render_player.start()
-
-            while self.render_player.stopped == False:
-                
-                self.check_abort_requested()
-                
-                if self.abort == True:
-                    self.render_player.shutdown()
-                    return
-                
-                fraction = self.render_player.get_render_fraction()
-                self.render_update(fraction)
-            
-                time.sleep(0.3)
+            rendered = self.render_video_chunks()
+            if rendered == None:
+                rendered = self.render_video_file()
+            if rendered == False:
+                return # aborted
                 
         else:
             # Image Sequences
-
             copyfolder, copyfilename = os.path.split(self.proxy_file_path)
             if not os.path.isdir(copyfolder):
                 os.makedirs(copyfolder)
-            
-            listing = glob.glob(self.lookup_path)
-            size = self.proxy_w, self.proxy_h
-            done = 0
-            for orig_path in listing:
-                orig_folder, orig_file_name = os.path.split(orig_path)
-
-                try:
-                    im = Image.open(orig_path)
-                    im.thumbnail(size, Image.ANTIALIAS)
-                    im.save(copyfolder + "/" + orig_file_name, "PNG")
-                except IOError:
-                    print("proxy img seq frame failed for '%s'" % orig_path)
-
-                done = done + 1
-            
-                if done % 5 == 0:
-                    fraction = float(done) / float(len(listing))
-                    self.render_update(fraction)
+
+            listing = sorted(glob.glob(self.lookup_path))
+            if self.render_img_seq_frames(listing, copyfolder) == False:
+                return # aborted
 
         # Write out completed flag file.
         ccrutils.write_completed_message()
 
+    def get_proxy_profile(self):
+        # App wrote the temp profile when launching proxy render.
+        # NOTE: this needs to be created here for future
+        proxy_profile_path = userfolders.get_cache_dir() + "temp_proxy_profile"
+        return mlt.Profile(proxy_profile_path)
+
+    def render_video_file(self):
+        proxy_profile = self.get_proxy_profile()
+        consumer = _get_proxy_consumer(self.proxy_file_path, proxy_profile, self.enc_index, self.proxy_rate)
+        
+        file_producer = mlt.Producer(proxy_profile, str(self.media_file_path))
+
+        start_frame = 0
+        end_frame = file_producer.get_length() - 1
+        
+        self.render_player = renderconsumer.FileRenderPlayer(None, file_producer, consumer, 0, end_frame)
+        self.render_player.wait_for_producer_end_stop = False
+        self.render_player.start()
+
+        while self.render_player.stopped == False:
+            
+            self.check_abort_requested()
+            
+            if self.abort == True:
+                self.render_player.shutdown()
+                return False
+            
+            fraction = self.render_player.get_render_fraction()
+            self.render_update(fraction)
+        
+            time.sleep(0.3)
+
+        return True
+
+    def render_video_chunks(self):
+        # Long files are rendered in chunks in parallel processes and chunks are then joined into proxy file.
+        # Rendered chunks are kept until proxy file is complete, so a restarted render only renders missing chunks.
+        # Returns None if file should be rendered in one piece.
+        if renderconsumer.can_concat_files() == False:
+            return None
+
+        proxy_profile = self.get_proxy_profile()
+        file_producer = mlt.Producer(proxy_profile, str(self.media_file_path))
+        length = file_producer.get_length()
+        chunk_frames = int(PROXY_CHUNK_SECONDS * proxy_profile.fps())
+        if length < chunk_frames * 2:
+            return None
+
+        chunks_folder = self.proxy_file_path + PROXY_CHUNKS_FOLDER_EXTENSION
+        render_key = str((self.media_file_path, os.path.getsize(self.media_file_path), os.path.getmtime(self.media_file_path), 
+                          length, chunk_frames, self.enc_index, self.proxy_rate, self.proxy_w, self.proxy_h))
+        _prepare_chunks_folder(chunks_folder, render_key)
+
+        proxy_root, proxy_ext = os.path.splitext(self.proxy_file_path)
+        chunks = []
+        chunk_paths = []
+        chunks_done = 0
+        for in_frame in range(0, length, chunk_frames):
+            out_frame = min(in_frame + chunk_frames, length) - 1
+            chunk_path = chunks_folder + "/chunk_" + str(len(chunk_paths)).zfill(5) + proxy_ext
+            if os.path.exists(chunk_path):
+                chunks_done += 1
+            else:
+                chunks.append((len(chunk_paths), in_frame, out_frame, chunk_path, self.media_file_path, self.enc_index, self.proxy_rate))
+            chunk_paths.append(chunk_path)
+
+        if chunks_done > 0:
+            print("Proxy chunks already rendered:", chunks_done, "/", len(chunk_paths))
+
+        if len(chunks) > 0:
+            # Encoders use several threads, so there are less processes than cores.
+            processes_count = min(PROXY_CHUNK_MAX_PROCESSES, multiprocessing.cpu_count(), len(chunks))
+            pool_context = multiprocessing.get_context("fork")
+            chunks_progress = pool_context.Array("i", len(chunk_paths), lock=False) # rendered frames for chunks being rendered
+            pool = pool_context.Pool(processes_count, _init_chunk_render_process, (chunks_progress,))
+            chunk_failed = False
+            try:
+                results = pool.imap_unordered(_render_proxy_chunk, chunks)
+                chunks_left = len(chunks)
+                while chunks_left > 0:
+                    self.check_abort_requested()
+                    if self.abort == True:
+                        return False
+
+                    try:
+                        chunk_rendered = results.next(0.3)
+                    except multiprocessing.TimeoutError:
+                        chunk_rendered = None
+
+                    if chunk_rendered != None:
+                        chunks_left -= 1
+                        if chunk_rendered == False:
+                            chunk_failed = True
+                            break
+                        chunks_done += 1
+
+                    rendering_frames = sum(chunks_progress)
+                    fraction = float(chunks_done * chunk_frames + rendering_frames) / float(length)
+                    self.render_update(min(fraction, 1.0), str(chunks_done) + "/" + str(len(chunk_paths)))
+            finally:
+                pool.terminate()
+                pool.join()
+
+            if chunk_failed == True:
+                # Chunks are deleted only after pool has stopped writing them.
+                print("Proxy chunk render failed, rendering proxy in one piece.")
+                shutil.rmtree(chunks_folder, ignore_errors=True)
+                return None
+
+        if renderconsumer.concat_files(chunk_paths, self.proxy_file_path) == False:
+            print("Proxy chunks concat failed, rendering proxy in one piece.")
+            shutil.rmtree(chunks_folder, ignore_errors=True)
+            return None
+
+        shutil.rmtree(chunks_folder)
+        return True
+
+    def render_img_seq_frames(self, listing, copyfolder):
+        # Proxy frames keep file names of original frames so that image sequence resource names work for them.
+        # Frames with an up-to-date proxy frame are skipped, so interrupted renders continue where they stopped.
+        save_format = _IMG_SEQ_PROXY_SAVE_FORMATS[editorpersistance.prefs.img_seq_proxy_format]
+        size = (self.proxy_w, self.proxy_h)
+        render_key = str((editorpersistance.prefs.img_seq_proxy_format, size))
+        _prepare_img_seq_proxy_folder(copyfolder, listing, render_key)
+
+        frames = []
+        for orig_path in listing:
+            orig_folder, orig_file_name = os.path.split(orig_path)
+            proxy_path = copyfolder + "/" + orig_file_name
+            if _proxy_frame_exists(orig_path, proxy_path) == False:
+                frames.append((orig_path, proxy_path))
+
+        done = len(listing) - len(frames)
+        if done > 0:
+            print("Image sequence proxy frames already rendered:", done)
+            self.render_update(float(done) / float(len(listing)))
+
+        chunks = []
+        for i in range(0, len(frames), IMG_SEQ_CHUNK_FRAMES):
+            chunks.append((frames[i:i + IMG_SEQ_CHUNK_FRAMES], size, save_format))
+        if len(chunks) == 0:
+            return True
+
+        # Decoding and scaling large frames is CPU bound, so frames are rendered in processes.
+        processes_count = min(multiprocessing.cpu_count(), len(chunks))
+        pool = multiprocessing.get_context("fork").Pool(processes_count)
+        try:
+            for chunk_frames in pool.imap_unordered(_render_img_seq_proxy_frames, chunks):
+                self.check_abort_requested()
+                if self.abort == True:
+                    return False
+
+                done = done + chunk_frames
+                self.render_update(float(done) / float(len(listing)))
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return True
+
     def check_abort_requested(self):
         self.abort = ccrutils.abort_requested()
 
-    def render_update(self, fraction):
+    def render_update(self, fraction, chunks_info=None):
         elapsed = time.monotonic() - self.start_time
         msg = str(fraction) + " " + str(elapsed)
+        if chunks_info != None:
+            msg += " " + chunks_info
         ccrutils.write_status_message(msg)
 
 
+# --------------------------------------------------- video proxy chunks
+def _get_proxy_consumer(file_path, proxy_profile, enc_index, proxy_rate):
+    renderconsumer.performance_settings_enabled = False # uuh...we're obivously disabling something momentarily.
+    consumer = renderconsumer.get_render_consumer_for_encoding(
+                                                file_path,
+                                                proxy_profile, 
+                                                renderconsumer.proxy_encodings[enc_index])
+    renderconsumer.performance_settings_enabled = True
+    
+    consumer.set("vb", str(int(proxy_rate)) + "k")
+    consumer.set("rescale", "nearest")
+    return consumer
+
+def _prepare_chunks_folder(chunks_folder, render_key):
+    # Chunks rendered for different media or settings are deleted.
+    key_file_path = chunks_folder + "/" + PROXY_CHUNKS_KEY_FILE
+    try:
+        with open(key_file_path) as f:
+            if f.read() == render_key:
+                return
+    except OSError:
+        pass
+
+    if os.path.isdir(chunks_folder):
+        shutil.rmtree(chunks_folder)
+    os.makedirs(chunks_folder)
+    with open(key_file_path, "w") as f:
+        f.write(render_key)
+
+def _init_chunk_render_process(chunks_progress):
+    global _chunks_progress
+    _chunks_progress = chunks_progress
+
+def _render_proxy_chunk(chunk):
+    # Runs in pool process, returns True if chunk was rendered.
+    chunk_index, in_frame, out_frame, chunk_path, media_file_path, enc_index, proxy_rate = chunk
+    try:
+        # Chunk is written with temp name so that interrupted chunks are rendered again.
+        root, ext = os.path.splitext(chunk_path)
+        temp_path = root + "_part" + ext
+        proxy_profile = mlt.Profile(userfolders.get_cache_dir() + "temp_proxy_profile")
+        consumer = _get_proxy_consumer(temp_path, proxy_profile, enc_index, proxy_rate)
+        file_producer = mlt.Producer(proxy_profile, str(media_file_path))
+        chunk_producer = file_producer.cut(in_frame, out_frame)
+
+        render_player = renderconsumer.FileRenderPlayer(None, chunk_producer, consumer, 0, out_frame - in_frame)
+        render_player.start()
+        while render_player.stopped == False:
+            _chunks_progress[chunk_index] = max(chunk_producer.frame(), 0)
+            time.sleep(0.3)
+
+        _chunks_progress[chunk_index] = 0
+        os.replace(temp_path, chunk_path)
+    except Exception as e:
+        print("Proxy chunk render failed", chunk_path, e)
+        return False
+
+    return True
+
+
+# --------------------------------------------------- image sequence proxy frames
+def _prepare_img_seq_proxy_folder(copyfolder, listing, render_key):
+    # Frames rendered with different format or size are deleted.
+    key_file_path = copyfolder + "/" + PROXY_CHUNKS_KEY_FILE
+    try:
+        with open(key_file_path) as f:
+            if f.read() == render_key:
+                return
+    except OSError:
+        pass
+
+    for orig_path in listing:
+        orig_folder, orig_file_name = os.path.split(orig_path)
+        try:
+            os.remove(copyfolder + "/" + orig_file_name)
+        except OSError:
+            pass
+
+    with open(key_file_path, "w") as f:
+        f.write(render_key)
+
+def _proxy_frame_exists(orig_path, proxy_path):
+    try:
+        return os.stat(proxy_path).st_mtime >= os.stat(orig_path).st_mtime
+    except OSError:
+        return False
+
+def _render_img_seq_proxy_frames(chunk):
+    # Runs in pool process, returns number of handled frames.
+    frames, size, save_format = chunk
+    pil_format, save_params = save_format
+    for orig_path, proxy_path in frames:
+        try:
+            im = Image.open(orig_path)
+            im.draft("RGB", size) # JPEG frames get decoded directly at reduced size.
+            im.thumbnail(size, Image.LANCZOS)
+            if pil_format != "PNG" and im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+
+            # Frame is written with temp name so that interrupted writes are not taken as rendered frames.
+            temp_path = proxy_path + ".part"
+            im.save(temp_path, pil_format, **save_params)
+            os.replace(temp_path, proxy_path)
+        except (IOError, ValueError):
+            print("proxy img seq frame failed for '%s'" % orig_path)
 
+    return len(frames)
@@ -25,6 +25,7 @@ This module handles track actions; mute, change active state, size change.
 from gi.repository import GObject
 
 import appconsts
+import autosaving
 import audiomonitoring
 import dialogutils
 import gui
@@ -52,11 +53,13 @@ def _track_menu_item_activated(widget, data):
 def lock_track(track_index):
     track = get_track(track_index)
     track.edit_freedom = appconsts.LOCKED
+    autosaving.project_changed()
     updater.repaint_tline()
 
 def unlock_track(track_index):
     track = get_track(track_index)
     track.edit_freedom = appconsts.FREE
+    autosaving.project_changed()
     updater.repaint_tline()
 
 def set_track_normal_height(track_index, is_retry=False):
@@ -89,6 +92,7 @@ def set_track_normal_height(track_index, is_retry=False):
     tlinewidgets.set_ref_line_y(gui.tline_canvas.widget.get_allocation())
     gui.tline_column.init_listeners()
     updater.repaint_tline()
+    autosaving.project_changed()
 
     return False
 
@@ -97,6 +101,7 @@ def set_track_small_height(track_index):
     track.height = appconsts.TRACK_HEIGHT_SMALL
     if editorstate.SCREEN_HEIGHT < 863:
         track.height = appconsts.TRACK_HEIGHT_SMALLEST
+    autosaving.project_changed()
     
     tlinewidgets.set_ref_line_y(gui.tline_canvas.widget.get_allocation())
     gui.tline_column.init_listeners()
@@ -105,6 +110,7 @@ def set_track_small_height(track_index):
 def mute_track(track, new_mute_state):
     # NOTE: THIS IS A SAVED EDIT OF SEQUENCE, BUT IT IS NOT AN UNDOABLE EDIT.
     current_sequence().set_track_mute_state(track.id, new_mute_state)
+    autosaving.project_changed()
     gui.tline_column.widget.queue_draw()
     
 def all_tracks_menu_launch_pressed(widget, event):
@@ -137,6 +143,7 @@ def _all_tracks_item_activated(widget, msg):
          _tline_vertical_shrink_changed(widget)
         
 def _tracks_resize_update():
+    autosaving.project_changed()
     tlinewidgets.set_ref_line_y(gui.tline_canvas.widget.get_allocation())
     gui.tline_column.init_listeners()
     updater.repaint_tline()
@@ -144,6 +151,7 @@ def _tracks_resize_update():
 
 def _tline_vertical_shrink_changed(widget):
     PROJECT().project_properties[appconsts.P_PROP_TLINE_SHRINK_VERTICAL] = widget.get_active()
+    autosaving.project_changed()
     updater.set_timeline_height()
 
 def _activate_all_tracks():
@@ -260,6 +268,7 @@ def track_center_pressed(data):
                     return 
             # Update track mute state
             current_sequence().set_track_mute_state(track.id, new_mute_state)
+            autosaving.project_changed()
             
             audiomonitoring.update_mute_states()
             gui.tline_column.widget.queue_draw()
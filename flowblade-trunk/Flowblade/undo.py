@@ -22,14 +22,27 @@
 Module manages undo and redo stacks and executes edit actions from them
 on user requests.
 """
+import sys
 import time
+import types
+
+import editorpersistance
 import editorstate
 
 set_post_undo_redo_edit_mode = None # This is set at startup to avoid circular imports.
 repaint_tline = None
 
-# Max stack size.
-MAX_UNDOS = 35
+# Stack size is limited by preferences undos_max and undo_memory_max,
+# but oldest undos are not removed to save memory below this size.
+MIN_UNDOS = 10
+
+# Estimated memory use of one MLT object, MLT side data is not visible to Python.
+MLT_OBJECT_SIZE = 4096
+MAX_SIZE_DEPTH = 8
+
+# Objects of these types exist without undos too, so they are not counted in undo memory use.
+_NOT_COUNTED_TYPES = ["Sequence", "Project", "Bin", "MediaFile", "Playlist", "Tractor", "Multitrack", "Field", "Profile"]
+_NOT_COUNTED_PY_TYPES = (types.FunctionType, types.MethodType, types.BuiltinFunctionType, types.ModuleType, type)
 
 # EditActions are placed in this stack after their do_edit()
 # method has been called.
@@ -71,10 +84,8 @@ def register_edit(undo_edit):
     if index != len(undo_stack) and (len(undo_stack) != 0):
         del undo_stack[index:]
  
-    # Keep stack in size, if too big remove undo at 0
-    if len(undo_stack) > MAX_UNDOS:
-        del undo_stack[0]
-        index = index - 1
+    # Keep stack in size, if too big remove undos at 0
+    _trim_stack()
         
     # Add to stack and grow index
     undo_stack.append(undo_edit);
@@ -84,6 +95,75 @@ def register_edit(undo_edit):
     undo_item.set_sensitive(True)
     redo_item.set_sensitive(False)
 
+def get_undo_memory_use():
+    """
+    Returns estimated memory use in bytes of objects held by undo stack.
+    """
+    memory_use = 0
+    for i in range(0, len(undo_stack)):
+        # Last edit may still get data added after it was registered, so its size is not cached yet.
+        memory_use += _get_edit_size(undo_stack[i], i != len(undo_stack) - 1)
+    return memory_use
+
+def _trim_stack():
+    global index
+    max_undos = int(editorpersistance.prefs.undos_max)
+    max_memory = editorpersistance.prefs.undo_memory_max * 1024 * 1024
+    memory_use = get_undo_memory_use()
+    removed_for_memory = 0
+    while len(undo_stack) > 0 and index > 0:
+        over_count = (len(undo_stack) >= max_undos)
+        over_memory = (memory_use > max_memory and len(undo_stack) > MIN_UNDOS)
+        if over_count == False and over_memory == False:
+            break
+        if over_count == False:
+            removed_for_memory += 1
+        memory_use -= _get_edit_size(undo_stack[0], True)
+        del undo_stack[0]
+        index = index - 1
+
+    if removed_for_memory > 0:
+        print("Undo memory limit reached, removed " + str(removed_for_memory) + " oldest undos, memory use now " + str(memory_use // (1024 * 1024)) + " MB")
+
+def _get_edit_size(undo_edit, cache_size):
+    try:
+        return undo_edit.undo_memory_size
+    except AttributeError:
+        pass
+
+    visited = set([id(undo_edit)])
+    size = sys.getsizeof(undo_edit)
+    for value in list(undo_edit.__dict__.values()):
+        size += _get_object_size(value, visited, 0)
+    if cache_size == True:
+        undo_edit.undo_memory_size = size
+    return size
+
+def _get_object_size(obj, visited, depth):
+    # Objects shared between edits are counted for each edit, so this is an upper estimate.
+    if id(obj) in visited or depth > MAX_SIZE_DEPTH:
+        return 0
+    visited.add(id(obj))
+
+    obj_type = type(obj)
+    if obj_type.__name__ in _NOT_COUNTED_TYPES or isinstance(obj, _NOT_COUNTED_PY_TYPES):
+        return 0
+
+    size = sys.getsizeof(obj)
+    if obj_type.__module__.startswith("mlt"):
+        size += MLT_OBJECT_SIZE
+
+    if isinstance(obj, dict):
+        items = list(obj.keys()) + list(obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        items = list(obj)
+    else:
+        items = list(getattr(obj, "__dict__", {}).values())
+
+    for item in items:
+        size += _get_object_size(item, visited, depth + 1)
+    return size
+
 def do_undo_and_repaint(widget=None, data=None):
     do_undo()
     repaint_tline()
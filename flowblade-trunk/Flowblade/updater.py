@@ -561,7 +561,7 @@ def update_frame_displayers(frame):
     kftoolmode.update_clip_frame(frame)
     
     gui.tline_scale.widget.queue_draw()
-    gui.tline_canvas.widget.queue_draw()
+    gui.tline_canvas.queue_playhead_draw()
     gui.big_tc.queue_draw()
     clipeffectseditor.display_kfeditors_tline_frame(frame)
     compositeeditor.display_kfeditors_tline_frame(frame)
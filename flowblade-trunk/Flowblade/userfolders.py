@@ -157,6 +157,8 @@ def _maybe_create_xdg_dirs():
         os.mkdir(get_cache_dir() + appconsts.AUDIO_LEVELS_DIR)
     if not os.path.exists(get_cache_dir() + appconsts.TRIM_VIEW_DIR):
         os.mkdir(get_cache_dir() + appconsts.TRIM_VIEW_DIR)
+    if not os.path.exists(get_cache_dir() + appconsts.THUMB_TILES_DIR):
+        os.mkdir(get_cache_dir() + appconsts.THUMB_TILES_DIR)
     if not os.path.exists(get_cache_dir() + appconsts.BATCH_DIR):
         os.mkdir(get_cache_dir() + appconsts.BATCH_DIR)
     if not os.path.exists(get_hidden_screenshot_dir_path()):